@@ -0,0 +1 @@
+# כלי מדידת ביצועים - מורצים ידנית עם python -m benchmarks.<name>
@@ -0,0 +1,96 @@
+"""מדידת זמן לקריאה: חיבור חדש לכל קריאה מול מאגר חיבורים קבוע.
+
+הרצה:
+    python -m benchmarks.db_pool_bench --rows 1000000 --calls 2000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from database.database_manager import Database
+
+
+def seed(db: Database, rows: int, users: int) -> None:
+    """מילוי הטבלה בפריטים סינתטיים"""
+    batch = []
+    with db.pool.writer() as conn:
+        for i in range(rows):
+            user_id = i % users
+            batch.append((user_id, f"cat{i % 20}", f"subject {i}", 'text', f"content {i}"))
+            if len(batch) >= 50000:
+                conn.executemany(
+                    "INSERT INTO saved_items (user_id, category, subject, content_type, content) "
+                    "VALUES (?, ?, ?, ?, ?)", batch)
+                batch.clear()
+        if batch:
+            conn.executemany(
+                "INSERT INTO saved_items (user_id, category, subject, content_type, content) "
+                "VALUES (?, ?, ?, ?, ?)", batch)
+
+
+def per_call_connect(db_path: str, item_id: int) -> None:
+    """ההתנהגות הקודמת: פתיחת חיבור חדש לכל פעולה"""
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute('SELECT * FROM saved_items WHERE id = ?', (item_id,)).fetchone()
+        row = conn.execute('SELECT is_pinned FROM saved_items WHERE id = ?', (item_id,)).fetchone()
+        conn.execute('UPDATE saved_items SET is_pinned = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                     (not row[0], item_id))
+        conn.commit()
+    conn.close()
+
+
+def pooled(db: Database, item_id: int) -> None:
+    """אותן פעולות דרך המאגר"""
+    with db.pool.reader() as conn:
+        conn.execute('SELECT * FROM saved_items WHERE id = ?', (item_id,)).fetchone()
+    with db.pool.writer() as conn:
+        row = conn.execute('SELECT is_pinned FROM saved_items WHERE id = ?', (item_id,)).fetchone()
+        conn.execute('UPDATE saved_items SET is_pinned = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                     (not row[0], item_id))
+
+
+def measure(fn, calls: int, max_id: int) -> list:
+    samples = []
+    for _ in range(calls):
+        item_id = random.randint(1, max_id)
+        start = time.perf_counter()
+        fn(item_id)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]  # noqa: E731
+    print(f"{name:<16} mean={statistics.mean(samples):8.1f}us  p50={p(0.5):8.1f}us  "
+          f"p95={p(0.95):8.1f}us  p99={p(0.99):8.1f}us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--db', default=None, help="נתיב לקובץ קיים (ברירת מחדל: קובץ זמני)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.db')
+    db = Database(db_path)
+    with db.pool.reader() as conn:
+        existing = conn.execute('SELECT COUNT(*) FROM saved_items').fetchone()[0]
+    if existing < args.rows:
+        print(f"Seeding {args.rows - existing} rows into {db_path}...")
+        seed(db, args.rows - existing, args.users)
+
+    report('per-call connect', measure(lambda i: per_call_connect(db_path, i), args.calls, args.rows))
+    report('pooled', measure(lambda i: pooled(db, i), args.calls, args.rows))
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""מדידת זיכרון בייצוא: ייצוא של מיליון פריטים למשתמש אחד תחת תקרת RSS קבועה.
+
+כל ייצוא רץ בתהליך נפרד, כך שהמדידה משקפת רק את הייצוא ולא את מילוי הנתונים.
+נמדד הזיכרון האנונימי (RssAnon) - דפי קובץ ה-DB שממופים ב-mmap נספרים ב-RSS
+אבל שייכים ל-page cache ואפשר לשחרר אותם בכל רגע.
+
+הרצה:
+    python -m benchmarks.export_bench --rows 1000000 --max-rss-mb 64
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.db_pool_bench import seed
+from database.database_manager import Database
+from database.exporter import export_user_items
+
+
+def anon_rss_mb() -> float:
+    """זיכרון אנונימי נוכחי, או ru_maxrss אם אין /proc"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss מדווח ב-KiB בלינוקס
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_export(db_path: str, fmt: str, compress: bool, result: "multiprocessing.Queue") -> None:
+    db = Database(db_path)
+    baseline = peak = anon_rss_mb()
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(0.01):
+            peak = max(peak, anon_rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    export_file, filename, count = export_user_items(db, 0, fmt, compress)
+    export_file.seek(0, os.SEEK_END)
+    size = export_file.tell()
+    export_file.close()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    db.close()
+    result.put((filename, count, size, elapsed, baseline, max(peak, anon_rss_mb())))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--max-rss-mb', type=float, default=64.0)
+    parser.add_argument('--db', default=None, help="נתיב לקובץ קיים (ברירת מחדל: קובץ זמני)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'export_bench.db')
+    db = Database(db_path)
+    existing = db.get_user_stats(0).get('total_items', 0)
+    if existing < args.rows:
+        print(f"Seeding {args.rows - existing} rows for user 0 into {db_path}...")
+        seed(db, args.rows - existing, users=1)
+    db.close()
+
+    failed = False
+    for fmt, compress in (('json', False), ('csv', False), ('json', True), ('csv', True)):
+        result = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=run_export, args=(db_path, fmt, compress, result))
+        proc.start()
+        filename, count, size, elapsed, baseline, peak = result.get()
+        proc.join()
+        ok = peak <= args.max_rss_mb
+        failed |= not ok
+        print(f"{filename.split('.', 1)[1]:<12} rows={count} size={size / 1e6:7.1f}MB "
+              f"time={elapsed:6.1f}s anon_start={baseline:6.1f}MB anon_peak={peak:6.1f}MB "
+              f"{'OK' if ok else 'OVER LIMIT'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
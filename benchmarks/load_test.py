@@ -0,0 +1,533 @@
+"""עומס על שני הבוטים מול שרת Bot API מדומה מקומי.
+
+השרת המדומה (Starlette ב-thread נפרד) עונה ל-getMe, sendMessage, editMessageText,
+answerCallbackQuery ודומיהן, ואוכף מגבלות קצב בסגנון טלגרם: 30 הודעות בשנייה לבוט
+ו-1 בשנייה לכל צ'אט (עם פרץ קטן). מעבר להן מוחזר 429 עם retry_after.
+
+N משתמשים מדומים שולחים עדכונים ישירות ל-Application.process_update, כל משתמש עדכון
+אחרי עדכון: שמירה (תוכן → קטגוריה → נושא → אישור), עיון בקטגוריה ודפדוף, חיפוש,
+ובבוט המנויים (רק עם --mongo-uri) הוספה, הצגה ומחיקה. לחיצה על כפתור נלקחת מהמקלדת
+האחרונה שהבוט שלח לאותו צ'אט, כמו משתמש אמיתי.
+
+לכל גודל מסד (ברירת מחדל 1k, 100k ו-1M פריטים) נמדדים p50/p95/p99 לכל צעד ו-updates/sec,
+והתוצאות נכתבות ל-JSON להשוואה בין הרצות.
+
+הרצה:
+    python -m benchmarks.load_test --users 200 --rounds 3 --output load_test.json
+    python -m benchmarks.load_test --items 1000 100000 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+import save_me
+import subscriber_tracking
+from benchmarks.db_pool_bench import seed
+from bot_request import shared_requests
+from database import mongo_client
+from database.billing_dates import next_charge_date
+from database.database_manager import Database
+from database.delivery_schedule import DEFAULT_REMINDER_HOUR, DEFAULT_TIMEZONE, delivery_bucket
+
+SAVE_ME_TOKEN = "100001:load-test-save-me"
+SUBSCRIPTIONS_TOKEN = "100002:load-test-subscriptions"
+
+# שיטות ששולחות/עורכות הודעה - רק עליהן חלות מגבלות הקצב
+LIMITED_PREFIXES = ("send", "edit", "copyMessage", "forwardMessage")
+
+
+# --- שרת Bot API מדומה ---
+class TokenBucket:
+    """rate אסימונים בשנייה, עד capacity בפרץ"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """0 אם יש אסימון פנוי, אחרת השניות עד שיהיה"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class FakeBotAPI:
+    """Bot API מקומי שעונה מיד (או אחרי latency) ושומר את המקלדת האחרונה לכל צ'אט"""
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, latency: float):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._global = TokenBucket(self.global_rate, self.global_rate)
+            self._chats: Dict[int, TokenBucket] = {}
+            # chat_id -> (message_id, callback_data של הכפתורים)
+            self._keyboards: Dict[int, Tuple[int, List[str]]] = {}
+            self._last_message: Dict[int, int] = {}
+            self.calls: Dict[str, int] = defaultdict(int)
+            self.rate_limited: Dict[str, int] = defaultdict(int)
+
+    # --- צד המשתמשים המדומים ---
+    def keyboard(self, chat_id: int) -> Tuple[int, List[str]]:
+        with self._lock:
+            return self._keyboards.get(chat_id, (self._last_message.get(chat_id, 1), []))
+
+    def last_message_id(self, chat_id: int) -> int:
+        with self._lock:
+            return self._last_message.get(chat_id, 1)
+
+    # --- צד השרת ---
+    @staticmethod
+    def bot_user(token: str) -> Dict[str, Any]:
+        bot_id = int(token.split(":", 1)[0])
+        return {
+            "id": bot_id, "is_bot": True, "first_name": "Load test", "username": f"load_test_{bot_id}_bot",
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+        }
+
+    @staticmethod
+    async def _params(request: Request) -> Dict[str, Any]:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            return await request.json()
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            # PTB שולח כל ערך שאינו מחרוזת כ-JSON (reply_markup, chat_id)
+            return dict(parse_qsl((await request.body()).decode("utf-8")))
+        # multipart (העלאת קבצים) - התוכן לא מעניין כאן
+        return {}
+
+    def _throttle(self, chat_id: Optional[int]) -> float:
+        now = time.monotonic()
+        wait = self._global.wait_time(now)
+        chat = None
+        if chat_id is not None:
+            chat = self._chats.setdefault(chat_id, TokenBucket(self.chat_rate, self.chat_burst))
+            wait = max(wait, chat.wait_time(now))
+        if wait:
+            return wait
+        self._global.take()
+        if chat:
+            chat.take()
+        return 0.0
+
+    def _remember_keyboard(self, chat_id: int, message_id: int, markup: Any, edited: bool) -> None:
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        rows = (markup or {}).get("inline_keyboard")
+        if rows:
+            buttons = [button["callback_data"] for row in rows for button in row if "callback_data" in button]
+            self._keyboards[chat_id] = (message_id, buttons)
+        elif edited and self._keyboards.get(chat_id, (None,))[0] == message_id:
+            # עריכה בלי מקלדת מסירה את הכפתורים מההודעה
+            self._keyboards[chat_id] = (message_id, [])
+
+    def _result(self, token: str, method: str, params: Dict[str, Any], chat_id: Optional[int]) -> Any:
+        if method == "getMe":
+            return self.bot_user(token)
+        if chat_id is None:
+            return True
+        if method.startswith("send") or method == "copyMessage":
+            message_id = next(self._message_ids)
+            self._last_message[chat_id] = message_id
+            self._remember_keyboard(chat_id, message_id, params.get("reply_markup"), edited=False)
+            if method == "copyMessage":
+                return {"message_id": message_id}
+        elif method.startswith("edit") and "message_id" in params:
+            message_id = int(params["message_id"])
+            self._remember_keyboard(chat_id, message_id, params.get("reply_markup"), edited=True)
+        else:
+            return True
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self.bot_user(token),
+            "text": params.get("text", ""),
+        }
+
+    async def handle(self, request: Request) -> Response:
+        token, method = request.path_params["token"], request.path_params["method"]
+        params = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+        with self._lock:
+            self.calls[method] += 1
+            if method.startswith(LIMITED_PREFIXES):
+                wait = self._throttle(chat_id)
+                if wait:
+                    self.rate_limited[method] += 1
+                    retry_after = math.ceil(wait)
+                    return JSONResponse({
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    }, status_code=429)
+            result = self._result(token, method, params, chat_id)
+        return JSONResponse({"ok": True, "result": result})
+
+    def start(self, port: int) -> str:
+        app = Starlette(routes=[Route("/bot{token}/{method}", self.handle, methods=["GET", "POST"])])
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+        self._server = _ThreadedServer(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-bot-api", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"Fake Bot API failed to start on port {port}")
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+class _ThreadedServer(uvicorn.Server):
+    # signal handlers אפשר להתקין רק ב-thread הראשי
+    def install_signal_handlers(self) -> None:
+        pass
+
+
+# --- מדידה ---
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.missing_buttons: Dict[str, int] = defaultdict(int)
+
+    def add(self, bot: str, step: str, seconds: float) -> None:
+        self.samples[(bot, step)].append(seconds)
+
+    async def on_error(self, update: object, context: Any) -> None:
+        self.errors[type(context.error).__name__] += 1
+
+    @property
+    def updates(self) -> int:
+        return sum(len(samples) for samples in self.samples.values())
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+# --- משתמשים מדומים ---
+_update_ids = itertools.count(1)
+_user_message_ids = itertools.count(1)
+
+
+class SimulatedUser:
+    def __init__(self, user_id: int, bots: Dict[str, Application], api: FakeBotAPI,
+                 recorder: Recorder, items: int, think: float):
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+        self.bots = bots
+        self.api = api
+        self.recorder = recorder
+        self.items = items
+        self.think = think
+
+    async def _process(self, bot: str, step: str, data: Dict[str, Any]) -> None:
+        application = self.bots[bot]
+        update = Update.de_json(dict(data, update_id=next(_update_ids)), application.bot)
+        started = time.perf_counter()
+        await application.process_update(update)
+        self.recorder.add(bot, step, time.perf_counter() - started)
+        if self.think:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.think)
+
+    async def send_text(self, bot: str, step: str, text: str) -> None:
+        await self._process(bot, step, {"message": {
+            "message_id": next(_user_message_ids), "date": int(time.time()),
+            "chat": self.chat, "from": self.user, "text": text,
+        }})
+
+    async def click(self, bot: str, step: str, data: Optional[str] = None, prefix: Optional[str] = None) -> bool:
+        """לחיצה על data, או על כפתור אקראי שמתחיל ב-prefix מהמקלדת האחרונה"""
+        if data is None:
+            message_id, buttons = self.api.keyboard(self.chat["id"])
+            choices = [button for button in buttons if button.startswith(prefix)]
+            if not choices:
+                self.recorder.missing_buttons[f"{bot}/{step}"] += 1
+                return False
+            data = random.choice(choices)
+        else:
+            message_id = self.api.last_message_id(self.chat["id"])
+        bot_user = FakeBotAPI.bot_user(self.bots[bot].bot.token)
+        await self._process(bot, step, {"callback_query": {
+            "id": str(next(_update_ids)), "from": self.user, "chat_instance": str(self.chat["id"]), "data": data,
+            "message": {"message_id": message_id, "date": int(time.time()), "chat": self.chat,
+                        "from": bot_user, "text": "."},
+        }})
+        return True
+
+    # --- save_me ---
+    async def save_flow(self) -> None:
+        await self.send_text("save_me", "save.menu", "➕ הוסף תוכן")
+        await self.send_text("save_me", "save.content", f"load test note {random.getrandbits(32):x}")
+        if not await self.click("save_me", "save.category", prefix="cat_"):
+            await self.click("save_me", "save.new_category", prefix="new_category")
+            await self.send_text("save_me", "save.category_name", "load test")
+        await self.send_text("save_me", "save.subject", f"subject {random.randrange(self.items or 1)}")
+        await self.click("save_me", "save.confirm", prefix="confirm_save")
+
+    async def browse_flow(self) -> None:
+        await self.send_text("save_me", "browse.categories", "📚 הצג לפי קטגוריה")
+        if not await self.click("save_me", "browse.category", prefix="showcat_"):
+            return
+        await self.click("save_me", "browse.next_page", prefix="catpage_next_")
+        await self.click("save_me", "browse.item", prefix="show_")
+
+    async def search_flow(self) -> None:
+        await self.send_text("save_me", "search.menu", "🔍 חיפוש")
+        # מונח שמופיע בכל הפריטים של המשתמש, או צירוף נדיר
+        query = random.choice(["content", f"subject {random.randrange(self.items or 1)}"])
+        await self.send_text("save_me", "search.query", query)
+
+    # --- subscriptions ---
+    async def subscription_flows(self) -> None:
+        await self.click("subscriptions", "subs.add_start", data="add_sub_start")
+        await self.send_text("subscriptions", "subs.name", f"service {random.getrandbits(16):x}")
+        await self.send_text("subscriptions", "subs.day", str(random.randint(1, 31)))
+        await self.send_text("subscriptions", "subs.cost", f"{random.uniform(5, 100):.2f}")
+        await self.click("subscriptions", "subs.currency", prefix="currency_")
+        await self.click("subscriptions", "subs.list", data="my_subs")
+        await self.click("subscriptions", "subs.delete_menu", data="delete_sub_menu")
+        await self.click("subscriptions", "subs.delete", prefix="delete_")
+
+    async def run(self, rounds: int) -> None:
+        # פיזור ההתחלה, כדי שכל המשתמשים לא ילחצו באותו רגע
+        await asyncio.sleep(random.uniform(0, self.think))
+        for _ in range(rounds):
+            await self.save_flow()
+            await self.browse_flow()
+            await self.search_flow()
+            if "subscriptions" in self.bots:
+                await self.subscription_flows()
+
+
+# --- הכנת המסדים ---
+def seed_sqlite(path: str, items: int, users: int) -> None:
+    db = Database(db_path=path)
+    try:
+        # פריטים למשתמשים 0..users, המשתמשים המדומים הם 1..users
+        seed(db, items, users + 1)
+    finally:
+        db.close()
+
+
+def seed_subscriptions(items: int, users: int) -> None:
+    """מנויים באותה צורה ש-add_subscription כותב, באצוות"""
+    database = mongo_client.get_database()
+    bucket = delivery_bucket(DEFAULT_TIMEZONE, DEFAULT_REMINDER_HOUR)
+    now = datetime.now()
+    batch = []
+    for i in range(items):
+        billing_day = i % 28 + 1
+        batch.append({
+            "chat_id": i % (users + 1),
+            "service_name": f"service {i}",
+            "billing_day": billing_day,
+            "cost": float(i % 100),
+            "currency": "₪",
+            "next_charge_date": next_charge_date(billing_day, now),
+            "last_reminded_for": None,
+            "delivery_tz": DEFAULT_TIMEZONE,
+            "delivery_hour": DEFAULT_REMINDER_HOUR,
+            "delivery_bucket": bucket,
+        })
+        if len(batch) >= 10000:
+            database.subscriptions.insert_many(batch, ordered=False)
+            batch.clear()
+    if batch:
+        database.subscriptions.insert_many(batch, ordered=False)
+
+
+async def start_bots(bots: Dict[str, Application], recorder: Recorder) -> None:
+    # בלי application.start(): העדכונים מוזרמים ישירות, וה-job queue (תזכורות, daily_check)
+    # לא רץ ולא מערבב עבודת רקע במדידה
+    for application in bots.values():
+        application.add_error_handler(recorder.on_error)
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+
+
+async def stop_bots(bots: Dict[str, Application]) -> None:
+    for name, application in bots.items():
+        try:
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error while stopping bot '{name}': {e}")
+
+
+async def run_scale(args: argparse.Namespace, api: FakeBotAPI, items: int) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        started = time.perf_counter()
+        db_path = os.path.join(workdir, "save_me.db")
+        seed_sqlite(db_path, items, args.users)
+        os.environ["DATABASE_URL"] = db_path
+        if args.mongo_uri:
+            mongo_client.get_client().drop_database(args.mongo_db)
+            seed_subscriptions(items, args.users)
+        seed_seconds = time.perf_counter() - started
+
+        # כמו main.py: מאגר HTTP אחד לשני הבוטים
+        request, get_updates_request = shared_requests()
+        bots = {"save_me": save_me.build_application(SAVE_ME_TOKEN, request, get_updates_request)}
+        if args.mongo_uri:
+            bots["subscriptions"] = subscriber_tracking.build_application(
+                SUBSCRIPTIONS_TOKEN, request, get_updates_request
+            )
+
+        recorder = Recorder()
+        api.reset()
+        await start_bots(bots, recorder)
+        try:
+            users = [SimulatedUser(user_id, bots, api, recorder, items, args.think)
+                     for user_id in range(1, args.users + 1)]
+            started = time.perf_counter()
+            await asyncio.gather(*(user.run(args.rounds) for user in users))
+            elapsed = time.perf_counter() - started
+        finally:
+            await stop_bots(bots)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    per_bot: Dict[str, List[float]] = defaultdict(list)
+    for (bot, _), samples in recorder.samples.items():
+        per_bot[bot].extend(samples)
+    return {
+        "items": items,
+        "users": args.users,
+        "rounds": args.rounds,
+        "seed_seconds": round(seed_seconds, 2),
+        "elapsed_seconds": round(elapsed, 3),
+        "updates": recorder.updates,
+        "updates_per_sec": round(recorder.updates / elapsed, 2) if elapsed else None,
+        "errors": dict(recorder.errors),
+        "missing_buttons": dict(recorder.missing_buttons),
+        "api_calls": dict(api.calls),
+        "api_rate_limited": dict(api.rate_limited),
+        "bots": {bot: summarize(samples) for bot, samples in per_bot.items()},
+        "steps": {f"{bot}/{step}": summarize(samples) for (bot, step), samples in sorted(recorder.samples.items())},
+    }
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    print(f"\n=== {run['items']:,} items, {run['users']} users x {run['rounds']} rounds "
+          f"(seed {run['seed_seconds']}s) ===")
+    print(f"{run['updates']} updates in {run['elapsed_seconds']}s -> {run['updates_per_sec']} updates/sec; "
+          f"errors {run['errors'] or 0}; 429s {sum(run['api_rate_limited'].values())}")
+    print(f"{'step':<36}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in run["steps"].items():
+        print(f"{step:<36}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+async def run_all(args: argparse.Namespace) -> Dict[str, Any]:
+    api = FakeBotAPI(args.global_rate, args.chat_rate, args.chat_burst, args.api_latency_ms / 1000)
+    os.environ["TELEGRAM_API_URL"] = api.start(args.port)
+    try:
+        runs = []
+        for items in args.items:
+            run = await run_scale(args, api, items)
+            print_run(run)
+            runs.append(run)
+    finally:
+        api.stop()
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "mongo_uri"},
+        "runs": runs,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help="גדלי המסד למדידה (פריטים ב-SQLite ומנויים ב-Mongo)")
+    parser.add_argument('--users', type=int, default=100, help="משתמשים מדומים במקביל")
+    parser.add_argument('--rounds', type=int, default=3, help="סבבי תרחישים לכל משתמש")
+    parser.add_argument('--think', type=float, default=1.0, help="זמן ממוצע בשניות בין עדכונים של אותו משתמש")
+    parser.add_argument('--api-latency-ms', type=float, default=30.0, help="השהיית רשת מדומה לכל קריאת API")
+    parser.add_argument('--global-rate', type=float, default=30.0, help="הודעות בשנייה לכל בוט")
+    parser.add_argument('--chat-rate', type=float, default=1.0, help="הודעות בשנייה לכל צ'אט")
+    parser.add_argument('--chat-burst', type=float, default=5.0, help="פרץ מותר לכל צ'אט")
+    parser.add_argument('--port', type=int, default=8081, help="פורט השרת המדומה")
+    parser.add_argument('--mongo-uri', default=None, help="גם בוט המנויים; בלי זה רק save_me")
+    parser.add_argument('--mongo-db', default="SubscriptionBotLoadTest",
+                        help="מסד ייעודי למדידה - נמחק ונבנה מחדש לכל גודל")
+    parser.add_argument('--output', default="load_test_results.json")
+    args = parser.parse_args()
+    if args.mongo_uri:
+        if args.mongo_db == mongo_client.DEFAULT_DB_NAME:
+            parser.error("--mongo-db must not be the production database")
+        os.environ["MONGO_URI"] = args.mongo_uri
+        os.environ["MONGO_DB_NAME"] = args.mongo_db
+
+    # הבוטים קוראים ל-basicConfig ברמת INFO כשהם מיובאים; כאן רק אזהרות, בלי שורה לכל קריאת API
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING,
+                        force=True)
+    results = asyncio.run(run_all(args))
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(results, output, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
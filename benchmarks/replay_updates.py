@@ -0,0 +1,59 @@
+"""שליחת עדכונים מוקלטים לשרת ה-webhook המקומי, עם ה-secret token של הבוט.
+
+קובץ העדכונים הוא JSON lines - אובייקט Update של טלגרם בכל שורה.
+
+הרצה (השרת רץ עם BOT_MODE=webhook ובלי WEBHOOK_URL):
+    BOT_TOKEN=... python -m benchmarks.replay_updates updates.ndjson --bot save_me
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from web_server import SECRET_TOKEN_HEADER, webhook_secret
+
+
+def post_update(url: str, secret: str, update: dict) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode('utf-8'),
+        headers={"Content-Type": "application/json", SECRET_TOKEN_HEADER: secret},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('updates', help="קובץ JSON lines של עדכונים")
+    parser.add_argument('--bot', required=True, help="שם הבוט בנתיב /webhook/<bot>")
+    parser.add_argument('--token', default=os.environ.get('BOT_TOKEN'), help="הטוקן שממנו נגזר ה-secret")
+    parser.add_argument('--url', default=f"http://localhost:{os.environ.get('PORT', 8080)}")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("--token or BOT_TOKEN is required")
+
+    url = f"{args.url.rstrip('/')}/webhook/{args.bot}"
+    secret = webhook_secret(args.token)
+    statuses = {}
+    started = time.perf_counter()
+    with open(args.updates, encoding='utf-8') as updates:
+        for line in updates:
+            if line.strip():
+                status = post_update(url, secret, json.loads(line))
+                statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - started
+    total = sum(statuses.values())
+    print(f"posted {total} updates in {elapsed:.2f}s; status counts: {statuses}")
+    return 0 if set(statuses) <= {200} else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
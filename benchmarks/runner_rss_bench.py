@@ -0,0 +1,110 @@
+"""השוואת זיכרון בין הרצת הבוטים בשני תהליכים לבין תהליך אחד (RUN_MODE של main.py).
+
+בכל מצב נטענים המודולים ונבנים שני ה-Application (בלי להתחבר לטלגרם), ואז נמדד
+ה-PSS של כל התהליכים - RSS שבו דפים משותפים בין תהליכים (אחרי fork) מחולקים ביניהם,
+כך שהסכום משקף את הזיכרון שהמכונה באמת מחזיקה. RSS מוצג לצורך השוואה.
+
+subscriber_tracking.build_application מתחבר ל-Mongo ומכין את הסכמה, ולכן צריך mongod:
+    MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=rss_bench python -m benchmarks.runner_rss_bench
+
+עדיין אין תוצאות מדודות להשוואה: ההשוואה לא הורצה מול mongod.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+FAKE_TOKENS = {"save_me": "100000:save-me-bench-token", "subscriptions": "200000:subs-bench-token"}
+
+
+def memory_kb() -> dict:
+    """PSS ו-RSS של התהליך הנוכחי, מ-smaps_rollup"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key.lower()] = int(rest.split()[0])
+    return values
+
+
+def build(name: str, request=None, get_updates_request=None):
+    import save_me
+    import subscriber_tracking
+    module = save_me if name == "save_me" else subscriber_tracking
+    return module.build_application(FAKE_TOKENS[name], request, get_updates_request)
+
+
+def measure_child(name: str, ready: "multiprocessing.Queue", done: "multiprocessing.Event") -> None:
+    application = build(name)
+    ready.put((name, memory_kb()))
+    done.wait()
+    del application
+
+
+def run_processes() -> dict:
+    """כמו main.py במצב processes: האב טוען את המודולים ועושה fork לשני ילדים"""
+    import save_me  # noqa: F401 - נטען באב כמו ב-main.py
+    import subscriber_tracking  # noqa: F401
+
+    context = multiprocessing.get_context('fork')
+    ready = context.Queue()
+    done = context.Event()
+    children = [context.Process(target=measure_child, args=(name, ready, done)) for name in FAKE_TOKENS]
+    for child in children:
+        child.start()
+    results = dict(ready.get() for _ in children)
+    results["parent"] = memory_kb()
+    done.set()
+    for child in children:
+        child.join()
+    return results
+
+
+def run_single() -> dict:
+    from bot_request import shared_requests
+
+    request, get_updates_request = shared_requests()
+    applications = [build(name, request, get_updates_request) for name in FAKE_TOKENS]
+    results = {"single": memory_kb()}
+    del applications
+    return results
+
+
+def report_child(mode: str, queue: "multiprocessing.Queue") -> None:
+    queue.put(run_processes() if mode == "processes" else run_single())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    if not os.environ.get("MONGO_URI"):
+        print("MONGO_URI is required (subscriber_tracking connects to Mongo while building)")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "bench.db")
+        totals = {}
+        # כל מצב בתהליך נקי, כדי שהמודולים שנטענו במצב אחד לא ייספרו בשני
+        context = multiprocessing.get_context('spawn')
+        for mode in ("processes", "single"):
+            queue = context.Queue()
+            runner = context.Process(target=report_child, args=(mode, queue))
+            runner.start()
+            results = queue.get()
+            runner.join()
+            for name, values in results.items():
+                print(f"{mode:>9} {name:<13} pss {values['pss'] / 1024:7.1f} MiB  rss {values['rss'] / 1024:7.1f} MiB")
+            totals[mode] = {key: sum(values[key] for values in results.values()) for key in ('pss', 'rss')}
+
+    for mode, total in totals.items():
+        print(f"{mode:>9} total         pss {total['pss'] / 1024:7.1f} MiB  rss {total['rss'] / 1024:7.1f} MiB")
+    saved = totals["processes"]["pss"] - totals["single"]["pss"]
+    print(f"single-process mode saves {saved / 1024:.1f} MiB PSS "
+          f"({saved / totals['processes']['pss']:.0%} of the two-process total)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
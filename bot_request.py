@@ -0,0 +1,60 @@
+"""מאגר חיבורי HTTP משותף ל-Bot API לכל הבוטים שרצים באותו תהליך."""
+import asyncio
+import logging
+import os
+from typing import Any, Tuple
+
+from telegram.ext import ApplicationBuilder
+
+from metrics import InstrumentedHTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# שליחות במקביל של כל הבוטים יחד (ה-daily_check לבדו שולח עד 20 במקביל)
+SHARED_POOL_SIZE = 32
+
+
+class SharedHTTPXRequest(InstrumentedHTTPXRequest):
+    """HTTPXRequest (עם מדדי Bot API) שכמה Bot יכולים להשתמש בו.
+
+    כל Bot קורא ל-initialize/shutdown של ה-request שלו. כאן נספרים המשתמשים, והלקוח
+    נסגר רק כשהאחרון מהם נסגר, כדי שבוט שנעצר ראשון לא יסגור את החיבורים של השני.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._users = 0
+        self._users_lock = asyncio.Lock()
+
+    async def initialize(self) -> None:
+        async with self._users_lock:
+            self._users += 1
+            if self._users == 1:
+                await super().initialize()
+
+    async def shutdown(self) -> None:
+        async with self._users_lock:
+            if self._users == 0:
+                return
+            self._users -= 1
+            if self._users == 0:
+                await super().shutdown()
+
+
+def shared_requests(pool_size: int = SHARED_POOL_SIZE) -> Tuple[SharedHTTPXRequest, SharedHTTPXRequest]:
+    """(request לקריאות רגילות, request ל-getUpdates). long polling מחזיק חיבור פתוח
+    לכל בוט, ולכן מקבל מאגר נפרד כדי לא לתפוס חיבורים של שליחת הודעות"""
+    return (
+        SharedHTTPXRequest(connection_pool_size=pool_size),
+        SharedHTTPXRequest(connection_pool_size=4),
+    )
+
+
+def with_api_server(builder: ApplicationBuilder) -> ApplicationBuilder:
+    """הפניית הבוט לשרת Bot API אחר לפי TELEGRAM_API_URL (למשל http://127.0.0.1:8081) -
+    שרת Bot API מקומי, או השרת המדומה של benchmarks/load_test.py"""
+    api_url = os.environ.get("TELEGRAM_API_URL")
+    if not api_url:
+        return builder
+    api_url = api_url.rstrip("/")
+    return builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
@@ -0,0 +1,115 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import logging
+
+from database.database_manager import Database
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class AsyncDatabase:
+    """עטיפה אסינכרונית ל-Database: כל שאילתה רצה ב-thread pool חסום ולא חוסמת את ה-event loop"""
+
+    def __init__(self, db: Database, max_workers: Optional[int] = None):
+        self.db = db
+        # thread אחד לכל חיבור קריאה ועוד אחד לכותב - מעבר לזה התורים רק ימתינו על המאגר
+        workers = max_workers or db.pool.readers + 1
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='save-me-db')
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """הרצת פונקציה סינכרונית כלשהי ב-executor של מסד הנתונים"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def cache_info(self) -> Dict[str, Any]:
+        """מוני מטמון הפריטים (קריאה מהזיכרון, לא צריך executor)"""
+        return self.db.cache_info()
+
+    def close(self) -> None:
+        """המתנה לסיום השאילתות הפתוחות וסגירת החיבורים"""
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    async def save_item(self, user_id: int, category: str, subject: str,
+                        content_type: str, content: str = '', file_id: str = '',
+                        file_name: str = '', caption: str = '') -> int:
+        return await self.run(self.db.save_item, user_id, category, subject, content_type,
+                              content=content, file_id=file_id, file_name=file_name, caption=caption)
+
+    async def get_item(self, item_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run(self.db.get_item, item_id)
+
+    async def get_items_by_ids(self, item_ids: List[int]) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_items_by_ids, item_ids)
+
+    async def get_user_categories(self, user_id: int) -> List[str]:
+        return await self.run(self.db.get_user_categories, user_id)
+
+    async def get_category_count(self, user_id: int, category: str) -> int:
+        return await self.run(self.db.get_category_count, user_id, category)
+
+    async def get_category_summary(self, user_id: int) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_category_summary, user_id)
+
+    async def get_category_items(self, user_id: int, category: str) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_category_items, user_id, category)
+
+    async def get_category_page(self, user_id: int, category: str, after_id: Optional[int] = None,
+                                before_id: Optional[int] = None, limit: int = 10) -> Dict[str, Any]:
+        return await self.run(self.db.get_category_page, user_id, category,
+                              after_id=after_id, before_id=before_id, limit=limit)
+
+    async def search_items(self, user_id: int, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self.run(self.db.search_items, user_id, query, limit)
+
+    async def rebuild_search_index(self) -> bool:
+        return await self.run(self.db.rebuild_search_index)
+
+    async def toggle_pin(self, item_id: int) -> bool:
+        return await self.run(self.db.toggle_pin, item_id)
+
+    async def set_reminder(self, item_id: int, reminder_time: datetime) -> bool:
+        return await self.run(self.db.set_reminder, item_id, reminder_time)
+
+    async def update_content(self, item_id: int, content_type: str, content: str = '',
+                             file_id: str = '', file_name: str = '', caption: str = '') -> bool:
+        return await self.run(self.db.update_content, item_id, content_type, content=content,
+                              file_id=file_id, file_name=file_name, caption=caption)
+
+    async def update_note(self, item_id: int, note: str) -> bool:
+        return await self.run(self.db.update_note, item_id, note)
+
+    async def delete_item(self, item_id: int) -> bool:
+        return await self.run(self.db.delete_item, item_id)
+
+    async def delete_note(self, item_id: int) -> bool:
+        return await self.run(self.db.delete_note, item_id)
+
+    async def get_pending_reminders(self) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_pending_reminders)
+
+    async def get_reminder_window(self, start: Optional[datetime], end: datetime) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_reminder_window, start, end)
+
+    async def clear_reminder(self, item_id: int) -> bool:
+        return await self.run(self.db.clear_reminder, item_id)
+
+    async def clear_reminders(self, reminders: List[Tuple[int, str]]) -> int:
+        return await self.run(self.db.clear_reminders, reminders)
+
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        return await self.run(self.db.get_user_stats, user_id)
+
+    async def check_user_stats(self, repair: bool = False) -> List[Dict[str, Any]]:
+        return await self.run(self.db.check_user_stats, repair)
+
+    async def export_user_data(self, user_id: int) -> List[Dict[str, Any]]:
+        return await self.run(self.db.export_user_data, user_id)
+
+    async def cleanup_old_reminders(self, days_old: int = 7) -> int:
+        return await self.run(self.db.cleanup_old_reminders, days_old)
@@ -0,0 +1,36 @@
+import calendar
+from datetime import datetime, timedelta
+
+
+def start_of_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _charge_in_month(billing_day: int, year: int, month: int) -> datetime:
+    """יום החיוב בחודש נתון; בחודש קצר מדי החיוב נופל ביום האחרון שלו"""
+    day = min(billing_day, calendar.monthrange(year, month)[1])
+    return datetime(year, month, day)
+
+
+def following_charge_date(billing_day: int, charge: datetime) -> datetime:
+    """החיוב שאחרי charge - לפי billing_day המקורי בחודש הבא, לא לפי היום המקוצץ"""
+    year, month = (charge.year + 1, 1) if charge.month == 12 else (charge.year, charge.month + 1)
+    return _charge_in_month(billing_day, year, month)
+
+
+def roll_forward(billing_day: int, charge: datetime, today: datetime) -> datetime:
+    """קידום חיוב עד לחיוב הראשון שלא עבר (היום עצמו נחשב כלא עבר)"""
+    today = start_of_day(today)
+    while charge < today:
+        charge = following_charge_date(billing_day, charge)
+    return charge
+
+
+def next_charge_date(billing_day: int, today: datetime) -> datetime:
+    """החיוב הקרוב שלא עבר"""
+    today = start_of_day(today)
+    return roll_forward(billing_day, _charge_in_month(billing_day, today.year, today.month), today)
+
+
+def days_until(charge: datetime, today: datetime) -> int:
+    return (start_of_day(charge) - start_of_day(today)) // timedelta(days=1)
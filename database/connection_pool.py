@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# הגדרות ביצועים לכל חיבור (ערכי cache_size שליליים הם ב-KiB)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'foreign_keys': 'ON',
+}
+
+
+class ConnectionPool:
+    """מאגר חיבורי SQLite ארוכי-טווח: כותב יחיד ומספר קוראים במצב WAL"""
+
+    def __init__(self, db_path: str, readers: int = 4, statement_cache_size: int = 256,
+                 timeout: float = 30.0,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_path = db_path
+        self.on_connect = on_connect
+        self.readers = readers
+        self.statement_cache_size = statement_cache_size
+        self.timeout = timeout
+        self._closed = False
+        self._all: List[sqlite3.Connection] = []
+        self._all_lock = threading.Lock()
+
+        # הכותב נפתח ראשון כדי שמצב WAL ייקבע לפני שהקוראים נפתחים
+        self._writer = self._connect()
+        self._writer_lock = threading.RLock()
+
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=readers)
+        for _ in range(readers):
+            self._readers.put(self._connect(read_only=True))
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """פתיחת חיבור חדש עם הגדרות הביצועים"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+            isolation_level=None,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in DEFAULT_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        if self.on_connect:
+            self.on_connect(conn)
+        with self._all_lock:
+            self._all.append(conn)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """השאלת חיבור קריאה. קוראים במצב WAL אינם חוסמים את הכותב"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        conn = self._readers.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """השאלת חיבור הכתיבה בתוך טרנזקציה (commit בהצלחה, rollback בשגיאה)"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        with self._writer_lock:
+            conn = self._writer
+            if conn.in_transaction:
+                # קריאה מקוננת מאותו thread - הטרנזקציה החיצונית תבצע commit
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close(self) -> None:
+        """סגירת כל החיבורים במאגר"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._writer_lock:
+            try:
+                self._writer.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"PRAGMA optimize failed: {e}")
+        with self._all_lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
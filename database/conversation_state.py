@@ -0,0 +1,317 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from database.connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# ערך שלא נמצא בזיכרון - צריך לקרוא מהדיסק
+MISSING = object()
+
+# תקורה משוערת של רשומה בזיכרון מעבר למחרוזת ה-JSON (מפתח, tuple, צומת ב-OrderedDict)
+ENTRY_OVERHEAD = 200
+
+StateKey = Tuple[str, str]
+# (JSON או None לרשומה שידוע שאינה קיימת, זמן תפוגה)
+Entry = Tuple[Optional[str], float]
+
+
+class ConversationStateStore:
+    """מצב שיחה לפי (namespace, key) עם תפוגה, תקרת זיכרון וכתיבה נדחית ל-SQLite, בטוח לשימוש מכמה threads.
+
+    הערכים נשמרים בזיכרון כ-JSON, כך שהתקרה נמדדת בבתים. מעבר לה נפלטות מהזיכרון הרשומות
+    שלא נגעו בהן הכי הרבה זמן, ונטענות שוב מהדיסק בגישה הבאה. כתיבות ומחיקות מצטברות
+    בבאפר ונכתבות בטרנזקציה אחת בכל flush; עד אז הן נקראות מהבאפר.
+    """
+
+    def __init__(self, pool: ConnectionPool, ttl_seconds: float = 24 * 3600,
+                 max_bytes: int = 16 * 1024 * 1024, max_pending: int = 500):
+        self.pool = pool
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self._entries: "OrderedDict[StateKey, Entry]" = OrderedDict()
+        self._sizes: Dict[StateKey, int] = {}
+        self._bytes = 0
+        self._counts: Dict[str, int] = defaultdict(int)
+        # כתיבות שעוד לא הגיעו לדיסק (None = מחיקה), והאצווה שנכתבת כרגע
+        self._pending: Dict[StateKey, Optional[Entry]] = {}
+        self._flushing: Dict[StateKey, Optional[Entry]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.init_table()
+
+    def init_table(self) -> None:
+        with self.pool.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_conversation_state_expires
+                ON conversation_state(expires_at)
+            ''')
+
+    # --- קריאה ---
+    def get_cached(self, namespace: str, key: Any) -> Any:
+        """הערך מהזיכרון או מהבאפר, None אם ידוע שאינו קיים, MISSING אם צריך לקרוא מהדיסק"""
+        state_key = (namespace, str(key))
+        with self._lock:
+            entry = self._lookup(state_key)
+            if entry is MISSING:
+                return MISSING
+            return self._decode(state_key, entry)
+
+    def get(self, namespace: str, key: Any) -> Optional[Any]:
+        """הערך, כולל קריאה מהדיסק אם צריך (חוסם - להריץ מחוץ ל-event loop)"""
+        state_key = (namespace, str(key))
+        with self._lock:
+            entry = self._lookup(state_key)
+            if entry is not MISSING:
+                return self._decode(state_key, entry)
+            generation = self._generation
+
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM conversation_state WHERE namespace = ? AND key = ?",
+                    state_key,
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading conversation state {state_key}: {e}")
+            return None
+
+        # גם היעדר נשמר בזיכרון, כדי שבדיקה חוזרת של מפתח ריק לא תגיע לדיסק
+        entry = (row['value'], row['expires_at']) if row else (None, time.time() + self.ttl_seconds)
+        with self._lock:
+            # כתיבה שהתרחשה בזמן הקריאה חדשה יותר מהשורה שנקראה
+            if generation == self._generation:
+                self._cache(state_key, entry)
+            return self._decode(state_key, entry)
+
+    def load_namespace(self, namespace: str) -> Dict[str, Any]:
+        """כל הרשומות שלא פגו ב-namespace, בלי לטעון אותן לזיכרון (חוסם)"""
+        now = time.time()
+        values: Dict[str, Any] = {}
+        try:
+            with self.pool.reader() as conn:
+                rows = conn.execute(
+                    "SELECT key, value FROM conversation_state WHERE namespace = ? AND expires_at > ?",
+                    (namespace, now),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading conversation state '{namespace}': {e}")
+            return values
+        for row in rows:
+            values[row['key']] = json.loads(row['value'])
+
+        with self._lock:
+            # מה שבבאפר ובזיכרון חדש יותר מהדיסק (ובזיכרון תמיד הגרסה האחרונה)
+            for source in (self._flushing, self._pending, self._entries):
+                for (entry_namespace, key), entry in list(source.items()):
+                    if entry_namespace != namespace:
+                        continue
+                    if entry is None or entry[0] is None or entry[1] <= now:
+                        values.pop(key, None)
+                    else:
+                        values[key] = json.loads(entry[0])
+        return values
+
+    def contains(self, namespace: str, key: Any) -> bool:
+        """האם הרשומה מוחזקת כרגע בזיכרון (בלי לעדכן את סדר הפליטה)"""
+        with self._lock:
+            return (namespace, str(key)) in self._entries
+
+    def touch(self, namespace: str, key: Any) -> None:
+        """סימון רשומה כשימוש אחרון, כדי שלא תיפלט לפני רשומות שלא נגעו בהן"""
+        with self._lock:
+            state_key = (namespace, str(key))
+            if state_key in self._entries:
+                self._entries.move_to_end(state_key)
+
+    # --- כתיבה ---
+    def set(self, namespace: str, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        state_key = (namespace, str(key))
+        blob = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        entry = (blob, time.time() + (ttl_seconds or self.ttl_seconds))
+        with self._lock:
+            self._generation += 1
+            self._pending[state_key] = entry
+            self._cache(state_key, entry)
+
+    def delete(self, namespace: str, key: Any) -> None:
+        state_key = (namespace, str(key))
+        with self._lock:
+            self._generation += 1
+            self._pending[state_key] = None
+            self._cache(state_key, (None, time.time() + self.ttl_seconds))
+
+    def should_flush(self) -> bool:
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def flush(self) -> int:
+        """כתיבת כל השינויים שבבאפר בטרנזקציה אחת (חוסם - להריץ מחוץ ל-event loop)"""
+        with self._flush_lock:
+            with self._lock:
+                self._flushing, self._pending = self._pending, {}
+                batch = self._flushing
+            if not batch:
+                return 0
+
+            upserts = [(namespace, key, entry[0], entry[1])
+                       for (namespace, key), entry in batch.items() if entry is not None]
+            deletes = [state_key for state_key, entry in batch.items() if entry is None]
+            try:
+                with self.pool.writer() as conn:
+                    conn.executemany('''
+                        INSERT INTO conversation_state (namespace, key, value, expires_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(namespace, key) DO UPDATE
+                        SET value = excluded.value, expires_at = excluded.expires_at
+                    ''', upserts)
+                    conn.executemany(
+                        "DELETE FROM conversation_state WHERE namespace = ? AND key = ?", deletes
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Failed to flush {len(batch)} conversation state changes: {e}")
+                with self._lock:
+                    # החזרה לבאפר, בלי לדרוס שינוי חדש יותר שהגיע בינתיים
+                    for state_key, entry in batch.items():
+                        self._pending.setdefault(state_key, entry)
+                    self._flushing = {}
+                return 0
+            with self._lock:
+                self._flushing = {}
+            return len(batch)
+
+    def evict_expired(self) -> Dict[str, List[str]]:
+        """מחיקת הרשומות שפגו מהזיכרון, מהבאפר ומהדיסק. מחזיר את המפתחות שנמחקו לפי namespace (חוסם)"""
+        now = time.time()
+        expired: Dict[str, set] = defaultdict(set)
+        with self._lock:
+            for state_key, (blob, expires_at) in list(self._entries.items()):
+                if expires_at <= now:
+                    self._uncache(state_key)
+                    if blob is not None:
+                        expired[state_key[0]].add(state_key[1])
+            for state_key, entry in list(self._pending.items()):
+                if entry is not None and entry[1] <= now:
+                    self._pending[state_key] = None
+                    expired[state_key[0]].add(state_key[1])
+
+        try:
+            with self.pool.writer() as conn:
+                rows = conn.execute(
+                    "DELETE FROM conversation_state WHERE expires_at <= ? RETURNING namespace, key", (now,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error evicting expired conversation state: {e}")
+            rows = []
+        for row in rows:
+            expired[row['namespace']].add(row['key'])
+
+        if expired:
+            logger.info(f"Evicted {sum(len(keys) for keys in expired.values())} expired conversation state entries")
+        return {namespace: sorted(keys) for namespace, keys in expired.items()}
+
+    # --- מונים ---
+    def count(self, namespace: str) -> int:
+        """רשומות (קיימות) בזיכרון ב-namespace"""
+        with self._lock:
+            return self._counts.get(namespace, 0)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'pending': len(self._pending),
+                'namespaces': dict(self._counts),
+            }
+
+    # --- פנימי (תחת self._lock) ---
+    def _lookup(self, state_key: StateKey) -> Any:
+        entry = self._entries.get(state_key, MISSING)
+        if entry is not MISSING:
+            self._entries.move_to_end(state_key)
+            return entry
+        # נפלט מהזיכרון אבל עוד לא נכתב לדיסק
+        for source in (self._pending, self._flushing):
+            if state_key in source:
+                entry = source[state_key]
+                return (None, float('inf')) if entry is None else entry
+        return MISSING
+
+    def _decode(self, state_key: StateKey, entry: Entry) -> Optional[Any]:
+        blob, expires_at = entry
+        if expires_at <= time.time():
+            self._uncache(state_key)
+            return None
+        return None if blob is None else json.loads(blob)
+
+    def _cache(self, state_key: StateKey, entry: Entry) -> None:
+        self._uncache(state_key)
+        size = sys.getsizeof(entry[0]) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self._entries[state_key] = entry
+        self._sizes[state_key] = size
+        self._bytes += size
+        if entry[0] is not None:
+            self._counts[state_key[0]] += 1
+        while self._bytes > self.max_bytes:
+            # שינויים שעוד לא נכתבו נשארים בבאפר, כך שפליטה לא מאבדת מידע
+            oldest = next(iter(self._entries))
+            self._uncache(oldest)
+
+    def _uncache(self, state_key: StateKey) -> None:
+        entry = self._entries.pop(state_key, None)
+        if entry is None:
+            return
+        self._bytes -= self._sizes.pop(state_key)
+        if entry[0] is not None:
+            self._counts[state_key[0]] -= 1
+
+
+class StateNamespace:
+    """namespace אחד של המאגר לשימוש מה-handlers: פגיעה בזיכרון מיידית, והחטאה ו-flush
+    רצים דרך run (ה-executor של מסד הנתונים)"""
+
+    def __init__(self, store: ConversationStateStore, namespace: str,
+                 run: Callable[..., Awaitable[Any]]):
+        self.store = store
+        self.namespace = namespace
+        self.run = run
+
+    async def get(self, key: Any) -> Optional[Any]:
+        value = self.store.get_cached(self.namespace, key)
+        if value is MISSING:
+            value = await self.run(self.store.get, self.namespace, key)
+        return value
+
+    async def set(self, key: Any, value: Any) -> None:
+        self.store.set(self.namespace, key, value)
+        if self.store.should_flush():
+            await self.run(self.store.flush)
+
+    async def delete(self, key: Any) -> None:
+        self.store.delete(self.namespace, key)
+        if self.store.should_flush():
+            await self.run(self.store.flush)
+
+    def __len__(self) -> int:
+        return self.store.count(self.namespace)
@@ -1,21 +1,67 @@
 import sqlite3
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 import logging
 
+from database.connection_pool import ConnectionPool
+from database.item_cache import ItemCache
+from database.search import (
+    BM25_WEIGHTS, PINNED_BOOST, SEARCH_COLUMNS, STEMS_COLUMN, TOKENIZER, build_match_query, register_functions
+)
+
 logger = logging.getLogger(__name__)
 
+# מספר מזהים מקסימלי בפסוקית IN אחת
+SQL_BATCH_SIZE = 500
+
+USER_STATS_FIELDS = ('user_id', 'total_items', 'pinned_items', 'total_categories',
+                     'active_reminders', 'items_with_notes')
+
+# חישוב מלא של user_stats מתוך saved_items (לאתחול ולבדיקת עקביות)
+USER_STATS_RECOMPUTE = '''
+    SELECT user_id,
+           COUNT(*) AS total_items,
+           SUM(CASE WHEN is_pinned THEN 1 ELSE 0 END) AS pinned_items,
+           COUNT(DISTINCT category) AS total_categories,
+           SUM(CASE WHEN reminder_at IS NOT NULL THEN 1 ELSE 0 END) AS active_reminders,
+           SUM(CASE WHEN COALESCE(note, '') != '' THEN 1 ELSE 0 END) AS items_with_notes
+    FROM saved_items
+    GROUP BY user_id
+'''
+
 class Database:
-    def __init__(self, db_path: str = "save_me_bot.db"):
+    def __init__(self, db_path: str = "save_me_bot.db", pool_size: int = 4,
+                 item_cache_size: int = 1024):
         """אתחול מסד הנתונים"""
         self.db_path = db_path
+        self.item_cache = ItemCache(item_cache_size)
+        self.pool = ConnectionPool(db_path, readers=pool_size, on_connect=register_functions)
+        self.fts_enabled = False
         self.init_database()
+
+    def close(self) -> None:
+        """סגירת מאגר החיבורים"""
+        self.pool.close()
+
+    def cache_info(self) -> Dict[str, Any]:
+        """מוני פגיעה/החטאה של מטמון הפריטים"""
+        return self.item_cache.info()
+
+    def _cache_write(self, item_id: int, row: Optional[sqlite3.Row]) -> None:
+        """עדכון המטמון במצב שהוחזר מ-RETURNING (או הסרה אם השורה לא קיימת).
+
+        נקרא בתוך בלוק ה-writer, כדי ששתי כתיבות לאותו פריט יגיעו למטמון בסדר ה-commit.
+        """
+        if row is None:
+            self.item_cache.invalidate(item_id)
+        else:
+            self.item_cache.put(item_id, dict(row))
     
     def init_database(self) -> None:
         """יצירת טבלאות מסד הנתונים"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 # טבלת פריטים שמורים
@@ -55,19 +101,321 @@ class Database:
                     WHERE reminder_at IS NOT NULL
                 ''')
                 
-                conn.commit()
+                # אינדקס מכסה לדפדוף בקטגוריה לפי (is_pinned, created_at, id)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_category_page 
+                    ON saved_items(user_id, category, is_pinned, created_at, id, subject)
+                ''')
+
+                self._init_category_stats(cursor)
+                self._init_user_stats(cursor)
+                self.fts_enabled = self._init_search_index(cursor)
+                
                 logger.info("Database initialized successfully")
                 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
             raise
     
+    @staticmethod
+    def _table_exists(cursor: sqlite3.Cursor, name: str) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+        return cursor.fetchone() is not None
+
+    def _init_category_stats(self, cursor: sqlite3.Cursor) -> None:
+        """טבלת מונים לכל קטגוריה של משתמש, מתעדכנת בטריגרים על saved_items"""
+        needs_backfill = not self._table_exists(cursor, 'category_stats')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS category_stats (
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                item_count INTEGER NOT NULL DEFAULT 0,
+                pinned_count INTEGER NOT NULL DEFAULT 0,
+                last_updated DATETIME,
+                PRIMARY KEY (user_id, category)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_stats_insert AFTER INSERT ON saved_items BEGIN
+                INSERT INTO category_stats (user_id, category, item_count, pinned_count, last_updated)
+                VALUES (new.user_id, new.category, 1,
+                        CASE WHEN new.is_pinned THEN 1 ELSE 0 END, new.updated_at)
+                ON CONFLICT (user_id, category) DO UPDATE SET
+                    item_count = item_count + 1,
+                    pinned_count = pinned_count + excluded.pinned_count,
+                    last_updated = excluded.last_updated;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_stats_delete AFTER DELETE ON saved_items BEGIN
+                UPDATE category_stats SET
+                    item_count = item_count - 1,
+                    pinned_count = pinned_count - CASE WHEN old.is_pinned THEN 1 ELSE 0 END,
+                    last_updated = CURRENT_TIMESTAMP
+                WHERE user_id = old.user_id AND category = old.category;
+                DELETE FROM category_stats
+                WHERE user_id = old.user_id AND category = old.category AND item_count <= 0;
+            END
+        ''')
+        # עדכון בתוך אותה קטגוריה - רק מונה הקבועים וזמן העדכון משתנים
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_stats_update AFTER UPDATE ON saved_items
+            WHEN old.user_id = new.user_id AND old.category = new.category BEGIN
+                UPDATE category_stats SET
+                    pinned_count = pinned_count
+                        + CASE WHEN new.is_pinned THEN 1 ELSE 0 END
+                        - CASE WHEN old.is_pinned THEN 1 ELSE 0 END,
+                    last_updated = new.updated_at
+                WHERE user_id = new.user_id AND category = new.category;
+            END
+        ''')
+        # מעבר בין קטגוריות (או משתמשים) - הפחתה מהישנה והוספה לחדשה
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_stats_move AFTER UPDATE ON saved_items
+            WHEN old.user_id != new.user_id OR old.category != new.category BEGIN
+                UPDATE category_stats SET
+                    item_count = item_count - 1,
+                    pinned_count = pinned_count - CASE WHEN old.is_pinned THEN 1 ELSE 0 END,
+                    last_updated = new.updated_at
+                WHERE user_id = old.user_id AND category = old.category;
+                DELETE FROM category_stats
+                WHERE user_id = old.user_id AND category = old.category AND item_count <= 0;
+                INSERT INTO category_stats (user_id, category, item_count, pinned_count, last_updated)
+                VALUES (new.user_id, new.category, 1,
+                        CASE WHEN new.is_pinned THEN 1 ELSE 0 END, new.updated_at)
+                ON CONFLICT (user_id, category) DO UPDATE SET
+                    item_count = item_count + 1,
+                    pinned_count = pinned_count + excluded.pinned_count,
+                    last_updated = excluded.last_updated;
+            END
+        ''')
+
+        if needs_backfill:
+            cursor.execute('''
+                INSERT INTO category_stats (user_id, category, item_count, pinned_count, last_updated)
+                SELECT user_id, category, COUNT(*),
+                       SUM(CASE WHEN is_pinned THEN 1 ELSE 0 END), MAX(updated_at)
+                FROM saved_items
+                GROUP BY user_id, category
+            ''')
+            logger.info(f"Category stats backfilled with {cursor.rowcount} categories")
+
+    def _init_user_stats(self, cursor: sqlite3.Cursor) -> None:
+        """טבלת סיכום לכל משתמש, מתעדכנת בטריגרים בכל שינוי בפריטים או בקטגוריות"""
+        needs_backfill = not self._table_exists(cursor, 'user_stats')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INTEGER PRIMARY KEY,
+                total_items INTEGER NOT NULL DEFAULT 0,
+                pinned_items INTEGER NOT NULL DEFAULT 0,
+                total_categories INTEGER NOT NULL DEFAULT 0,
+                active_reminders INTEGER NOT NULL DEFAULT 0,
+                items_with_notes INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        def flags(row: str) -> str:
+            return (f"CASE WHEN {row}.is_pinned THEN 1 ELSE 0 END, "
+                    f"CASE WHEN {row}.reminder_at IS NOT NULL THEN 1 ELSE 0 END, "
+                    f"CASE WHEN COALESCE({row}.note, '') != '' THEN 1 ELSE 0 END")
+
+        add_new = f'''
+            INSERT INTO user_stats (user_id, total_items, pinned_items, active_reminders, items_with_notes)
+            VALUES (new.user_id, 1, {flags('new')})
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_items = total_items + 1,
+                pinned_items = pinned_items + excluded.pinned_items,
+                active_reminders = active_reminders + excluded.active_reminders,
+                items_with_notes = items_with_notes + excluded.items_with_notes;
+        '''
+        remove_old = '''
+            UPDATE user_stats SET
+                total_items = total_items - 1,
+                pinned_items = pinned_items - CASE WHEN old.is_pinned THEN 1 ELSE 0 END,
+                active_reminders = active_reminders - CASE WHEN old.reminder_at IS NOT NULL THEN 1 ELSE 0 END,
+                items_with_notes = items_with_notes - CASE WHEN COALESCE(old.note, '') != '' THEN 1 ELSE 0 END
+            WHERE user_id = old.user_id;
+        '''
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_stats_insert AFTER INSERT ON saved_items BEGIN
+                {add_new}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_stats_delete AFTER DELETE ON saved_items BEGIN
+                {remove_old}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_stats_update
+            AFTER UPDATE OF user_id, is_pinned, reminder_at, note ON saved_items BEGIN
+                {remove_old}
+                {add_new}
+            END
+        ''')
+        # מספר הקטגוריות נגזר מהוספה/מחיקה של שורות ב-category_stats
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_category_insert AFTER INSERT ON category_stats BEGIN
+                INSERT INTO user_stats (user_id, total_categories) VALUES (new.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET total_categories = total_categories + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_category_delete AFTER DELETE ON category_stats BEGIN
+                UPDATE user_stats SET total_categories = total_categories - 1
+                WHERE user_id = old.user_id;
+            END
+        ''')
+
+        if needs_backfill:
+            cursor.execute(f'''
+                INSERT INTO user_stats ({', '.join(USER_STATS_FIELDS)})
+                {USER_STATS_RECOMPUTE}
+            ''')
+            logger.info(f"User stats backfilled for {cursor.rowcount} users")
+
+    def check_user_stats(self, repair: bool = False) -> List[Dict[str, Any]]:
+        """השוואת user_stats לחישוב מחדש במעבר GROUP BY אחד. מחזיר רשימת סטיות"""
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT * FROM user_stats')
+                stored = {row['user_id']: dict(row) for row in cursor.fetchall()}
+                cursor.execute(USER_STATS_RECOMPUTE)
+                actual = {row['user_id']: dict(row) for row in cursor.fetchall()}
+
+                drift = []
+                empty = dict.fromkeys(USER_STATS_FIELDS[1:], 0)
+                for user_id in sorted(stored.keys() | actual.keys()):
+                    have = stored.get(user_id, empty)
+                    want = actual.get(user_id, empty)
+                    for field in USER_STATS_FIELDS[1:]:
+                        if have[field] != want[field]:
+                            drift.append({'user_id': user_id, 'field': field,
+                                          'stored': have[field], 'actual': want[field]})
+
+                if drift and repair:
+                    cursor.execute('DELETE FROM user_stats')
+                    cursor.execute(f'''
+                        INSERT INTO user_stats ({', '.join(USER_STATS_FIELDS)})
+                        {USER_STATS_RECOMPUTE}
+                    ''')
+                    logger.warning(f"User stats rebuilt, fixed {len(drift)} drifted values")
+                return drift
+
+        except Exception as e:
+            logger.error(f"Error checking user stats: {e}")
+            raise
+
+    def _init_search_index(self, cursor: sqlite3.Cursor) -> bool:
+        """יצירת טבלת FTS5 לחיפוש וטריגרים שמסנכרנים אותה עם saved_items"""
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+        except sqlite3.OperationalError:
+            logger.warning("SQLite was built without FTS5, search falls back to LIKE")
+            return False
+
+        if self._table_exists(cursor, 'saved_items_fts'):
+            cursor.execute("PRAGMA table_info(saved_items_fts)")
+            if STEMS_COLUMN not in {row['name'] for row in cursor.fetchall()}:
+                # אינדקס מלפני עמודת הצורות בלי אותיות שימוש - נבנה מחדש
+                for trigger in ('saved_items_fts_insert', 'saved_items_fts_delete', 'saved_items_fts_update'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                cursor.execute("DROP TABLE saved_items_fts")
+                cursor.execute("DROP VIEW IF EXISTS saved_items_search_source")
+                logger.info("Rebuilding search index with prefix-letter stems")
+
+        needs_backfill = not self._table_exists(cursor, 'saved_items_fts')
+        columns = ', '.join(SEARCH_COLUMNS + (STEMS_COLUMN,))
+        text_columns = ', '.join(SEARCH_COLUMNS)
+        folded_new = self._indexed_values('new.')
+        folded_old = self._indexed_values('old.')
+
+        # מקור התוכן של האינדקס: owner הוא טוקן משתמש שמאפשר לסנן בתוך ה-MATCH עצמו
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS saved_items_search_source AS
+            SELECT id, 'u' || user_id AS owner, {text_columns},
+                   search_stems({text_columns}) AS {STEMS_COLUMN}
+            FROM saved_items
+        ''')
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS saved_items_fts USING fts5(
+                owner, {columns},
+                content='saved_items_search_source', content_rowid='id',
+                tokenize="{TOKENIZER}", prefix='2 3'
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS saved_items_fts_insert AFTER INSERT ON saved_items BEGIN
+                INSERT INTO saved_items_fts(rowid, owner, {columns})
+                VALUES (new.id, 'u' || new.user_id, {folded_new});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS saved_items_fts_delete AFTER DELETE ON saved_items BEGIN
+                INSERT INTO saved_items_fts(saved_items_fts, rowid, owner, {columns})
+                VALUES ('delete', old.id, 'u' || old.user_id, {folded_old});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS saved_items_fts_update
+            AFTER UPDATE OF user_id, {text_columns} ON saved_items BEGIN
+                INSERT INTO saved_items_fts(saved_items_fts, rowid, owner, {columns})
+                VALUES ('delete', old.id, 'u' || old.user_id, {folded_old});
+                INSERT INTO saved_items_fts(rowid, owner, {columns})
+                VALUES (new.id, 'u' || new.user_id, {folded_new});
+            END
+        ''')
+
+        if needs_backfill:
+            self._backfill_search_index(cursor)
+        return True
+
+    @staticmethod
+    def _indexed_values(prefix: str = '') -> str:
+        """הערכים שנכנסים לאינדקס מעמודות השורה: הטקסט המנורמל ואחריו הצורות בלי אותיות שימוש"""
+        folded = [f"search_fold({prefix}{c})" for c in SEARCH_COLUMNS]
+        stems = f"search_stems({', '.join(prefix + c for c in SEARCH_COLUMNS)})"
+        return ', '.join(folded + [stems])
+
+    @classmethod
+    def _backfill_search_index(cls, cursor: sqlite3.Cursor) -> None:
+        columns = ', '.join(SEARCH_COLUMNS + (STEMS_COLUMN,))
+        folded = cls._indexed_values()
+        cursor.execute(f'''
+            INSERT INTO saved_items_fts(rowid, owner, {columns})
+            SELECT id, 'u' || user_id, {folded} FROM saved_items
+        ''')
+        logger.info(f"Search index backfilled with {cursor.rowcount} items")
+
+    def rebuild_search_index(self) -> bool:
+        """בנייה מחדש של אינדקס החיפוש מתוך saved_items"""
+        if not self.fts_enabled:
+            return False
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO saved_items_fts(saved_items_fts) VALUES ('delete-all')")
+                self._backfill_search_index(cursor)
+                cursor.execute("INSERT INTO saved_items_fts(saved_items_fts) VALUES ('optimize')")
+                return True
+
+        except Exception as e:
+            logger.error(f"Error rebuilding search index: {e}")
+            return False
+
     def save_item(self, user_id: int, category: str, subject: str, 
                   content_type: str, content: str = '', file_id: str = '', 
                   file_name: str = '', caption: str = '') -> int:
         """שמירת פריט חדש"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -75,24 +423,29 @@ class Database:
                     (user_id, category, subject, content_type, content, 
                      file_id, file_name, caption)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING *
                 ''', (user_id, category, subject, content_type, content, 
                       file_id, file_name, caption))
                 
-                item_id = cursor.lastrowid
-                conn.commit()
-                
-                logger.info(f"Item saved successfully for user {user_id}, ID: {item_id}")
-                return item_id
+                row = cursor.fetchone()
+                item_id = row['id']
+            
+                self.item_cache.put(item_id, dict(row))
+            logger.info(f"Item saved successfully for user {user_id}, ID: {item_id}")
+            return item_id
                 
         except Exception as e:
             logger.error(f"Error saving item: {e}")
             raise
     
     def get_item(self, item_id: int) -> Optional[Dict[str, Any]]:
-        """קבלת פריט לפי ID"""
+        """קבלת פריט לפי ID (דרך מטמון הפריטים)"""
+        item = self.item_cache.get(item_id)
+        if item is not None:
+            return item
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            generation = self.item_cache.generation()
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -100,21 +453,48 @@ class Database:
                 ''', (item_id,))
                 
                 row = cursor.fetchone()
-                return dict(row) if row else None
+            
+            if not row:
+                return None
+            item = dict(row)
+            self.item_cache.fill(item_id, item, generation)
+            return item
                 
         except Exception as e:
             logger.error(f"Error getting item {item_id}: {e}")
             return None
     
+    def get_items_by_ids(self, item_ids: List[int]) -> List[Dict[str, Any]]:
+        """קבלת כמה פריטים בשאילתה אחת"""
+        if not item_ids:
+            return []
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                items = []
+                for start in range(0, len(item_ids), SQL_BATCH_SIZE):
+                    batch = item_ids[start:start + SQL_BATCH_SIZE]
+                    placeholders = ', '.join('?' * len(batch))
+                    cursor.execute(f'''
+                        SELECT * FROM saved_items WHERE id IN ({placeholders})
+                    ''', batch)
+                    items.extend(dict(row) for row in cursor.fetchall())
+                return items
+                
+        except Exception as e:
+            logger.error(f"Error getting items {item_ids[:5]}...: {e}")
+            return []
+    
     def get_user_categories(self, user_id: int) -> List[str]:
         """קבלת רשימת קטגוריות של משתמש"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
-                    SELECT DISTINCT category 
-                    FROM saved_items 
+                    SELECT category 
+                    FROM category_stats 
                     WHERE user_id = ? 
                     ORDER BY category
                 ''', (user_id,))
@@ -128,26 +508,45 @@ class Database:
     def get_category_count(self, user_id: int, category: str) -> int:
         """קבלת מספר פריטים בקטגוריה"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
-                    SELECT COUNT(*) 
-                    FROM saved_items 
+                    SELECT item_count 
+                    FROM category_stats 
                     WHERE user_id = ? AND category = ?
                 ''', (user_id, category))
                 
-                return cursor.fetchone()[0]
+                row = cursor.fetchone()
+                return row[0] if row else 0
                 
         except Exception as e:
             logger.error(f"Error getting category count: {e}")
             return 0
+
+    def get_category_summary(self, user_id: int) -> List[Dict[str, Any]]:
+        """קבלת כל הקטגוריות של משתמש עם מספר פריטים, קבועים וזמן עדכון אחרון"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    SELECT category, item_count, pinned_count, last_updated 
+                    FROM category_stats 
+                    WHERE user_id = ? 
+                    ORDER BY category
+                ''', (user_id,))
+                
+                return [dict(row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"Error getting category summary for user {user_id}: {e}")
+            return []
     
     def get_category_items(self, user_id: int, category: str) -> List[Dict[str, Any]]:
         """קבלת פריטים בקטגוריה (קבועים בראש)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -162,11 +561,104 @@ class Database:
             logger.error(f"Error getting category items: {e}")
             return []
     
-    def search_items(self, user_id: int, query: str) -> List[Dict[str, Any]]:
-        """חיפוש פריטים"""
+    def get_category_page(self, user_id: int, category: str, after_id: Optional[int] = None,
+                          before_id: Optional[int] = None, limit: int = 10) -> Dict[str, Any]:
+        """דף פריטים בקטגוריה (קבועים בראש) לפי מיקום של פריט עוגן ולא לפי OFFSET.
+
+        after_id - הדף שאחרי הפריט, before_id - הדף שלפניו, בלי שניהם - הדף הראשון.
+        עוגן שנמחק, שעבר קטגוריה או של משתמש אחר מחזיר דף ריק עם anchor_missing.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                anchor_id = before_id if before_id is not None else after_id
+                backwards = before_id is not None
+                anchor = ''
+                params: List[Any] = [user_id, category]
+                if anchor_id is not None:
+                    cursor.execute('''
+                        SELECT is_pinned, created_at FROM saved_items
+                        WHERE id = ? AND user_id = ? AND category = ?
+                    ''', (anchor_id, user_id, category))
+                    row = cursor.fetchone()
+                    if row is None:
+                        return {'items': [], 'has_prev': False, 'has_next': False, 'anchor_missing': True}
+                    op = '>' if backwards else '<'
+                    anchor = f'AND (is_pinned, created_at, id) {op} (?, ?, ?)'
+                    params.extend((row['is_pinned'], row['created_at'], anchor_id))
+                direction = 'ASC' if backwards else 'DESC'
+                params.append(limit + 1)
+                
+                cursor.execute(f'''
+                    SELECT id, subject, is_pinned 
+                    FROM saved_items INDEXED BY idx_category_page
+                    WHERE user_id = ? AND category = ? {anchor}
+                    ORDER BY is_pinned {direction}, created_at {direction}, id {direction}
+                    LIMIT ?
+                ''', params)
+                
+                rows = [dict(row) for row in cursor.fetchall()]
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                if backwards:
+                    rows.reverse()
+                    return {'items': rows, 'has_prev': has_more, 'has_next': True, 'anchor_missing': False}
+                return {'items': rows, 'has_prev': anchor_id is not None, 'has_next': has_more,
+                        'anchor_missing': False}
+                
+        except Exception as e:
+            logger.error(f"Error getting category page: {e}")
+            return {'items': [], 'has_prev': False, 'has_next': False, 'anchor_missing': False}
+    
+    def search_items(self, user_id: int, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """חיפוש פריטים (FTS5 עם דירוג bm25, קבועים מקבלים עדיפות)"""
+        if not self.fts_enabled:
+            return self._search_items_like(user_id, query, limit)
+        match = build_match_query(user_id, query)
+        if not match:
+            return []
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+                # snippet לכל עמודת טקסט - נבחר את הראשון שבו יש התאמה
+                snippets = ', '.join(
+                    f"snippet(saved_items_fts, {i}, '«', '»', '…', 10) AS snippet_{name}"
+                    for i, name in enumerate(SEARCH_COLUMNS, start=1)
+                )
+                
+                cursor.execute(f'''
+                    SELECT s.*, {snippets}
+                    FROM saved_items_fts
+                    JOIN saved_items s ON s.id = saved_items_fts.rowid
+                    WHERE saved_items_fts MATCH ?
+                    ORDER BY bm25(saved_items_fts, {weights})
+                             * CASE WHEN s.is_pinned THEN {PINNED_BOOST} ELSE 1.0 END,
+                             s.created_at DESC
+                    LIMIT ?
+                ''', (match, limit))
+                
+                results = []
+                for row in cursor.fetchall():
+                    item = dict(row)
+                    item['snippet'] = ''
+                    for name in ('content', 'caption', 'note', 'subject', 'category'):
+                        snippet = item.pop(f'snippet_{name}')
+                        if not item['snippet'] and snippet and '«' in snippet:
+                            item['snippet'] = snippet
+                    results.append(item)
+                return results
+                
+        except Exception as e:
+            logger.error(f"Error searching items: {e}")
+            return []
+
+    def _search_items_like(self, user_id: int, query: str, limit: int) -> List[Dict[str, Any]]:
+        """חיפוש LIKE למקרה ש-SQLite נבנה ללא FTS5"""
+        try:
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 search_query = f"%{query}%"
@@ -181,11 +673,11 @@ class Database:
                         note LIKE ?
                     )
                     ORDER BY is_pinned DESC, created_at DESC
-                    LIMIT 50
+                    LIMIT ?
                 ''', (user_id, search_query, search_query, search_query, 
-                      search_query, search_query))
+                      search_query, search_query, limit))
                 
-                return [dict(row) for row in cursor.fetchall()]
+                return [dict(row, snippet='') for row in cursor.fetchall()]
                 
         except Exception as e:
             logger.error(f"Error searching items: {e}")
@@ -194,26 +686,20 @@ class Database:
     def toggle_pin(self, item_id: int) -> bool:
         """החלפת מצב קיבוע פריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
-                # קבלת מצב נוכחי
-                cursor.execute('SELECT is_pinned FROM saved_items WHERE id = ?', (item_id,))
-                row = cursor.fetchone()
-                
-                if not row:
-                    return False
-                
-                new_pinned = not row[0]
-                
                 cursor.execute('''
                     UPDATE saved_items 
-                    SET is_pinned = ?, updated_at = CURRENT_TIMESTAMP 
+                    SET is_pinned = NOT is_pinned, updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
-                ''', (new_pinned, item_id))
+                    RETURNING *
+                ''', (item_id,))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error toggling pin for item {item_id}: {e}")
@@ -222,17 +708,20 @@ class Database:
     def set_reminder(self, item_id: int, reminder_time: datetime) -> bool:
         """קביעת תזכורת לפריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     UPDATE saved_items 
                     SET reminder_at = ?, updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
+                    RETURNING *
                 ''', (reminder_time.isoformat(), item_id))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error setting reminder for item {item_id}: {e}")
@@ -242,7 +731,7 @@ class Database:
                       file_id: str = '', file_name: str = '', caption: str = '') -> bool:
         """עדכון תוכן פריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -250,10 +739,13 @@ class Database:
                     SET content_type = ?, content = ?, file_id = ?, 
                         file_name = ?, caption = ?, updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
+                    RETURNING *
                 ''', (content_type, content, file_id, file_name, caption, item_id))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error updating content for item {item_id}: {e}")
@@ -262,17 +754,20 @@ class Database:
     def update_note(self, item_id: int, note: str) -> bool:
         """עדכון הערה לפריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     UPDATE saved_items 
                     SET note = ?, updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
+                    RETURNING *
                 ''', (note, item_id))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error updating note for item {item_id}: {e}")
@@ -281,13 +776,14 @@ class Database:
     def delete_item(self, item_id: int) -> bool:
         """מחיקת פריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('DELETE FROM saved_items WHERE id = ?', (item_id,))
-                conn.commit()
-                
-                return cursor.rowcount > 0
+                deleted = cursor.rowcount > 0
+            
+                self.item_cache.invalidate(item_id)
+            return deleted
                 
         except Exception as e:
             logger.error(f"Error deleting item {item_id}: {e}")
@@ -296,17 +792,20 @@ class Database:
     def delete_note(self, item_id: int) -> bool:
         """מחיקת הערה מפריט"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     UPDATE saved_items 
                     SET note = '', updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
+                    RETURNING *
                 ''', (item_id,))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error deleting note for item {item_id}: {e}")
@@ -315,8 +814,7 @@ class Database:
     def get_pending_reminders(self) -> List[Dict[str, Any]]:
         """קבלת תזכורות ממתינות"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
                 now = datetime.now().isoformat()
@@ -332,77 +830,115 @@ class Database:
             logger.error(f"Error getting pending reminders: {e}")
             return []
     
+    def get_reminder_window(self, start: Optional[datetime], end: datetime) -> List[Dict[str, Any]]:
+        """תזכורות שמועדן בטווח (start, end] לפי idx_reminder. בלי start - כולל כל מה שבאיחור"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                
+                lower = 'reminder_at > ?' if start else 'reminder_at IS NOT NULL'
+                params = (start.isoformat(), end.isoformat()) if start else (end.isoformat(),)
+                
+                cursor.execute(f'''
+                    SELECT id, user_id, reminder_at FROM saved_items INDEXED BY idx_reminder 
+                    WHERE {lower} AND reminder_at <= ?
+                    ORDER BY reminder_at
+                ''', params)
+                
+                return [dict(row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"Error getting reminder window: {e}")
+            return []
+    
     def clear_reminder(self, item_id: int) -> bool:
         """ניקוי תזכורת לאחר שליחה"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     UPDATE saved_items 
                     SET reminder_at = NULL, updated_at = CURRENT_TIMESTAMP 
                     WHERE id = ?
+                    RETURNING *
                 ''', (item_id,))
                 
-                conn.commit()
-                return True
+                row = cursor.fetchone()
+            
+                self._cache_write(item_id, row)
+            return row is not None
                 
         except Exception as e:
             logger.error(f"Error clearing reminder for item {item_id}: {e}")
             return False
     
+    def clear_reminders(self, reminders: List[Tuple[int, str]]) -> int:
+        """ניקוי תזכורות שנשלחו ב-executemany אחד.
+
+        מקבל זוגות (item_id, reminder_at) - תזכורת שנקבעה מחדש בינתיים לא תימחק.
+        """
+        if not reminders:
+            return 0
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.executemany('''
+                    UPDATE saved_items 
+                    SET reminder_at = NULL, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ? AND reminder_at = ?
+                ''', reminders)
+                cleared = cursor.rowcount
+            
+                self.item_cache.invalidate(*(item_id for item_id, _ in reminders))
+            return cleared
+                
+        except Exception as e:
+            logger.error(f"Error clearing reminders: {e}")
+            return 0
+
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """קבלת סטטיסטיקות משתמש"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.reader() as conn:
                 cursor = conn.cursor()
                 
-                # סה""" פריטים
-                cursor.execute('SELECT COUNT(*) FROM saved_items WHERE user_id = ?', (user_id,))
-                total_items = cursor.fetchone()[0]
-
-                # פריטים קבועים
-                cursor.execute('SELECT COUNT(*) FROM saved_items WHERE user_id = ? AND is_pinned = 1', (user_id,))
-                pinned_items = cursor.fetchone()[0]
-
-                # סה""" קטגוריות
-                cursor.execute('SELECT COUNT(DISTINCT category) FROM saved_items WHERE user_id = ?', (user_id,))
-                total_categories = cursor.fetchone()[0]
-
-                # תזכורות פעילות
-                cursor.execute('SELECT COUNT(*) FROM saved_items WHERE user_id = ? AND reminder_at IS NOT NULL', (user_id,))
-                active_reminders = cursor.fetchone()[0]
-
-                # פריטים עם הערות
-                cursor.execute('SELECT COUNT(*) FROM saved_items WHERE user_id = ? AND note != ""', (user_id,))
-                items_with_notes = cursor.fetchone()[0]
-
-                return {
-                    'total_items': total_items,
-                    'pinned_items': pinned_items,
-                    'total_categories': total_categories,
-                    'active_reminders': active_reminders,
-                    'items_with_notes': items_with_notes
-                }
+                cursor.execute(f'''
+                    SELECT {', '.join(USER_STATS_FIELDS[1:])} 
+                    FROM user_stats WHERE user_id = ?
+                ''', (user_id,))
+                
+                row = cursor.fetchone()
+                return dict(row) if row else dict.fromkeys(USER_STATS_FIELDS[1:], 0)
 
         except Exception as e:
             logger.error(f"Error getting user stats: {e}")
             return {}
 
+    def iter_user_items(self, user_id: int, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """מעבר על כל פריטי המשתמש במנות בלי לטעון את כולם לזיכרון.
+
+        הסדר (category, id) נקרא ישירות מ-idx_user_category ולכן אין מיון זמני.
+        """
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM saved_items INDEXED BY idx_user_category 
+                WHERE user_id = ?
+                ORDER BY category, id
+            ''', (user_id,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+
     def export_user_data(self, user_id: int) -> List[Dict[str, Any]]:
         """ייצוא נתוני משתמש"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-
-                cursor.execute('''
-                    SELECT * FROM saved_items 
-                    WHERE user_id = ?
-                    ORDER BY category, created_at
-                ''', (user_id,))
-
-                return [dict(row) for row in cursor.fetchall()]
+            return list(self.iter_user_items(user_id))
 
         except Exception as e:
             logger.error(f"Error exporting user data: {e}")
@@ -411,7 +947,7 @@ class Database:
     def cleanup_old_reminders(self, days_old: int = 7) -> int:
         """ניקוי תזכורות ישנות"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
 
                 cutoff_date = datetime.now() - timedelta(days=days_old)
@@ -420,10 +956,13 @@ class Database:
                     UPDATE saved_items 
                     SET reminder_at = NULL 
                     WHERE reminder_at IS NOT NULL AND reminder_at < ?
+                    RETURNING id
                 ''', (cutoff_date.isoformat(),))
 
-                conn.commit()
-                return cursor.rowcount
+                cleared = [row[0] for row in cursor.fetchall()]
+
+                self.item_cache.invalidate(*cleared)
+            return len(cleared)
 
         except Exception as e:
             logger.error(f"Error cleaning up old reminders: {e}")
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from database.billing_dates import start_of_day
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+# משתמש שלא בחר שעה מקבל את ההתנהגות הישנה: 09:00 UTC
+DEFAULT_TIMEZONE = "UTC"
+DEFAULT_REMINDER_HOUR = 9
+
+# אזורי הזמן שמוצעים בתפריט: (תווית, שם IANA)
+TIMEZONES: List[Tuple[str, str]] = [
+    ("🇮🇱 ישראל", "Asia/Jerusalem"),
+    ("🇬🇧 לונדון", "Europe/London"),
+    ("🇪🇺 מרכז אירופה", "Europe/Berlin"),
+    ("🇺🇸 ניו יורק", "America/New_York"),
+    ("🇺🇸 לוס אנג'לס", "America/Los_Angeles"),
+    ("🌐 UTC", "UTC"),
+]
+
+
+def _utc_now(now: Optional[datetime]) -> datetime:
+    return now.astimezone(timezone.utc) if now else datetime.now(timezone.utc)
+
+
+def bucket_of(moment: datetime) -> int:
+    """מספר רבע השעה ביום (0-95) של רגע נתון ב-UTC"""
+    moment = moment.astimezone(timezone.utc)
+    return (moment.hour * 60 + moment.minute) // BUCKET_MINUTES
+
+
+def delivery_bucket(tz_name: str, reminder_hour: int, now: Optional[datetime] = None) -> int:
+    """הדלי ב-UTC שבו השעה המקומית reminder_hour נופלת, לפי ההפרש הנוכחי של אזור הזמן.
+
+    ההפרש משתנה במעבר שעון קיץ/חורף, ולכן refresh_delivery_buckets מחשב את הדליים מחדש כל יום.
+    """
+    local = _utc_now(now).astimezone(ZoneInfo(tz_name))
+    local = local.replace(hour=reminder_hour, minute=0, second=0, microsecond=0)
+    return bucket_of(local)
+
+
+def local_today(tz_name: str, now: Optional[datetime] = None) -> datetime:
+    """תחילת היום המקומי של המשתמש, כ-datetime נאיבי כמו תאריכי החיוב"""
+    return start_of_day(_utc_now(now).astimezone(ZoneInfo(tz_name)).replace(tzinfo=None))
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+from datetime import datetime
+from typing import IO, Iterable, Dict, Any, Tuple
+import logging
+
+from database.database_manager import Database
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = (
+    'id', 'category', 'subject', 'content_type', 'content', 'file_id', 'file_name',
+    'caption', 'note', 'is_pinned', 'reminder_at', 'created_at', 'updated_at'
+)
+# עד הגודל הזה הקובץ נשאר בזיכרון, מעבר לכך הוא נכתב לדיסק
+SPOOL_MAX_SIZE = 1024 * 1024
+# מגבלת העלאת קבצים של בוטים ב-Bot API הרגיל
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+
+def _write_ndjson(items: Iterable[Dict[str, Any]], out: IO[str]) -> int:
+    count = 0
+    for item in items:
+        out.write(json.dumps({field: item[field] for field in EXPORT_FIELDS}, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def _write_csv(items: Iterable[Dict[str, Any]], out: IO[str]) -> int:
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for item in items:
+        writer.writerow(item)
+        count += 1
+    return count
+
+
+# (סיומת, פונקציית כתיבה, קידוד) - BOM ב-CSV כדי ש-Excel יזהה עברית
+WRITERS = {
+    'json': ('ndjson', _write_ndjson, 'utf-8'),
+    'csv': ('csv', _write_csv, 'utf-8-sig'),
+}
+
+
+def export_user_items(db: Database, user_id: int, fmt: str = 'json',
+                      compress: bool = False) -> Tuple[IO[bytes], str, int]:
+    """ייצוא כל פריטי המשתמש לקובץ זמני בזרימה.
+
+    מחזיר (קובץ פתוח שמוצב בתחילתו, שם קובץ מוצע, מספר פריטים).
+    הפריטים נקראים במנות, כך שצריכת הזיכרון בזמן הכתיבה לא תלויה במספר הפריטים.
+    בשליחה PTB (InputFile) קורא את כל הקובץ לזיכרון, ולכן שם הזיכרון חסום רק
+    ע"י MAX_DOCUMENT_SIZE.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    extension, write, encoding = WRITERS[fmt]
+    filename = f"save_me_export_{user_id}_{datetime.now():%Y%m%d_%H%M%S}.{extension}"
+    items = db.iter_user_items(user_id)
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        if compress:
+            with zipfile.ZipFile(spooled, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                with archive.open(filename, 'w', force_zip64=True) as member:
+                    with io.TextIOWrapper(member, encoding=encoding, newline='') as text:
+                        count = write(items, text)
+            filename += '.zip'
+        else:
+            text = io.TextIOWrapper(spooled, encoding=encoding, newline='')
+            count = write(items, text)
+            text.flush()
+            # ניתוק כדי שה-wrapper לא יסגור את הקובץ עצמו כשהוא נאסף
+            text.detach()
+    except Exception:
+        spooled.close()
+        raise
+
+    spooled.seek(0)
+    logger.info(f"Exported {count} items for user {user_id} as {filename}")
+    return spooled, filename, count
+
+
+def file_size(f: IO[bytes]) -> int:
+    """גודל קובץ פתוח, בלי לשנות את המיקום הנוכחי בו"""
+    position = f.tell()
+    f.seek(0, io.SEEK_END)
+    size = f.tell()
+    f.seek(position)
+    return size
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ItemCache:
+    """מטמון LRU חסום לשורות לפי מזהה (saved_items לפי id, סיכומי מנויים לפי chat_id), בטוח לשימוש מכמה threads.
+
+    כל כתיבה מעלה מונה דורות. קריאה מה-DB נשמרת במטמון רק אם לא הייתה כתיבה
+    מאז שהתחילה, כדי ששורה ישנה לא תדרוס שורה חדשה שנכתבה במקביל.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, item_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(item_id)
+            self.hits += 1
+            return dict(item)
+
+    def generation(self) -> int:
+        """מזהה מצב לפני קריאה מה-DB, מועבר אחר כך ל-fill"""
+        with self._lock:
+            return self._generation
+
+    def fill(self, item_id: int, item: Dict[str, Any], generation: int) -> None:
+        """שמירת שורה שנקראה מה-DB, רק אם לא הייתה כתיבה מאז generation"""
+        with self._lock:
+            if generation == self._generation:
+                self._store(item_id, item)
+
+    def put(self, item_id: int, item: Dict[str, Any]) -> None:
+        """עדכון אחרי כתיבה עם המצב החדש של השורה (מ-RETURNING)"""
+        with self._lock:
+            self._generation += 1
+            self._store(item_id, item)
+
+    def invalidate(self, *item_ids: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for item_id in item_ids:
+                self._items.pop(item_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def _store(self, item_id: int, item: Dict[str, Any]) -> None:
+        if self.capacity <= 0:
+            return
+        self._items[item_id] = dict(item)
+        self._items.move_to_end(item_id)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def info(self) -> Dict[str, Any]:
+        """מוני פגיעה/החטאה לכיול גודל המטמון"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._items),
+                'capacity': self.capacity,
+            }
@@ -0,0 +1,122 @@
+"""בחירת מנהיג בין כמה עותקים של בוט המנויים, על בסיס חכירה (lease) ב-Mongo.
+
+כל העותקים מטפלים בעדכונים, אבל רק המנהיג מריץ את המשימות המתוזמנות. המנהיג מחדש
+את החכירה בכל heartbeat; אם הוא מת, עותק אחר תופס אותה תוך ttl לכל היותר.
+
+בדיקה ידנית עם שני תהליכים מול mongod מקומי:
+    MONGO_URI=mongodb://localhost:27017 python -m database.leader_lease --ttl 6 --heartbeat 2
+(להריץ בשני טרמינלים, לעצור את המנהיג ב-Ctrl+C או ב-kill -9 ולראות את השני תופס)
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+
+from pymongo import ASCENDING
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+LEASE_COLLECTION = "leases"
+
+
+def ensure_lease_indexes(collection: Collection) -> None:
+    # Mongo מנקה חכירות שפגו ברקע; הנכונות לא תלויה בזה, רק ההשוואה ל-expires_at
+    collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl")
+
+
+class LeaderLease:
+    """חכירה בשם name שמוחזקת ע"י עותק אחד לכל היותר"""
+
+    def __init__(self, collection: Collection, name: str, ttl: float = 15.0,
+                 holder_id: Optional[str] = None):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # עד מתי אנחנו בטוחים שהחכירה שלנו, לפי השעון המקומי
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        """מנהיג רק אם החידוש האחרון הצליח ועוד לא עבר ttl מאז שנשלח.
+
+        מנהיג שאיבד את החיבור ל-Mongo מפסיק להריץ משימות מעצמו, לפני שעותק אחר יכול לתפוס.
+        """
+        with self._lock:
+            return time.monotonic() < self._valid_until
+
+    def try_acquire(self) -> bool:
+        """תפיסה או חידוש של החכירה. מחזיר האם אנחנו המנהיג"""
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.update_one(
+                {"_id": self.name, "$or": [{"holder": self.holder_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "holder": self.holder_id,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                    "renewed_at": now,
+                }},
+                upsert=True,
+            )
+            acquired = True
+        except DuplicateKeyError:
+            # המסמך קיים ומוחזק ע"י עותק אחר שעוד לא פג
+            acquired = False
+        except PyMongoError as e:
+            logger.error(f"Failed to renew lease '{self.name}': {e}")
+            acquired = False
+
+        with self._lock:
+            was_leader = time.monotonic() < self._valid_until
+            self._valid_until = started + self.ttl if acquired else 0.0
+        if acquired and not was_leader:
+            logger.info(f"Acquired lease '{self.name}' as {self.holder_id}")
+        elif was_leader and not acquired:
+            logger.warning(f"Lost lease '{self.name}' ({self.holder_id})")
+        return acquired
+
+    def release(self) -> None:
+        """שחרור מיידי ביציאה מסודרת, כדי שעותק אחר לא יחכה ל-ttl"""
+        with self._lock:
+            self._valid_until = 0.0
+        try:
+            self.collection.delete_one({"_id": self.name, "holder": self.holder_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to release lease '{self.name}': {e}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--name', default='lease_demo')
+    parser.add_argument('--ttl', type=float, default=15.0)
+    parser.add_argument('--heartbeat', type=float, default=5.0)
+    args = parser.parse_args()
+
+    from database import mongo_client
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    collection = mongo_client.get_database()[LEASE_COLLECTION]
+    ensure_lease_indexes(collection)
+    lease = LeaderLease(collection, args.name, ttl=args.ttl)
+    try:
+        while True:
+            lease.try_acquire()
+            print(f"{datetime.now():%H:%M:%S} {lease.holder_id} leader={lease.is_leader}", flush=True)
+            time.sleep(args.heartbeat)
+    except KeyboardInterrupt:
+        lease.release()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""פקודות תחזוקה למסד הנתונים של "שמור לי".
+
+הרצה:
+    python -m database.maintenance check-stats [--repair]
+    python -m database.maintenance rebuild-search
+"""
+import argparse
+import logging
+import os
+import sys
+
+from database.database_manager import Database
+
+
+def check_stats(db: Database, repair: bool) -> int:
+    drift = db.check_user_stats(repair=repair)
+    if not drift:
+        print("user_stats is consistent")
+        return 0
+    for entry in drift:
+        print(f"user {entry['user_id']}: {entry['field']} stored={entry['stored']} actual={entry['actual']}")
+    users = len({entry['user_id'] for entry in drift})
+    print(f"{len(drift)} drifted values across {users} users" + (" (repaired)" if repair else ""))
+    return 0 if repair else 1
+
+
+def rebuild_search(db: Database) -> int:
+    if not db.rebuild_search_index():
+        print("search index was not rebuilt (FTS5 unavailable or error, see log)")
+        return 1
+    print("search index rebuilt")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.environ.get('DATABASE_URL', 'save_me_bot.db'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('check-stats', help="בדיקת user_stats מול חישוב מלא")
+    stats.add_argument('--repair', action='store_true', help="בנייה מחדש של הטבלה אם נמצאו סטיות")
+    commands.add_parser('rebuild-search', help="בנייה מחדש של אינדקס החיפוש")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    db = Database(db_path=args.db)
+    try:
+        if args.command == 'check-stats':
+            return check_stats(db, args.repair)
+        return rebuild_search(db)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+import logging
+
+from pymongo import MongoClient
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = "SubscriptionBotDB"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.error(f"Invalid {name}={os.environ[name]!r}, using {default}")
+        return default
+
+
+def client_options() -> Dict[str, Any]:
+    """הגדרות החיבור מתוך משתני הסביבה (נקרא בזמן יצירת הלקוח, לא בזמן import)"""
+    return {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 20),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 20000),
+        # zlib מובנה בפייתון; snappy/zstd דורשים חבילות נוספות
+        "compressors": os.environ.get("MONGO_COMPRESSORS", "zlib"),
+        "retryWrites": os.environ.get("MONGO_RETRY_WRITES", "true").lower() != "false",
+        "appname": os.environ.get("MONGO_APP_NAME", "subscription-bot"),
+    }
+
+
+_lock = threading.Lock()
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+
+
+def get_client() -> MongoClient:
+    """לקוח Mongo אחד לכל תהליך, נוצר בפעם הראשונה שצריך אותו.
+
+    לקוח שעבר fork מתהליך האב לא בטוח לשימוש, ולכן תהליך עם pid אחר מקבל לקוח חדש.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    with _lock:
+        if _client is None or _client_pid != pid:
+            uri = os.environ.get("MONGO_URI")
+            if not uri:
+                raise RuntimeError("MONGO_URI environment variable is not set")
+            # את הלקוח של תהליך האב לא סוגרים כאן - הסוקטים שלו עדיין שייכים לאב
+            _client = MongoClient(uri, **client_options())
+            _client_pid = pid
+            logger.info(f"Created MongoClient for process {pid}")
+        return _client
+
+
+def get_database(name: Optional[str] = None) -> Database:
+    return get_client().get_database(name or os.environ.get("MONGO_DB_NAME", DEFAULT_DB_NAME))
+
+
+def ping() -> float:
+    """פינג לשרת, מחזיר זמן תגובה במילישניות"""
+    started = time.perf_counter()
+    get_client().admin.command("ping")
+    return (time.perf_counter() - started) * 1000
+
+
+def warm_up() -> bool:
+    """פתיחת החיבור הראשון מראש, כדי שהבקשה הראשונה של משתמש לא תשלם עליו"""
+    try:
+        latency = ping()
+    except (PyMongoError, RuntimeError) as e:
+        logger.error(f"Mongo warm-up failed: {e}")
+        return False
+    logger.info(f"Mongo warm-up ping took {latency:.1f}ms")
+    return True
+
+
+def health() -> Dict[str, Any]:
+    """מצב החיבור לבדיקת health"""
+    try:
+        return {"ok": True, "latency_ms": round(ping(), 1)}
+    except (PyMongoError, RuntimeError) as e:
+        return {"ok": False, "error": str(e)}
+
+
+def close_client() -> None:
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+from database.billing_dates import next_charge_date, start_of_day
+from database.delivery_schedule import DEFAULT_REMINDER_HOUR, DEFAULT_TIMEZONE, delivery_bucket
+from database.leader_lease import LEASE_COLLECTION, ensure_lease_indexes
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_META_COLLECTION = "schema_meta"
+SCHEMA_ID = "subscription_bot"
+MIGRATION_BATCH_SIZE = 1000
+# כמה זמן נשמר יומן משלוחי התזכורות (מספיק כדי לכסות כמה מחזורי חיוב)
+DELIVERY_LOG_TTL_SECONDS = 90 * 24 * 3600
+# כמה ימים לפני החיוב נשלחת התזכורת - גם הבדיקה היומית משתמשת בזה
+REMINDER_DAYS_AHEAD = 4
+
+
+def _create_indexes(db: Database) -> None:
+    """אינדקסים לשאילתות החמות של הבוט"""
+    try:
+        db.users.create_index([("chat_id", ASCENDING)], unique=True, name="chat_id_unique")
+    except OperationFailure as e:
+        # 11000 - כבר יש כפילויות chat_id באוסף; האינדקס לא ייווצר עד שינוקו
+        logger.error(f"Could not create unique index on users.chat_id: {e}")
+    db.subscriptions.create_index(
+        [("chat_id", ASCENDING), ("service_name", ASCENDING)], name="chat_id_service_name"
+    )
+    db.subscriptions.create_index([("billing_day", ASCENDING)], name="billing_day")
+    db.subscriptions.create_index([("next_charge_date", ASCENDING)], name="next_charge_date")
+    db.subscriptions.create_index(
+        [("delivery_bucket", ASCENDING), ("next_charge_date", ASCENDING)], name="delivery_bucket_next_charge_date"
+    )
+    db.reminder_deliveries.create_index(
+        [("subscription_id", ASCENDING), ("charge_date", ASCENDING)], unique=True, name="subscription_charge_unique"
+    )
+    db.reminder_deliveries.create_index(
+        [("claimed_at", ASCENDING)], expireAfterSeconds=DELIVERY_LOG_TTL_SECONDS, name="claimed_at_ttl"
+    )
+    ensure_lease_indexes(db[LEASE_COLLECTION])
+
+
+def _backfill_next_charge_date(db: Database) -> None:
+    """חישוב next_charge_date למנויים שנוצרו לפני השדה.
+
+    הבדיקה הישנה שלחה תזכורת בדיוק 4 ימים לפני החיוב, ולכן חיוב שקרוב יותר מזה
+    כבר קיבל תזכורת ומסומן ככזה, כדי שהמעבר לא ישלח אותה שוב.
+    """
+    today = start_of_day(datetime.now())
+    already_reminded_before = today + timedelta(days=REMINDER_DAYS_AHEAD)
+    cursor = db.subscriptions.find(
+        {"next_charge_date": {"$exists": False}, "billing_day": {"$exists": True}},
+        {"billing_day": 1},
+        batch_size=MIGRATION_BATCH_SIZE,
+    )
+    requests = []
+    updated = 0
+    for sub in cursor:
+        charge = next_charge_date(int(sub["billing_day"]), today)
+        reminded = charge if charge < already_reminded_before else None
+        requests.append(UpdateOne(
+            {"_id": sub["_id"]},
+            {"$set": {"next_charge_date": charge, "last_reminded_for": reminded}},
+        ))
+        if len(requests) >= MIGRATION_BATCH_SIZE:
+            updated += db.subscriptions.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += db.subscriptions.bulk_write(requests, ordered=False).modified_count
+    logger.info(f"Backfilled next_charge_date on {updated} subscriptions")
+
+
+def _default_delivery_bucket(db: Database) -> None:
+    """מנויים קיימים נשלחים בשעה של הבדיקה היומית הישנה (09:00 UTC) עד שהמשתמש יבחר אחרת"""
+    result = db.subscriptions.update_many(
+        {"delivery_bucket": {"$exists": False}},
+        {"$set": {
+            "delivery_tz": DEFAULT_TIMEZONE,
+            "delivery_hour": DEFAULT_REMINDER_HOUR,
+            "delivery_bucket": delivery_bucket(DEFAULT_TIMEZONE, DEFAULT_REMINDER_HOUR),
+        }},
+    )
+    logger.info(f"Set default delivery bucket on {result.modified_count} subscriptions")
+
+
+# כל שלב רץ פעם אחת, לפי הסדר, כשגרסת הסכמה השמורה נמוכה ממנו
+MIGRATIONS: List[Tuple[int, Callable[[Database], None]]] = [
+    (1, _create_indexes),
+    (2, _backfill_next_charge_date),
+    (3, _default_delivery_bucket),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def bootstrap_schema(db: Database) -> int:
+    """הרצת שלבי הסכמה החסרים ורישום הגרסה. בטוח להרצה בכל עלייה"""
+    meta = db[SCHEMA_META_COLLECTION]
+    current = (meta.find_one({"_id": SCHEMA_ID}) or {}).get("version", 0)
+
+    for version, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying subscription bot schema step {version}: {migrate.__name__}")
+        migrate(db)
+        meta.update_one(
+            {"_id": SCHEMA_ID},
+            {"$set": {"version": version, "updated_at": datetime.now()}},
+            upsert=True,
+        )
+        current = version
+
+    # יצירת אינדקס קיים היא no-op, כך שגם דאטאבייס בגרסה עדכנית מקבל אינדקסים שנמחקו
+    _create_indexes(db)
+    logger.info(f"Subscription bot schema at version {current}")
+    return current
+
+
+def _plan_summary(plan: Dict[str, Any]) -> str:
+    """תיאור קצר של עץ התוכנית, למשל FETCH <- IXSCAN(billing_day)"""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if "indexName" in plan:
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+def hot_queries(sample_chat_id: int = 0) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(שם, אוסף, פילטר) של השאילתות שרצות הכי הרבה"""
+    until = start_of_day(datetime.now()) + timedelta(days=REMINDER_DAYS_AHEAD)
+    return [
+        ("subscriptions by chat", "subscriptions", {"chat_id": sample_chat_id}),
+        ("users by chat", "users", {"chat_id": sample_chat_id}),
+        ("reminder check by bucket", "subscriptions", {
+            "delivery_bucket": {"$gte": 0, "$lte": 36},
+            "next_charge_date": {"$lte": until},
+            "$expr": {"$lt": ["$last_reminded_for", "$next_charge_date"]},
+        }),
+    ]
+
+
+def log_query_plans(db: Database) -> Dict[str, str]:
+    """רישום ה-explain של השאילתות החמות ללוג, עם אזהרה על COLLSCAN"""
+    plans = {}
+    for name, collection, query in hot_queries():
+        try:
+            explain = db[collection].find(query).explain()
+        except OperationFailure as e:
+            logger.warning(f"Could not explain '{name}': {e}")
+            continue
+        summary = _plan_summary(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[name] = summary
+        if "COLLSCAN" in summary:
+            logger.warning(f"Query plan for '{name}' on {collection}: {summary} (collection scan!)")
+        else:
+            logger.info(f"Query plan for '{name}' on {collection}: {summary}")
+    return plans
@@ -0,0 +1,86 @@
+import re
+import sqlite3
+import unicodedata
+from typing import Optional
+
+# אותיות השימוש בעברית שנצמדות לתחילת מילה (ו, ה, ב, ל, מ, ש, כ)
+HEBREW_PREFIX_LETTERS = 'והבלמשכ'
+HEBREW_LETTERS = re.compile(r'[א-ת]')
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# ניקוד וטעמים מוגדרים כחלק מהמילה (ברירת המחדל של unicode61 מפרידה בהם),
+# כך שהטקסט המקורי והטקסט המנורמל מתפרקים לאותו מספר טוקנים
+HEBREW_MARKS = ''.join(
+    chr(c) for c in range(0x0591, 0x05C8)
+    if c not in (0x05BE, 0x05C0, 0x05C3, 0x05C6)
+)
+TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{HEBREW_MARKS}'"
+
+# עמודות הטקסט בטבלת ה-FTS (לפני כן עמודת owner שמשמשת רק לסינון לפי משתמש)
+SEARCH_COLUMNS = ('category', 'subject', 'content', 'caption', 'note')
+# עמודה נוספת אחרי SEARCH_COLUMNS: המילים מכל העמודות בלי אותיות השימוש ("הבית" -> "בית")
+STEMS_COLUMN = 'stems'
+# משקלי bm25 לפי סדר העמודות: owner, SEARCH_COLUMNS ואחריהן STEMS_COLUMN
+BM25_WEIGHTS = (0.0, 2.0, 4.0, 1.0, 1.0, 1.5, 0.5)
+# כמה אותיות שימוש מוסרות לכל היותר מתחילת מילה ("ובבית" -> "בבית", "בית")
+MAX_PREFIX_LETTERS = 2
+PINNED_BOOST = 2.0
+
+
+def fold_text(text: Optional[str]) -> str:
+    """נרמול טקסט לאינדקס: הסרת ניקוד, טעמים ושאר סימנים משלבים.
+
+    הסימנים נמצאים בתוך המילה, ולכן ההסרה לא משנה את מספר הטוקנים
+    ו-snippet על הטקסט המקורי עדיין מסומן במקום הנכון.
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    return unicodedata.normalize('NFC', stripped)
+
+
+def _strip_prefix(token: str) -> Optional[str]:
+    """המילה בלי אות שימוש אחת בתחילתה, או None אם היא קצרה מדי או לא עברית"""
+    if (len(token) >= 4 and token[0] in HEBREW_PREFIX_LETTERS
+            and HEBREW_LETTERS.match(token[1])):
+        return token[1:]
+    return None
+
+
+def prefix_stems(*texts: Optional[str]) -> str:
+    """הצורות בלי אותיות שימוש של כל המילים בטקסטים, לעמודת STEMS_COLUMN באינדקס"""
+    stems = {}
+    for text in texts:
+        for token in TOKEN_RE.findall(fold_text(text).lower()):
+            for _ in range(MAX_PREFIX_LETTERS):
+                token = _strip_prefix(token)
+                if token is None:
+                    break
+                stems[token] = None
+    return ' '.join(stems)
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """רישום פונקציות הנרמול בחיבור - הטריגרים של טבלת החיפוש משתמשים בהן"""
+    conn.create_function('search_fold', 1, fold_text, deterministic=True)
+    conn.create_function('search_stems', len(SEARCH_COLUMNS), prefix_stems, deterministic=True)
+
+
+def _term(token: str) -> str:
+    """ביטוי חיפוש לטוקן בודד, כולל גרסה ללא אות שימוש עברית"""
+    term = f'"{token}"*'
+    stripped = _strip_prefix(token)
+    if stripped:
+        term = f'({term} OR "{stripped}"*)'
+    return term
+
+
+def build_match_query(user_id: int, query: str) -> Optional[str]:
+    """בניית ביטוי MATCH: סינון לפי בעלים ו-AND בין כל המילים (כולן כ-prefix)"""
+    tokens = TOKEN_RE.findall(fold_text(query).lower())
+    if not tokens:
+        return None
+    terms = ' AND '.join(_term(token) for token in tokens)
+    columns = ' '.join(SEARCH_COLUMNS + (STEMS_COLUMN,))
+    return f'owner : "u{user_id}" AND {{{columns}}} : ({terms})'
@@ -0,0 +1,317 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+import logging
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.cursor import Cursor
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from database.billing_dates import next_charge_date
+from database.delivery_schedule import DEFAULT_REMINDER_HOUR, DEFAULT_TIMEZONE, delivery_bucket
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# מפתח של משלוח תזכורת: מנוי ותאריך החיוב שעליו היא נשלחת
+DeliveryKey = Tuple[ObjectId, datetime]
+
+DUPLICATE_KEY_ERROR = 11000
+
+# השדות שהתזכורת היומית צריכה (כולל מה שנדרש לקידום תאריך החיוב)
+DUE_PROJECTION = {
+    "chat_id": 1, "service_name": 1, "cost": 1, "currency": 1,
+    "billing_day": 1, "next_charge_date": 1, "delivery_tz": 1,
+}
+
+
+class SubscriptionRepository:
+    """גישה סינכרונית לאוספי בוט המנויים (pymongo חוסם)"""
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.subscriptions = db.get_collection("subscriptions")
+        self.users = db.get_collection("users")
+        self.deliveries = db.get_collection("reminder_deliveries")
+        self.checkpoints = db.get_collection("job_checkpoints")
+
+    def add_subscription(self, subscription: Dict[str, Any]) -> ObjectId:
+        subscription.setdefault("next_charge_date", next_charge_date(subscription["billing_day"], datetime.now()))
+        subscription.setdefault("last_reminded_for", None)
+        # שעת המשלוח של המשתמש משוכפלת למנוי, כדי שהבדיקה לפי דלי לא תצטרך join
+        subscription.update(self.delivery_fields(subscription["chat_id"]))
+        inserted_id = self.subscriptions.insert_one(subscription).inserted_id
+        self._bump_summary_version(subscription["chat_id"])
+        return inserted_id
+
+    def get_summary_version(self, chat_id: int) -> int:
+        """גרסת רשימת המנויים של הצ'אט - עולה בכל הוספה ומחיקה, בכל עותק של הבוט"""
+        user = self.users.find_one({"chat_id": chat_id}, {"summary_version": 1}) or {}
+        return user.get("summary_version", 0)
+
+    def _bump_summary_version(self, chat_id: int) -> None:
+        # אחרי הכתיבה: מי שקורא את הגרסה החדשה כבר רואה את השינוי
+        self.users.update_one({"chat_id": chat_id}, {"$inc": {"summary_version": 1}}, upsert=True)
+
+    def get_delivery_settings(self, chat_id: int) -> Dict[str, Any]:
+        user = self.users.find_one({"chat_id": chat_id}, {"timezone": 1, "reminder_hour": 1}) or {}
+        return {
+            "timezone": user.get("timezone") or DEFAULT_TIMEZONE,
+            "reminder_hour": user.get("reminder_hour", DEFAULT_REMINDER_HOUR),
+        }
+
+    def delivery_fields(self, chat_id: int) -> Dict[str, Any]:
+        settings = self.get_delivery_settings(chat_id)
+        return {
+            "delivery_tz": settings["timezone"],
+            "delivery_hour": settings["reminder_hour"],
+            "delivery_bucket": delivery_bucket(settings["timezone"], settings["reminder_hour"]),
+        }
+
+    def set_delivery_settings(self, chat_id: int, tz_name: str, reminder_hour: int) -> int:
+        """שמירת אזור הזמן והשעה של המשתמש ועדכון הדלי בכל המנויים שלו. מחזיר את הדלי"""
+        bucket = delivery_bucket(tz_name, reminder_hour)
+        self.users.update_one(
+            {"chat_id": chat_id},
+            {"$set": {"timezone": tz_name, "reminder_hour": reminder_hour}},
+            upsert=True,
+        )
+        self.subscriptions.update_many(
+            {"chat_id": chat_id},
+            {"$set": {"delivery_tz": tz_name, "delivery_hour": reminder_hour, "delivery_bucket": bucket}},
+        )
+        return bucket
+
+    def refresh_delivery_buckets(self) -> int:
+        """חישוב מחדש של הדליים אחרי מעבר שעון: עדכון אחד לכל צירוף (אזור זמן, שעה) שבשימוש"""
+        updated = 0
+        pairs = self.subscriptions.aggregate([
+            {"$group": {"_id": {"tz": "$delivery_tz", "hour": "$delivery_hour"}}},
+        ])
+        for pair in pairs:
+            tz_name, hour = pair["_id"].get("tz"), pair["_id"].get("hour")
+            if tz_name is None or hour is None:
+                continue
+            bucket = delivery_bucket(tz_name, hour)
+            updated += self.subscriptions.update_many(
+                {"delivery_tz": tz_name, "delivery_hour": hour, "delivery_bucket": {"$ne": bucket}},
+                {"$set": {"delivery_bucket": bucket}},
+            ).modified_count
+        return updated
+
+    def delete_subscription(self, chat_id: int, sub_id: str) -> bool:
+        """מחיקת מנוי של הצ'אט. מזהה לא תקין או של צ'אט אחר לא מוחק כלום"""
+        try:
+            object_id = ObjectId(sub_id)
+        except InvalidId:
+            return False
+        deleted = self.subscriptions.delete_one({"_id": object_id, "chat_id": chat_id}).deleted_count > 0
+        if deleted:
+            self._bump_summary_version(chat_id)
+        return deleted
+
+    def list_subscriptions(self, chat_id: int, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return list(self.subscriptions.find({"chat_id": chat_id}, projection).sort("_id", 1))
+
+    def subscription_summary(self, chat_id: int) -> List[Dict[str, Any]]:
+        """סיכום המנויים של צ'אט בשאילתה אחת: קבוצה לכל מטבע עם השורות והסכום שלה"""
+        pipeline = [
+            {"$match": {"chat_id": chat_id}},
+            {"$sort": {"_id": 1}},
+            {"$project": {
+                "service_name": 1,
+                "billing_day": 1,
+                "cost": {"$ifNull": ["$cost", 0]},
+                "currency": {"$ifNull": ["$currency", ""]},
+            }},
+            {"$group": {
+                "_id": "$currency",
+                "total": {"$sum": "$cost"},
+                "first_id": {"$min": "$_id"},
+                "rows": {"$push": {"_id": "$_id", "service_name": "$service_name", "billing_day": "$billing_day", "cost": "$cost"}},
+            }},
+            # המטבעות לפי סדר ההופעה הראשונה
+            {"$sort": {"first_id": 1}},
+        ]
+        return list(self.subscriptions.aggregate(pipeline))
+
+    def due_subscriptions_cursor(self, until: datetime, first_bucket: int, last_bucket: int,
+                                 batch_size: int = 1000) -> Cursor:
+        """מנויים בדליי המשלוח הנתונים שהחיוב הבא שלהם עד until ועוד לא נשלחה עליו תזכורת.
+
+        הטווחים על delivery_bucket ו-next_charge_date נשענים על האינדקס; ההשוואה ב-$expr מסננת
+        רק את מה שכבר בטווח (last_reminded_for חסר או null קטן מכל תאריך).
+        """
+        return self.subscriptions.find(
+            {
+                "delivery_bucket": {"$gte": first_bucket, "$lte": last_bucket},
+                "next_charge_date": {"$lte": until},
+                "$expr": {"$lt": ["$last_reminded_for", "$next_charge_date"]},
+            },
+            DUE_PROJECTION,
+            batch_size=batch_size,
+        )
+
+    def advance_charge_dates(self, updates: List[Tuple[ObjectId, datetime, Optional[datetime], datetime]]) -> int:
+        """קידום מנויים אחרי תזכורת: (id, החיוב שנבדק, החיוב שעליו נשלחה תזכורת או None, החיוב הבא).
+
+        העדכון מותנה בכך ש-next_charge_date לא השתנה מאז הקריאה, כך שריצה מקבילה לא תקדם פעמיים.
+        """
+        if not updates:
+            return 0
+        requests = []
+        for sub_id, charge, reminded_for, following in updates:
+            fields = {"next_charge_date": following}
+            if reminded_for is not None:
+                fields["last_reminded_for"] = reminded_for
+            requests.append(UpdateOne({"_id": sub_id, "next_charge_date": charge}, {"$set": fields}))
+        return self.subscriptions.bulk_write(requests, ordered=False).modified_count
+
+
+    def claim_deliveries(self, deliveries: List[Tuple[ObjectId, datetime, int]], run_id: str,
+                         stale_after: timedelta) -> Tuple[Dict[DeliveryKey, ObjectId], Set[DeliveryKey]]:
+        """תפיסת משלוחים לפני שליחה: (מנוי, חיוב, צ'אט) -> רשומה ב-reminder_deliveries.
+
+        האינדקס הייחודי על (subscription_id, charge_date) מבטיח שרק ריצה אחת תופסת כל משלוח.
+        תפיסה של ריצה שלא סיימה תוך stale_after (קריסה) נלקחת מחדש.
+        מחזיר את המשלוחים שנתפסו (מפתח -> id הרשומה) ואת אלה שכבר נשלחו בעבר.
+        """
+        if not deliveries:
+            return {}, set()
+        now = datetime.now()
+        docs = [
+            {"_id": ObjectId(), "subscription_id": sub_id, "charge_date": charge, "chat_id": chat_id,
+             "status": "claimed", "run_id": run_id, "claimed_at": now}
+            for sub_id, charge, chat_id in deliveries
+        ]
+        conflicts = []
+        try:
+            self.deliveries.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    raise
+                conflicts.append(docs[error["index"]])
+
+        conflicted = {(doc["subscription_id"], doc["charge_date"]) for doc in conflicts}
+        claimed = {
+            (doc["subscription_id"], doc["charge_date"]): doc["_id"]
+            for doc in docs if (doc["subscription_id"], doc["charge_date"]) not in conflicted
+        }
+        already_sent: Set[DeliveryKey] = set()
+        if not conflicts:
+            return claimed, already_sent
+
+        # רק הרשומות של הזוגות המתנגשים, דרך האינדקס הייחודי (ולא כל ההיסטוריה של המנויים)
+        existing = self.deliveries.find(
+            {"$or": [{"subscription_id": sub_id, "charge_date": charge} for sub_id, charge in conflicted]},
+            {"subscription_id": 1, "charge_date": 1, "status": 1, "claimed_at": 1},
+        )
+        cutoff = now - stale_after
+        for record in existing:
+            key = (record["subscription_id"], record["charge_date"])
+            if record["status"] == "sent":
+                already_sent.add(key)
+            elif record["claimed_at"] < cutoff:
+                reclaimed = self.deliveries.update_one(
+                    {"_id": record["_id"], "status": "claimed", "claimed_at": record["claimed_at"]},
+                    {"$set": {"run_id": run_id, "claimed_at": now}},
+                )
+                if reclaimed.modified_count:
+                    logger.warning(f"Reclaimed stale reminder delivery {record['_id']}")
+                    claimed[key] = record["_id"]
+        return claimed, already_sent
+
+    def finish_deliveries(self, sent: List[ObjectId], failed: List[ObjectId]) -> None:
+        """סימון המשלוחים שנשלחו ושחרור אלה שנכשלו, כדי שריצה הבאה תנסה שוב"""
+        if sent:
+            self.deliveries.update_many(
+                {"_id": {"$in": sent}}, {"$set": {"status": "sent", "sent_at": datetime.now()}}
+            )
+        if failed:
+            self.deliveries.delete_many({"_id": {"$in": failed}, "status": "claimed"})
+
+    def get_checkpoint(self, name: str) -> Dict[str, Any]:
+        return self.checkpoints.find_one({"_id": name}) or {}
+
+    def save_checkpoint(self, name: str, fields: Dict[str, Any], increments: Optional[Dict[str, int]] = None) -> None:
+        update: Dict[str, Any] = {"$set": dict(fields, updated_at=datetime.now())}
+        if increments:
+            update["$inc"] = increments
+        self.checkpoints.update_one({"_id": name}, update, upsert=True)
+
+
+class AsyncSubscriptionRepository:
+    """עטיפה אסינכרונית ל-SubscriptionRepository: כל פנייה ל-Mongo רצה ב-thread pool ולא חוסמת את ה-event loop"""
+
+    def __init__(self, repository: SubscriptionRepository, max_workers: int = 8):
+        self.repository = repository
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='subs-mongo')
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """הרצת פונקציה סינכרונית כלשהי ב-executor של Mongo"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def add_subscription(self, subscription: Dict[str, Any]) -> ObjectId:
+        return await self.run(self.repository.add_subscription, subscription)
+
+    async def delete_subscription(self, chat_id: int, sub_id: str) -> bool:
+        return await self.run(self.repository.delete_subscription, chat_id, sub_id)
+
+    async def list_subscriptions(self, chat_id: int, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await self.run(self.repository.list_subscriptions, chat_id, projection)
+
+    async def subscription_summary(self, chat_id: int) -> List[Dict[str, Any]]:
+        return await self.run(self.repository.subscription_summary, chat_id)
+
+    async def get_summary_version(self, chat_id: int) -> int:
+        return await self.run(self.repository.get_summary_version, chat_id)
+
+    async def advance_charge_dates(self, updates: List[Tuple[ObjectId, datetime, Optional[datetime], datetime]]) -> int:
+        return await self.run(self.repository.advance_charge_dates, updates)
+
+    async def claim_deliveries(self, deliveries: List[Tuple[ObjectId, datetime, int]], run_id: str,
+                               stale_after: timedelta) -> Tuple[Dict[DeliveryKey, ObjectId], Set[DeliveryKey]]:
+        return await self.run(self.repository.claim_deliveries, deliveries, run_id, stale_after)
+
+    async def finish_deliveries(self, sent: List[ObjectId], failed: List[ObjectId]) -> None:
+        await self.run(self.repository.finish_deliveries, sent, failed)
+
+    async def get_checkpoint(self, name: str) -> Dict[str, Any]:
+        return await self.run(self.repository.get_checkpoint, name)
+
+    async def save_checkpoint(self, name: str, fields: Dict[str, Any], increments: Optional[Dict[str, int]] = None) -> None:
+        await self.run(self.repository.save_checkpoint, name, fields, increments)
+
+    async def get_delivery_settings(self, chat_id: int) -> Dict[str, Any]:
+        return await self.run(self.repository.get_delivery_settings, chat_id)
+
+    async def set_delivery_settings(self, chat_id: int, tz_name: str, reminder_hour: int) -> int:
+        return await self.run(self.repository.set_delivery_settings, chat_id, tz_name, reminder_hour)
+
+    async def refresh_delivery_buckets(self) -> int:
+        return await self.run(self.repository.refresh_delivery_buckets)
+
+    async def iter_due_subscriptions(self, until: datetime, first_bucket: int, last_bucket: int,
+                                     batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """מעבר על המנויים שהגיע זמן התזכורת שלהם במנות: כל מנה נקראת מה-cursor ב-executor"""
+        cursor = await self.run(self.repository.due_subscriptions_cursor, until, first_bucket, last_bucket, batch_size)
+        try:
+            while True:
+                batch = await self.run(lambda: list(itertools.islice(cursor, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            await self.run(cursor.close)
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Tuple
+import logging
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class UserRegistry:
+    """רישום משתמשים עם איחוד כתיבות.
+
+    משתמש שנראה לאחרונה עם אותו פרופיל לא עולה כלום. שינוי אמיתי נכנס לבאפר
+    ונכתב ב-bulk_write אחד של upserts לא-מסודרים בכל flush.
+    """
+
+    def __init__(self, collection: Collection, ttl_seconds: float = 6 * 3600,
+                 max_pending: int = 500):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._seen: Dict[int, Tuple[bytes, float]] = {}
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint(user_info: Dict[str, Any]) -> bytes:
+        raw = repr(sorted(user_info.items())).encode('utf-8')
+        return hashlib.blake2b(raw, digest_size=8).digest()
+
+    def touch(self, user_info: Dict[str, Any]) -> bool:
+        """רישום שהמשתמש נראה. מחזיר True אם נוספה כתיבה לבאפר"""
+        chat_id = user_info["chat_id"]
+        fingerprint = self._fingerprint(user_info)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(chat_id)
+            if seen and seen[0] == fingerprint and seen[1] > now:
+                return False
+            self._seen[chat_id] = (fingerprint, now + self.ttl_seconds)
+            self._pending[chat_id] = user_info
+            return True
+
+    def should_flush(self) -> bool:
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def flush(self) -> int:
+        """כתיבת כל השינויים שבבאפר ב-bulk_write אחד (חוסם - להריץ מחוץ ל-event loop)"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._evict_expired()
+            if not pending:
+                return 0
+
+            first_seen = datetime.now()
+            requests = [
+                UpdateOne(
+                    {"chat_id": chat_id},
+                    # $setOnInsert יקבע את התאריך רק כשהמשתמש נוצר לראשונה
+                    {"$set": user_info, "$setOnInsert": {"first_seen": first_seen}},
+                    upsert=True,
+                )
+                for chat_id, user_info in pending.items()
+            ]
+            try:
+                self.collection.bulk_write(requests, ordered=False)
+            except PyMongoError as e:
+                logger.error(f"Failed to flush {len(pending)} user updates: {e}")
+                with self._lock:
+                    # החזרה לבאפר, בלי לדרוס עדכון חדש יותר שהגיע בינתיים
+                    for chat_id, user_info in pending.items():
+                        self._pending.setdefault(chat_id, user_info)
+                return 0
+            logger.info(f"Flushed {len(pending)} user updates")
+            return len(pending)
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [chat_id for chat_id, (_, expires) in self._seen.items() if expires <= now]
+        for chat_id in expired:
+            del self._seen[chat_id]
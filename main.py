@@ -1,22 +1,55 @@
+"""הרצת שני הבוטים.
+
+RUN_MODE=single (ברירת מחדל) - שני הבוטים בתהליך אחד ועל event loop אחד, עם מאגר HTTP,
+לוגים ושרת health משותפים. עם BOT_MODE=webhook שניהם מקבלים עדכונים מאותו שרת.
+RUN_MODE=processes - כל בוט בתהליך נפרד (polling בלבד), כמו פעם.
+"""
+import logging
 import os
 from multiprocessing import Process
-from save_me import main as save_me_main
-from subscriber_tracking import main as subscriber_tracking_main
+
+import save_me
+import subscriber_tracking
+from bot_request import shared_requests
+from database import mongo_client
+from web_server import run_bots
 
 def run_save_me():
-    os.environ["BOT_TOKEN"] = os.environ.get("BOT_TOKEN_SAVE_ME", "")
-    os.environ["MONGO_URI"] = os.environ.get("MONGO_URI", "")
-    save_me_main()
+    save_me.main(token=os.environ.get("BOT_TOKEN_SAVE_ME", ""))
 
 def run_subs_tracker():
-    os.environ["BOT_TOKEN"] = os.environ.get("BOT_TOKEN_SUBS_TRACK", "")
-    os.environ["MONGO_URI"] = os.environ.get("MONGO_URI", "")
-    subscriber_tracking_main()
+    # השרת על PORT שייך לתהליך של save_me
+    subscriber_tracking.main(token=os.environ.get("BOT_TOKEN_SUBS_TRACK", ""), serve_http=False)
 
-if __name__ == "__main__":
+def run_single_process():
+    """שני הבוטים באותו תהליך, עם הטוקנים מועברים ישירות ולא דרך os.environ"""
+    save_me_token = os.environ.get("BOT_TOKEN_SAVE_ME")
+    subs_token = os.environ.get("BOT_TOKEN_SUBS_TRACK")
+    if not save_me_token or not subs_token or not os.environ.get("MONGO_URI"):
+        logging.getLogger(__name__).fatal(
+            "FATAL: BOT_TOKEN_SAVE_ME, BOT_TOKEN_SUBS_TRACK or MONGO_URI environment variables are missing!"
+        )
+        return
+
+    # httpx מתעד כל בקשה ב-INFO - עם שני בוטים ב-polling זה רוב הלוג
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    request, get_updates_request = shared_requests()
+    bots = {
+        "save_me": save_me.build_application(save_me_token, request, get_updates_request),
+        "subscriptions": subscriber_tracking.build_application(subs_token, request, get_updates_request),
+    }
+    run_bots(bots, health_checks={"mongo": mongo_client.health})
+
+def run_processes():
     p1 = Process(target=run_save_me)
     p2 = Process(target=run_subs_tracker)
     p1.start()
     p2.start()
     p1.join()
     p2.join()
+
+if __name__ == "__main__":
+    if os.environ.get("RUN_MODE", "single") == "processes":
+        run_processes()
+    else:
+        run_single_process()
@@ -0,0 +1,235 @@
+"""מדדי Prometheus משותפים לשני הבוטים, מוגשים ב-/metrics בשרת ה-health.
+
+- זמן טיפול לכל handler, עם תווית של ה-pattern / מצב השיחה / הפקודה
+- זמן כל מתודה של Database (SQLite) וכל פקודת Mongo לפי אוסף
+- זמן קריאות ל-Bot API ומספר תשובות 429
+- עיכוב משימות ה-job queue מהזמן המתוכנן
+- גודל מצב בזיכרון (pending_items, user_data)
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_MISSED, EVENT_JOB_REMOVED, EVENT_JOB_SUBMITTED
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from telegram.ext import Application, BaseHandler, CallbackQueryHandler, CommandHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Update handler latency", ["bot", "handler", "route"], buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Update handlers that raised", ["bot", "handler", "route"])
+DB_SECONDS = Histogram(
+    "db_operation_seconds", "Database call latency", ["backend", "operation"], buckets=LATENCY_BUCKETS
+)
+DB_ERRORS = Counter("db_operation_errors_total", "Database calls that failed", ["backend", "operation"])
+API_SECONDS = Histogram(
+    "telegram_api_seconds", "Bot API request latency", ["bot", "method"], buckets=LATENCY_BUCKETS
+)
+API_RATE_LIMITED = Counter("telegram_api_rate_limited_total", "Bot API 429 responses", ["bot", "method"])
+JOB_LAG_SECONDS = Histogram(
+    "job_queue_lag_seconds", "Delay between a job's scheduled and actual start", ["bot", "job"],
+    buckets=(.01, .05, .1, .5, 1, 5, 15, 60, 300),
+)
+JOB_MISSED = Counter("job_queue_missed_total", "Job runs skipped past their misfire grace time", ["bot", "job"])
+STATE_ENTRIES = Gauge("bot_state_entries", "Entries held in in-memory state", ["bot", "store"])
+
+# תווית למשימה שהשם שלה לא ידוע - לעולם לא ה-id (UUID לכל run_once)
+UNKNOWN_JOB = "once"
+# כמה שמות של משימות שהוסרו נשמרים לאירועים שמגיעים אחרי ההסרה
+REMOVED_JOB_NAMES = 256
+
+# מזהה הבוט (החלק שלפני ':' בטוקן) -> שם, לתוויות של קריאות ה-API
+_bot_names: Dict[str, str] = {}
+
+
+def render() -> Tuple[bytes, str]:
+    """גוף ו-Content-Type של /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# --- handlers ---
+def _route(handler: BaseHandler, state: Optional[str]) -> str:
+    if state is not None:
+        return f"state:{state}"
+    if isinstance(handler, CallbackQueryHandler) and handler.pattern is not None:
+        return getattr(handler.pattern, "pattern", str(handler.pattern))
+    if isinstance(handler, CommandHandler):
+        return "/" + ",".join(sorted(handler.commands))
+    return type(handler).__name__
+
+
+def _wrap_handler(handler: BaseHandler, bot: str, state: Optional[str]) -> None:
+    callback = handler.callback
+    if getattr(callback, "__instrumented__", False):
+        return
+    labels = (bot, getattr(callback, "__name__", type(callback).__name__), _route(handler, state))
+
+    @functools.wraps(callback)
+    async def timed(update: Any, context: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+
+    timed.__instrumented__ = True
+    handler.callback = timed
+
+
+def _instrument_handlers(handlers: Any, bot: str, state_names: Dict[Any, str], state: Optional[str] = None) -> None:
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            _instrument_handlers(handler.entry_points, bot, state_names)
+            for key, state_handlers in handler.states.items():
+                _instrument_handlers(state_handlers, bot, state_names, state_names.get(key, str(key)))
+            _instrument_handlers(handler.fallbacks, bot, state_names, "fallback")
+        else:
+            _wrap_handler(handler, bot, state)
+
+
+def instrument_application(application: Application, bot: str, state_names: Optional[Dict[Any, str]] = None) -> None:
+    """עטיפת כל ה-handlers הרשומים ומעקב אחרי ה-job queue. לקרוא אחרי רישום ה-handlers"""
+    _bot_names[application.bot.token.split(":", 1)[0]] = bot
+    for handlers in application.handlers.values():
+        _instrument_handlers(handlers, bot, state_names or {})
+
+    STATE_ENTRIES.labels(bot, "user_data").set_function(lambda: len(application.user_data))
+    if application.job_queue:
+        _watch_job_queue(application, bot)
+
+
+def track_size(bot: str, store: str, size: Callable[[], int]) -> None:
+    """גודל של מבנה בזיכרון, נקרא בזמן ה-scrape"""
+    STATE_ENTRIES.labels(bot, store).set_function(size)
+
+
+def _watch_job_queue(application: Application, bot: str) -> None:
+    scheduler = application.job_queue.scheduler
+    # השם נשמר כשהמשימה נוספת: משימה חד-פעמית כבר הוסרה מה-jobstore כשמגיע EVENT_JOB_SUBMITTED
+    names: Dict[str, str] = {job.id: job.name for job in scheduler.get_jobs() if job.name}
+    removed: "OrderedDict[str, str]" = OrderedDict()
+
+    def job_name(job_id: str) -> str:
+        return names.get(job_id) or removed.get(job_id) or UNKNOWN_JOB
+
+    def on_event(event: Any) -> None:
+        if event.code == EVENT_JOB_ADDED:
+            job = scheduler.get_job(event.job_id)
+            if job and job.name:
+                names[event.job_id] = job.name
+            return
+        if event.code == EVENT_JOB_REMOVED:
+            name = names.pop(event.job_id, None)
+            if name:
+                removed[event.job_id] = name
+                while len(removed) > REMOVED_JOB_NAMES:
+                    removed.popitem(last=False)
+            return
+        if event.code == EVENT_JOB_MISSED:
+            JOB_MISSED.labels(bot, job_name(event.job_id)).inc()
+            return
+        now = time.time()
+        for scheduled in event.scheduled_run_times:
+            JOB_LAG_SECONDS.labels(bot, job_name(event.job_id)).observe(max(0.0, now - scheduled.timestamp()))
+
+    scheduler.add_listener(on_event, EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED)
+
+
+# --- Database (SQLite) ---
+def instrument_class(cls: type, backend: str) -> type:
+    """מדידת זמן לכל מתודה ציבורית של המחלקה. גנרטורים לא נעטפים (הזמן שלהם אצל הצורך)"""
+    if cls.__dict__.get("__instrumented__"):
+        return cls
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method) or inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, _timed_method(method, backend, name))
+    cls.__instrumented__ = True
+    return cls
+
+
+def _timed_method(method: Callable, backend: str, name: str) -> Callable:
+    seconds = DB_SECONDS.labels(backend, name)
+    errors = DB_ERRORS.labels(backend, name)
+
+    @functools.wraps(method)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started)
+
+    return timed
+
+
+# --- Mongo ---
+class MongoCommandMetrics(monitoring.CommandListener):
+    """זמן כל פקודת Mongo לפי שם הפקודה והאוסף"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[Any, int], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event: Any, failed: bool) -> None:
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        operation = f"{collection}.{event.command_name}" if collection else event.command_name
+        DB_SECONDS.labels("mongo", operation).observe(event.duration_micros / 1e6)
+        if failed:
+            DB_ERRORS.labels("mongo", operation).inc()
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+
+_mongo_listener: Optional[MongoCommandMetrics] = None
+
+
+def register_mongo_listener() -> None:
+    """רישום גלובלי - חל על כל MongoClient שנוצר אחרי הקריאה"""
+    global _mongo_listener
+    if _mongo_listener is None:
+        _mongo_listener = MongoCommandMetrics()
+        monitoring.register(_mongo_listener)
+
+
+# --- Bot API ---
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest שמודד כל קריאה ל-Bot API וסופר תשובות 429"""
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> Tuple[int, bytes]:
+        # https://api.telegram.org/bot<id>:<secret>/<method>, או /file/bot<token>/<path> בהורדת קבצים
+        path = url.rsplit("/bot", 1)[-1]
+        bot = _bot_names.get(path.split(":", 1)[0], "unknown")
+        api_method = "file_download" if "/file/bot" in url else path.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        finally:
+            API_SECONDS.labels(bot, api_method).observe(time.perf_counter() - started)
+        if code == 429:
+            API_RATE_LIMITED.labels(bot, api_method).inc()
+        return code, payload
@@ -0,0 +1,147 @@
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Bot
+from telegram.ext import Application, ContextTypes
+
+from database.async_database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+# פונקציית השליחה מקבלת את הבוט, את המשתמש ואת כל הפריטים שהגיע זמנם עבורו
+DeliverFn = Callable[[Bot, int, List[Dict[str, Any]]], Awaitable[None]]
+
+# שליחה שנכשלה מנוסה שוב אחרי 30 שניות, ואז בהשהיה כפולה בכל ניסיון
+RETRY_DELAY = timedelta(seconds=30)
+RETRY_LIMIT = 5
+
+
+class ReminderScheduler:
+    """מתזמן תזכורות עמיד לאתחולים.
+
+    מקור האמת הוא saved_items.reminder_at. בזיכרון נשמרות רק התזכורות של החלון
+    הקרוב (ערימת min לפי זמן), והחלון מתמלא מחדש מה-DB כשהוא מתקדם, כך שעלות
+    התזמון תלויה במספר התזכורות הקרובות ולא במספר התזכורות הכולל.
+
+    תזכורות של אותו משתמש שהגיע זמנן נשלחות יחד בהודעה אחת, עם שאילתת טעינה אחת ופקודת
+    ניקוי אחת לכל הפריטים. בין שתי בדיקות מצטברות כל התזכורות של אותן 15 שניות, כך שעומס
+    באותה דקה מתאחד בלי לשלוח אף תזכורת לפני זמנה.
+    """
+
+    def __init__(self, db: AsyncDatabase, deliver: DeliverFn,
+                 window: timedelta = timedelta(minutes=30),
+                 tick: timedelta = timedelta(seconds=15)):
+        self.db = db
+        self.deliver = deliver
+        self.window = window
+        self.tick = tick
+        self._heap: List[Tuple[datetime, int, int]] = []
+        # הזמן העדכני של כל פריט בערימה - רשומות ישנות בערימה מדולגות
+        self._scheduled: Dict[int, datetime] = {}
+        self._window_end: Optional[datetime] = None
+        # בזמן טעינת חלון: שינויים שנרשמו בינתיים ויוחלו אחרי התוצאה שלה
+        self._loading: Optional[Dict[int, Tuple[int, datetime]]] = None
+        # פריט שהשליחה שלו נכשלה -> (המועד ב-DB, מספר הניסיונות)
+        self._retries: Dict[int, Tuple[datetime, int]] = {}
+
+    async def start(self, application: Application) -> None:
+        """טעינת החלון הראשון (כולל תזכורות שבאיחור) והפעלת הבדיקה המחזורית"""
+        now = datetime.now()
+        await self._load(None, now + self.window)
+        overdue = sum(1 for when in self._scheduled.values() if when <= now)
+        logger.info(f"Reminder scheduler started: {len(self._scheduled)} reminders in window, {overdue} overdue")
+        application.job_queue.run_repeating(self._tick, interval=self.tick, first=0, name='reminder_scheduler')
+
+    def schedule(self, item_id: int, user_id: int, when: datetime) -> None:
+        """רישום תזכורת שנקבעה עכשיו. תזכורת מחוץ לחלון תיטען מה-DB כשיגיע זמנה"""
+        if self._loading is not None:
+            # השאילתה של החלון אולי רצה לפני שהתזכורת נכתבה - השינוי יוחל אחריה
+            self._loading[item_id] = (user_id, when)
+            return
+        self._apply(item_id, user_id, when)
+
+    def _apply(self, item_id: int, user_id: int, when: datetime) -> None:
+        self._retries.pop(item_id, None)
+        if self._window_end is not None and when <= self._window_end:
+            self._push(item_id, user_id, when)
+        else:
+            self._scheduled.pop(item_id, None)
+
+    def _push(self, item_id: int, user_id: int, when: datetime) -> None:
+        self._scheduled[item_id] = when
+        heapq.heappush(self._heap, (when, item_id, user_id))
+
+    async def _load(self, start: Optional[datetime], end: datetime) -> None:
+        self._loading = {}
+        try:
+            for row in await self.db.get_reminder_window(start, end):
+                if row['id'] not in self._retries:
+                    self._push(row['id'], row['user_id'], datetime.fromisoformat(row['reminder_at']))
+            self._window_end = end
+        finally:
+            changes, self._loading = self._loading, None
+            for item_id, (user_id, when) in changes.items():
+                self._apply(item_id, user_id, when)
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, int, int]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, item_id, user_id = heapq.heappop(self._heap)
+            if self._scheduled.get(item_id) != when:
+                continue
+            del self._scheduled[item_id]
+            due.append((when, item_id, user_id))
+        return due
+
+    async def _tick(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        now = datetime.now()
+        due = self._pop_due(now)
+        if due:
+            await self._deliver_batch(context.bot, due)
+
+        # מילוי החלון כשנשאר ממנו פחות מחצי
+        if self._window_end is None or now + self.window / 2 >= self._window_end:
+            await self._load(self._window_end, now + self.window)
+
+    async def _deliver_batch(self, bot: Bot, due: List[Tuple[datetime, int, int]]) -> None:
+        # בניסיון חוזר המועד בערימה הוא זמן הניסיון, והמועד שב-DB נשמר ב-_retries
+        attempts: Dict[int, int] = {}
+        expected: Dict[int, datetime] = {}
+        for when, item_id, _ in due:
+            expected[item_id], attempts[item_id] = self._retries.pop(item_id, (when, 0))
+        items = await self.db.get_items_by_ids(list(expected))
+
+        by_user: Dict[int, List[Dict[str, Any]]] = {}
+        for item in items:
+            # התזכורת בוטלה או נדחתה מאז שנטענה (פריט שנמחק פשוט לא יחזור מה-DB)
+            if not item['reminder_at'] or datetime.fromisoformat(item['reminder_at']) != expected[item['id']]:
+                continue
+            by_user.setdefault(item['user_id'], []).append(item)
+
+        delivered: List[Tuple[int, str]] = []
+        for user_id, user_items in by_user.items():
+            user_items.sort(key=lambda item: item['reminder_at'])
+            try:
+                await self.deliver(bot, user_id, user_items)
+            except Exception as e:
+                logger.error(f"Failed to deliver {len(user_items)} reminders to {user_id}: {e}")
+                self._retry(user_id, user_items, attempts)
+                continue
+            delivered.extend((item['id'], item['reminder_at']) for item in user_items)
+
+        await self.db.clear_reminders(delivered)
+        logger.info(f"Delivered {len(delivered)} reminders in {len(by_user)} messages")
+
+    def _retry(self, user_id: int, items: List[Dict[str, Any]], attempts: Dict[int, int]) -> None:
+        """החזרה לערימה עם השהיה גדלה. התזכורת נשארת ב-DB, ואחרי RETRY_LIMIT ניסיונות
+        היא תישלח רק בטעינה הבאה של תזכורות שבאיחור (באתחול)"""
+        for item in items:
+            attempt = attempts[item['id']] + 1
+            if attempt > RETRY_LIMIT:
+                logger.error(f"Giving up on reminder for item {item['id']} after {RETRY_LIMIT} retries")
+                continue
+            due_at = datetime.fromisoformat(item['reminder_at'])
+            self._retries[item['id']] = (due_at, attempt)
+            self._push(item['id'], user_id, datetime.now() + RETRY_DELAY * 2 ** (attempt - 1))
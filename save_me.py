@@ -1,32 +1,28 @@
 import os
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-import threading
-from flask import Flask
+from typing import Dict, Any, List, Optional
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ContextTypes, ConversationHandler, filters
+    ContextTypes, ConversationHandler, filters, AIORateLimiter
 )
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
+from telegram.request import BaseRequest
 
 # Note: The original 'database_model.py' has been renamed to 'database_manager.py'
 # and placed inside the 'database' directory to work as a module.
 from database.database_manager import Database
-
-# --- Flask App for Render Health Check ---
-flask_app = Flask('')
-
-@flask_app.route('/')
-def health_check():
-    return "Bot is alive!", 200
-
-def run_flask():
-    port = int(os.environ.get('PORT', 8080))
-    flask_app.run(host='0.0.0.0', port=port)
-# -----------------------------------------
+from database.async_database import AsyncDatabase
+from database.exporter import MAX_DOCUMENT_SIZE, export_user_items, file_size
+from database.conversation_state import ConversationStateStore, StateNamespace
+import metrics
+from bot_request import shared_requests, with_api_server
+from reminders import ReminderScheduler
+from state_persistence import ConversationStatePersistence
+from web_server import run_bots
 
 # --- Bot Configuration ---
 logging.basicConfig(
@@ -37,15 +33,54 @@ logger = logging.getLogger(__name__)
 
 # Conversation states
 (WAITING_CONTENT, WAITING_CATEGORY, WAITING_SUBJECT, WAITING_REMINDER,
- WAITING_EDIT, WAITING_NOTE) = range(6)
+ WAITING_EDIT, WAITING_NOTE, WAITING_SEARCH) = range(7)
+
+CONVERSATION_STATE_NAMES = {
+    WAITING_CONTENT: "WAITING_CONTENT", WAITING_CATEGORY: "WAITING_CATEGORY",
+    WAITING_SUBJECT: "WAITING_SUBJECT", WAITING_REMINDER: "WAITING_REMINDER",
+    WAITING_EDIT: "WAITING_EDIT", WAITING_NOTE: "WAITING_NOTE", WAITING_SEARCH: "WAITING_SEARCH",
+}
+
+CATEGORY_PAGE_SIZE = 10
+
+MAIN_MENU_BUTTONS = ("➕ הוסף תוכן", "🔍 חיפוש", "📚 הצג לפי קטגוריה", "⚙️ הגדרות")
+
+# מצב שיחה (פריטים בתהליך שמירה, user_data, מצב ה-ConversationHandler): נמחק אחרי יום
+# בלי פעילות, תקרת זיכרון קשיחה, ונכתב לטבלת conversation_state כל STATE_FLUSH_SECONDS
+CONVERSATION_STATE_TTL_SECONDS = 24 * 3600
+CONVERSATION_STATE_MAX_BYTES = 16 * 1024 * 1024
+STATE_FLUSH_SECONDS = 10
+STATE_EVICT_SECONDS = 3600
+PENDING_EXPIRED_TEXT = "הפריט שהתחלת לשמור כבר לא זמין. התחל מחדש עם ➕ הוסף תוכן."
 # -------------------------
 
 class SaveMeBot:
     def __init__(self):
         # Using DATABASE_URL from environment variable for Render's persistent disk
         db_path = os.environ.get('DATABASE_URL', 'save_me_bot.db')
-        self.db = Database(db_path=db_path)
-        self.pending_items: Dict[int, Dict[str, Any]] = {}
+        database = Database(db_path=db_path)
+        self.db = AsyncDatabase(database)
+        self.reminders = ReminderScheduler(self.db, self.deliver_reminder)
+        self.state = ConversationStateStore(
+            database.pool, ttl_seconds=CONVERSATION_STATE_TTL_SECONDS, max_bytes=CONVERSATION_STATE_MAX_BYTES
+        )
+        self.pending_items = StateNamespace(self.state, "pending_items", self.db.run)
+        self.persistence = ConversationStatePersistence(self.state, self.db.run)
+
+    async def post_init(self, application: Application) -> None:
+        """טעינת התזכורות הממתינות מה-DB לפני תחילת קבלת העדכונים"""
+        await self.reminders.start(application)
+
+    async def flush_state(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """כתיבת שינויי מצב השיחה שבבאפר לדיסק ושחרור user_data שנשמר מה-Application"""
+        await self.db.run(self.state.flush)
+        self.persistence.evict_user_data(context.application)
+
+    async def evict_state(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """מחיקת מצב שיחה שפג, כולל ה-user_data שה-Application מחזיק בזיכרון"""
+        expired = await self.db.run(self.state.evict_expired)
+        for user_id in expired.get("user_data", ()):
+            context.application.drop_user_data(int(user_id))
 
     # --- Paste ALL the methods from the original main_bot.py's SaveMeBot class here ---
     # For example: start, handle_main_menu, receive_content, etc.
@@ -86,6 +121,7 @@ class SaveMeBot:
             
         elif text == "🔍 חיפוש":
             await self.search_prompt(update, context)
+            return WAITING_SEARCH
             
         elif text == "📚 הצג לפי קטגוריה":
             await self.show_categories(update, context)
@@ -103,7 +139,7 @@ class SaveMeBot:
         # שמירת התוכן זמנית
         content_data = {
             'user_id': user_id,
-            'timestamp': datetime.now()
+            'timestamp': datetime.now().isoformat()
         }
         
         if message.text:
@@ -130,7 +166,7 @@ class SaveMeBot:
             await update.message.reply_text("סוג קובץ לא נתמך. אנא שלח טקסט, תמונה, מסמך או הודעה קולית.")
             return WAITING_CONTENT
         
-        self.pending_items[user_id] = content_data
+        await self.pending_items.set(user_id, content_data)
         
         # הצגת קטגוריות
         await self.show_category_selection(update, context)
@@ -139,7 +175,7 @@ class SaveMeBot:
     async def show_category_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """הצגת בחירת קטגוריה"""
         user_id = update.effective_user.id
-        categories = self.db.get_user_categories(user_id)
+        categories = await self.db.get_user_categories(user_id)
         
         keyboard = []
         for category in categories:
@@ -163,7 +199,12 @@ class SaveMeBot:
             return WAITING_CATEGORY
         elif data.startswith("cat_"):
             category = data[4:]  # הסרת "cat_"
-            self.pending_items[user_id]['category'] = category
+            item = await self.pending_items.get(user_id)
+            if item is None:
+                await query.edit_message_text(PENDING_EXPIRED_TEXT)
+                return ConversationHandler.END
+            item['category'] = category
+            await self.pending_items.set(user_id, item)
             await query.edit_message_text(f"נבחרה קטגוריה: {category}\n\nהקלד נושא לפריט:")
             return WAITING_SUBJECT
         
@@ -178,7 +219,12 @@ class SaveMeBot:
             await update.message.reply_text("שם הקטגוריה לא יכול להיות ריק. נסה שוב:")
             return WAITING_CATEGORY
         
-        self.pending_items[user_id]['category'] = category
+        item = await self.pending_items.get(user_id)
+        if item is None:
+            await update.message.reply_text(PENDING_EXPIRED_TEXT)
+            return ConversationHandler.END
+        item['category'] = category
+        await self.pending_items.set(user_id, item)
         await update.message.reply_text(f"נוצרה קטגוריה: {category}\n\nהקלד נושא לפריט:")
         return WAITING_SUBJECT
 
@@ -191,7 +237,12 @@ class SaveMeBot:
             await update.message.reply_text("הנושא לא יכול להיות ריק. נסה שוב:")
             return WAITING_SUBJECT
         
-        self.pending_items[user_id]['subject'] = subject
+        item = await self.pending_items.get(user_id)
+        if item is None or 'category' not in item:
+            await update.message.reply_text(PENDING_EXPIRED_TEXT)
+            return ConversationHandler.END
+        item['subject'] = subject
+        await self.pending_items.set(user_id, item)
         
         # הצגת אישור שמירה
         keyboard = [[InlineKeyboardButton("✅ שמור", callback_data="confirm_save")]]
@@ -199,7 +250,7 @@ class SaveMeBot:
         
         await update.message.reply_text(
             f"**פרטי הפריט:**\n"
-            f"📁 קטגוריה: {self.pending_items[user_id]['category']}\n"
+            f"📁 קטגוריה: {item['category']}\n"
             f"📝 נושא: {subject}\n\n"
             f"לחץ לשמירה:",
             reply_markup=reply_markup,
@@ -214,14 +265,13 @@ class SaveMeBot:
         
         user_id = update.effective_user.id
         
-        if user_id not in self.pending_items:
+        item_data = await self.pending_items.get(user_id)
+        if item_data is None or 'subject' not in item_data:
             await query.edit_message_text("שגיאה: לא נמצא פריט לשמירה.")
             return
         
-        item_data = self.pending_items[user_id]
-        
         # שמירה במסד הנתונים
-        item_id = self.db.save_item(
+        item_id = await self.db.save_item(
             user_id=user_id,
             category=item_data['category'],
             subject=item_data['subject'],
@@ -233,7 +283,7 @@ class SaveMeBot:
         )
         
         # ניקוי הפריט הזמני
-        del self.pending_items[user_id]
+        await self.pending_items.delete(user_id)
         
         await query.edit_message_text("✅ נשמר בהצלחה!")
         
@@ -242,7 +292,7 @@ class SaveMeBot:
 
     async def show_item_with_actions(self, query_or_update, item_id: int) -> None:
         """הצגת פריט עם כפתורי פעולה"""
-        item = self.db.get_item(item_id)
+        item = await self.db.get_item(item_id)
         if not item:
             return
         
@@ -290,7 +340,7 @@ class SaveMeBot:
         item_id = int(item_id)
         
         if action == "pin":
-            self.db.toggle_pin(item_id)
+            await self.db.toggle_pin(item_id)
             await self.show_item_with_actions(query, item_id)
             
         elif action == "remind":
@@ -310,7 +360,7 @@ class SaveMeBot:
             return WAITING_EDIT
             
         elif action == "note":
-            item = self.db.get_item(item_id)
+            item = await self.db.get_item(item_id)
             if item['note']:
                 await query.edit_message_text(f"ההערה הנוכחית: {item['note']}\n\nהקלד הערה חדשה:")
             else:
@@ -331,14 +381,8 @@ class SaveMeBot:
             _, hours = data.split('_', 2)[1:]
             hours = int(hours)
             reminder_time = datetime.now() + timedelta(hours=hours)
-            self.db.set_reminder(item_id, reminder_time)
-            
-            # הוספת משימה לתזכורת
-            context.job_queue.run_once(
-                self.send_reminder, 
-                when=reminder_time,
-                data={'item_id': item_id, 'user_id': query.from_user.id}
-            )
+            await self.db.set_reminder(item_id, reminder_time)
+            self.reminders.schedule(item_id, query.from_user.id, reminder_time)
             
             await query.edit_message_text(f"✅ תזכורת נקבעה לעוד {hours} שעות")
             await self.show_item_with_actions(query, item_id)
@@ -352,33 +396,34 @@ class SaveMeBot:
             await self.show_item_with_actions(query, item_id)
             
         elif action == "delcontent":
-            self.db.delete_item(item_id)
+            await self.db.delete_item(item_id)
             await query.edit_message_text("✅ הפריט נמחק")
             
         elif action == "delnote":
-            self.db.delete_note(item_id)
+            await self.db.delete_note(item_id)
             await query.edit_message_text("✅ ההערה נמחקה")
             await self.show_item_with_actions(query, item_id)
         
         return ConversationHandler.END
 
-    async def send_reminder(self, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """שליחת תזכורת"""
-        job_data = context.job.data
-        item_id = job_data['item_id']
-        user_id = job_data['user_id']
-        
-        item = self.db.get_item(item_id)
-        if not item:
-            return
-        
-        # שליחת הפריט מחדש
-        await context.bot.send_message(
-            chat_id=user_id,
-            text=f"🔔 **תזכורת!**\n\n{item['category']} | {item['subject']}\n\n{item['content'] or item['caption']}"
-        )
+    async def deliver_reminder(self, bot: Bot, user_id: int, items: List[Dict[str, Any]]) -> None:
+        """שליחת תזכורות שהגיע זמנן - פריט יחיד כמו קודם, כמה פריטים כהודעת סיכום אחת"""
+        if len(items) == 1:
+            item = items[0]
+            # שליחת הפריט מחדש
+            text = f"🔔 **תזכורת!**\n\n{item['category']} | {item['subject']}\n\n{item['content'] or item['caption']}"
+            keyboard = [[InlineKeyboardButton("📂 פתח", callback_data=f"show_{item['id']}")]]
+        else:
+            text = f"🔔 **{len(items)} תזכורות!**\n"
+            for item in items:
+                preview = (item['content'] or item['caption'] or '')[:100]
+                text += f"\n• {item['category']} | {item['subject']}"
+                if preview:
+                    text += f"\n  {preview}"
+            # כפתור פתיחה לכל פריט (עד המגבלה הסבירה של מקלדת)
+            keyboard = [[InlineKeyboardButton(f"📂 {item['subject']}", callback_data=f"show_{item['id']}")] for item in items[:20]]
         
-        self.db.clear_reminder(item_id)
+        await bot.send_message(chat_id=user_id, text=text[:4096], reply_markup=InlineKeyboardMarkup(keyboard))
 
     async def handle_edit_content(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """טיפול בעריכת תוכן פריט"""
@@ -392,9 +437,9 @@ class SaveMeBot:
         
         # עדכון התוכן בהתאם לסוג ההודעה
         if message.text:
-            self.db.update_content(item_id, 'text', content=message.text)
+            await self.db.update_content(item_id, 'text', content=message.text)
         elif message.photo:
-            self.db.update_content(
+            await self.db.update_content(
                 item_id, 'photo', 
                 file_id=message.photo[-1].file_id, 
                 caption=message.caption or ""
@@ -411,7 +456,7 @@ class SaveMeBot:
         note = update.message.text.strip()
         item_id = context.user_data.get('editing_note')
         if not item_id: return ConversationHandler.END
-        self.db.update_note(item_id, note)
+        await self.db.update_note(item_id, note)
         del context.user_data['editing_note']
         await update.message.reply_text("✅ ההערה עודכנה בהצלחה!")
         await self.show_item_with_actions(update, item_id)
@@ -433,8 +478,8 @@ class SaveMeBot:
             return WAITING_REMINDER
 
         reminder_time = datetime.now() + timedelta(hours=hours)
-        self.db.set_reminder(item_id, reminder_time)
-        context.job_queue.run_once(self.send_reminder, reminder_time, data={'item_id': item_id, 'user_id': update.effective_user.id})
+        await self.db.set_reminder(item_id, reminder_time)
+        self.reminders.schedule(item_id, update.effective_user.id, reminder_time)
         
         del context.user_data['custom_reminder']
         await update.message.reply_text(f"✅ תזכורת נקבעה לעוד {hours} שעות")
@@ -444,35 +489,91 @@ class SaveMeBot:
     async def search_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("מה לחפש?")
 
-    async def handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """חיפוש טקסט חופשי והצגת התוצאות עם קטע מודגש מכל פריט"""
         query = update.message.text.strip()
-        results = self.db.search_items(update.effective_user.id, query)
+        if query in MAIN_MENU_BUTTONS:
+            # המשתמש לחץ על כפתור בתפריט במקום להקליד חיפוש
+            return await self.handle_main_menu(update, context)
+
+        results = await self.db.search_items(update.effective_user.id, query)
         if not results:
             await update.message.reply_text("לא נמצאו תוצאות.")
-            return
+            return ConversationHandler.END
+        
+        lines = [f"נמצאו {len(results)} תוצאות:"]
+        for item in results[:10]:
+            pin = "📌 " if item['is_pinned'] else ""
+            lines.append(f"\n{pin}{item['category']} | {item['subject']}")
+            if item['snippet']:
+                lines.append(item['snippet'])
         
         keyboard = [[InlineKeyboardButton(f"{item['category']} | {item['subject']}", callback_data=f"show_{item['id']}")] for item in results[:10]]
-        await update.message.reply_text(f"נמצאו {len(results)} תוצאות:", reply_markup=InlineKeyboardMarkup(keyboard))
+        await update.message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+        return ConversationHandler.END
     
     async def show_categories(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        categories = self.db.get_user_categories(update.effective_user.id)
-        if not categories:
+        summary = await self.db.get_category_summary(update.effective_user.id)
+        if not summary:
             await update.message.reply_text("אין קטגוריות עדיין.")
             return
         
-        keyboard = [[InlineKeyboardButton(f"{cat} ({self.db.get_category_count(update.effective_user.id, cat)})", callback_data=f"showcat_{cat}")] for cat in categories]
+        keyboard = []
+        for cat in summary:
+            pinned = f" 📌{cat['pinned_count']}" if cat['pinned_count'] else ""
+            label = f"{cat['category']} ({cat['item_count']}){pinned}"
+            keyboard.append([InlineKeyboardButton(label, callback_data=f"showcat_{cat['category']}")])
         await update.message.reply_text("בחר קטגוריה:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     async def show_category_items(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         query = update.callback_query
         await query.answer()
         category = query.data[8:]
-        items = self.db.get_category_items(update.effective_user.id, category)
+        context.user_data['browse_category'] = category
+        await self.show_category_page(query, context, category)
+
+    async def handle_category_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """מעבר לדף הבא/הקודם בקטגוריה (catpage_next_<id> / catpage_prev_<id>)"""
+        query = update.callback_query
+        await query.answer()
+        category = context.user_data.get('browse_category')
+        if category is None:
+            await query.edit_message_text("פתח את הקטגוריה מחדש מהתפריט.")
+            return
+        
+        _, direction, item_id = query.data.split('_', 2)
+        if direction == "next":
+            await self.show_category_page(query, context, category, after_id=int(item_id))
+        else:
+            await self.show_category_page(query, context, category, before_id=int(item_id))
+
+    async def show_category_page(self, query, context: ContextTypes.DEFAULT_TYPE, category: str,
+                                 after_id: Optional[int] = None, before_id: Optional[int] = None) -> None:
+        """הצגת דף פריטים בקטגוריה עם כפתורי דפדוף"""
+        page = await self.db.get_category_page(
+            query.from_user.id, category, after_id=after_id, before_id=before_id, limit=CATEGORY_PAGE_SIZE
+        )
+        items = page['items']
+        if page['anchor_missing']:
+            # פריט העוגן נמחק או הועבר לקטגוריה אחרת בינתיים - חוזרים לדף הראשון
+            await self.show_category_page(query, context, category)
+            return
         if not items:
-            await query.edit_message_text("אין פריטים בקטגוריה זו.")
+            if after_id is None and before_id is None:
+                await query.edit_message_text("אין פריטים בקטגוריה זו.")
+            else:
+                # הפריטים שאחרי העוגן נמחקו בינתיים
+                await self.show_category_page(query, context, category)
             return
         
         keyboard = [[InlineKeyboardButton(f"{'📌 ' if item['is_pinned'] else ''}{item['subject']}", callback_data=f"show_{item['id']}")] for item in items]
+        nav = []
+        if page['has_prev']:
+            nav.append(InlineKeyboardButton("➡️ הקודם", callback_data=f"catpage_prev_{items[0]['id']}"))
+        if page['has_next']:
+            nav.append(InlineKeyboardButton("הבא ⬅️", callback_data=f"catpage_next_{items[-1]['id']}"))
+        if nav:
+            keyboard.append(nav)
         await query.edit_message_text(f"📁 {category}:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     async def show_item_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -489,24 +590,104 @@ class SaveMeBot:
         reply_markup = InlineKeyboardMarkup(keyboard)
         await update.message.reply_text("הגדרות:", reply_markup=reply_markup)
 
-# --- Main Execution ---
-def main() -> None:
-    """Start the bot and the keep-alive server."""
-    # Start Flask server in a background thread
-    flask_thread = threading.Thread(target=run_flask)
-    flask_thread.start()
+    async def show_export_options(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """בחירת פורמט לייצוא"""
+        query = update.callback_query
+        await query.answer()
+        keyboard = [
+            [InlineKeyboardButton("📄 JSON", callback_data="exportfmt_json"),
+             InlineKeyboardButton("📊 CSV", callback_data="exportfmt_csv")],
+            [InlineKeyboardButton("🗜️ JSON (ZIP)", callback_data="exportfmt_json_zip"),
+             InlineKeyboardButton("🗜️ CSV (ZIP)", callback_data="exportfmt_csv_zip")]
+        ]
+        await query.edit_message_text("באיזה פורמט לייצא?", reply_markup=InlineKeyboardMarkup(keyboard))
 
-    # Get bot token from environment variable
-    token = os.environ.get('BOT_TOKEN')
-    if not token:
-        logger.error("FATAL: BOT_TOKEN environment variable is not set.")
-        return
+    async def handle_export(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """ייצוא כל הפריטים של המשתמש ושליחתם כקובץ"""
+        query = update.callback_query
+        await query.answer()
+        user_id = update.effective_user.id
+        parts = query.data.split('_')
+        fmt, compress = parts[1], parts[-1] == "zip"
+        
+        await query.edit_message_text("⏳ מכין את הקובץ...")
+        try:
+            # הכתיבה לקובץ הזמני רצה ב-executor של מסד הנתונים
+            export_file, filename, count = await self.db.run(export_user_items, self.db.db, user_id, fmt, compress)
+        except Exception as e:
+            logger.error(f"Error exporting data for user {user_id}: {e}")
+            await query.edit_message_text("שגיאה בייצוא הנתונים.")
+            return
+        
+        try:
+            if not count:
+                await query.edit_message_text("אין נתונים לייצוא.")
+                return
+            size = file_size(export_file)
+            if size > MAX_DOCUMENT_SIZE:
+                logger.error(f"Export for user {user_id} is {size} bytes, over the upload limit")
+                message = "הקובץ גדול מדי לשליחה בטלגרם (מעל 50MB)."
+                if not compress:
+                    message += " נסה לייצא בפורמט ZIP."
+                await query.edit_message_text(message)
+                return
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=export_file,
+                filename=filename,
+                caption=f"📦 {count} פריטים יוצאו"
+            )
+            await query.edit_message_text("✅ הייצוא הושלם")
+        except TelegramError as e:
+            logger.error(f"Error sending export to user {user_id}: {e}")
+            try:
+                await query.edit_message_text("שגיאה בשליחת קובץ הייצוא. נסה שוב מאוחר יותר.")
+            except TelegramError as edit_error:
+                logger.error(f"Error updating export status for user {user_id}: {edit_error}")
+        finally:
+            export_file.close()
+
+    async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """הצגת סטטיסטיקות המשתמש"""
+        query = update.callback_query
+        await query.answer()
+        stats = await self.db.get_user_stats(update.effective_user.id)
+        if not stats:
+            await query.edit_message_text("שגיאה בטעינת הסטטיסטיקות.")
+            return
+        
+        await query.edit_message_text(
+            "📊 הסטטיסטיקות שלך:\n\n"
+            f"📝 פריטים שמורים: {stats['total_items']}\n"
+            f"📁 קטגוריות: {stats['total_categories']}\n"
+            f"📌 פריטים קבועים: {stats['pinned_items']}\n"
+            f"🕰️ תזכורות פעילות: {stats['active_reminders']}\n"
+            f"🗒️ פריטים עם הערות: {stats['items_with_notes']}"
+        )
+
+# --- Main Execution ---
+def build_application(token: str, request: Optional[BaseRequest] = None,
+                      get_updates_request: Optional[BaseRequest] = None) -> Application:
+    """Create the bot and its Application with all handlers registered.
 
-    # Create bot instance
+    request/get_updates_request let several bots in one process share an HTTP pool.
+    """
+    metrics.instrument_class(Database, "sqlite")
     bot = SaveMeBot()
 
     # Set up the application
-    application = Application.builder().token(token).build()
+    if request is None:
+        request, get_updates_request = shared_requests()
+    application = (
+        with_api_server(Application.builder())
+        .token(token)
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .post_init(bot.post_init)
+        .persistence(bot.persistence)
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .build()
+    )
 
     # --- Register all handlers from the original bot ---
     conv_handler = ConversationHandler(
@@ -520,10 +701,15 @@ def main() -> None:
             WAITING_SUBJECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot.receive_subject)],
             WAITING_EDIT: [MessageHandler(filters.ALL & ~filters.COMMAND, bot.handle_edit_content)],
             WAITING_NOTE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_edit_note)],
-            WAITING_REMINDER: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_custom_reminder)]
+            WAITING_REMINDER: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_custom_reminder)],
+            WAITING_SEARCH: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_search)]
         },
         fallbacks=[CommandHandler("start", bot.start)],
-        per_message=False
+        per_message=False,
+        # המצב נשמר ב-conversation_state ושורד הפעלה מחדש; שיחה נטושה מסתיימת אחרי ה-TTL
+        name="save_me_conversation",
+        persistent=True,
+        conversation_timeout=CONVERSATION_STATE_TTL_SECONDS,
     )
     
     application.add_handler(CommandHandler("start", bot.start))
@@ -534,14 +720,30 @@ def main() -> None:
     item_actions_pattern = "^(pin_|remind_|edit_|note_|delete_|setremind_|customremind_|back_|delcontent_|delnote_)"
     application.add_handler(CallbackQueryHandler(bot.handle_item_actions, pattern=item_actions_pattern))
     application.add_handler(CallbackQueryHandler(bot.show_category_items, pattern="^showcat_"))
+    application.add_handler(CallbackQueryHandler(bot.handle_category_page, pattern="^catpage_"))
     application.add_handler(CallbackQueryHandler(bot.show_item_callback, pattern="^show_"))
     application.add_handler(CallbackQueryHandler(bot.handle_category_selection, pattern="^new_category"))
-    
-    # application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_search))
+    application.add_handler(CallbackQueryHandler(bot.show_stats, pattern="^stats$"))
+    application.add_handler(CallbackQueryHandler(bot.show_export_options, pattern="^export$"))
+    application.add_handler(CallbackQueryHandler(bot.handle_export, pattern="^exportfmt_"))
+
+    metrics.instrument_application(application, "save_me", state_names=CONVERSATION_STATE_NAMES)
+    metrics.track_size("save_me", "pending_items", lambda: len(bot.pending_items))
+
+    application.job_queue.run_repeating(bot.flush_state, interval=STATE_FLUSH_SECONDS)
+    application.job_queue.run_repeating(bot.evict_state, interval=STATE_EVICT_SECONDS)
+    return application
+
+def main(token: Optional[str] = None, serve_http: bool = True) -> None:
+    """Start the bot and its HTTP server (health checks, and webhooks in webhook mode)."""
+    # Get bot token from environment variable
+    token = token or os.environ.get('BOT_TOKEN')
+    if not token:
+        logger.error("FATAL: BOT_TOKEN environment variable is not set.")
+        return
 
-    # Run the bot
-    logger.info("Bot is starting to poll...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info("Bot is starting...")
+    run_bots({"save_me": build_application(token)}, serve_http=serve_http)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
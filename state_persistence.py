@@ -0,0 +1,134 @@
+"""BasePersistence של PTB מעל ConversationStateStore: user_data ומצבי ConversationHandler
+שורדים הפעלה מחדש, עם אותן תפוגה ותקרת זיכרון של המאגר.
+
+user_data לא נטען כולו בעלייה - כל משתמש נטען בעדכון הראשון שלו (refresh_user_data).
+ה-Application מחזיק עותק משלו של user_data לכל משתמש שפנה; evict_user_data משחרר ממנו
+משתמשים שנשמרו ונפלטו מהמאגר, כך שגם הוא נשאר בתוך התקרה.
+chat_data, bot_data ו-callback_data לא נשמרים.
+"""
+import json
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Set, Tuple
+
+from telegram.ext import Application, BasePersistence, PersistenceInput
+
+from database.conversation_state import ConversationStateStore, StateNamespace
+
+USER_DATA = "user_data"
+CONVERSATIONS = "conversation"
+
+ConversationKey = Tuple[int, ...]
+
+
+class ConversationStatePersistence(BasePersistence):
+    def __init__(self, store: ConversationStateStore, run: Callable[..., Awaitable[Any]],
+                 update_interval: float = 10):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.run = run
+        self.user_data = StateNamespace(store, USER_DATA, run)
+        # משתמשים שקיבלו עדכון ועוד לא נשמרו - ה-user_data שלהם ב-Application חדש מהמאגר
+        self._unsaved: Set[int] = set()
+        # משתמשים ששוחררו רק מהזיכרון של ה-Application -> ה-user_data שלו
+        self._evicted: Dict[int, Mapping[int, Any]] = {}
+
+    def _conversations(self, name: str) -> StateNamespace:
+        return StateNamespace(self.store, f"{CONVERSATIONS}:{name}", self.run)
+
+    # --- user_data ---
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        # נקרא לפני כל עדכון. user_data ריק נבדק במאגר, וגם היעדר נשמר שם בזיכרון
+        self._unsaved.add(user_id)
+        if not user_data:
+            stored = await self.user_data.get(user_id)
+            if stored:
+                user_data.update(stored)
+        else:
+            self.store.touch(USER_DATA, user_id)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._unsaved.discard(user_id)
+        if data:
+            await self.user_data.set(user_id, data)
+        else:
+            await self.user_data.delete(user_id)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        application_data = self._evicted.pop(user_id, None)
+        if application_data is None:
+            self._unsaved.discard(user_id)
+            await self.user_data.delete(user_id)
+            return
+        # שוחרר ע"י evict_user_data: המאגר כבר מעודכן, אלא אם המשתמש חזר לפני הריצה הזו
+        # (ואז ה-Application דילג על השמירה שלו בגלל המחיקה הממתינה)
+        data = application_data.get(user_id)
+        if data is not None:
+            await self.update_user_data(user_id, data)
+
+    def evict_user_data(self, application: Application) -> int:
+        """שחרור user_data מהזיכרון של ה-Application למשתמשים שכל השינויים שלהם נשמרו,
+        והנתונים שלהם ריקים או כבר נפלטו מהזיכרון של המאגר. הם נטענים שוב ב-refresh_user_data.
+
+        chat_data לא נשמר, ולכן רק רשומות ריקות שלו משוחררות. מחזיר כמה משתמשים שוחררו.
+        """
+        evicted = 0
+        for user_id, data in list(application.user_data.items()):
+            if user_id in self._unsaved or user_id in self._evicted:
+                continue
+            if data and self.store.contains(USER_DATA, user_id):
+                continue
+            self._evicted[user_id] = application.user_data
+            application.drop_user_data(user_id)
+            evicted += 1
+        for chat_id, data in list(application.chat_data.items()):
+            if not data:
+                application.drop_chat_data(chat_id)
+        return evicted
+
+    # --- שיחות ---
+    async def get_conversations(self, name: str) -> Dict[ConversationKey, object]:
+        stored = await self.run(self.store.load_namespace, f"{CONVERSATIONS}:{name}")
+        return {tuple(json.loads(key)): state for key, state in stored.items()}
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        conversations = self._conversations(name)
+        if new_state is None:
+            await conversations.delete(json.dumps(list(key)))
+        else:
+            await conversations.set(json.dumps(list(key)), new_state)
+
+    async def flush(self) -> None:
+        await self.run(self.store.flush)
+
+    # --- לא נשמרים ---
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        pass
+
+    async def update_bot_data(self, data: Any) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
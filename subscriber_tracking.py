@@ -1,14 +1,25 @@
 import logging
 import os
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, ConversationHandler, CallbackQueryHandler
-import http.server
-import socketserver
-import threading
-from datetime import datetime, time, timedelta
-import pymongo
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, ConversationHandler, CallbackQueryHandler, AIORateLimiter
+from telegram.request import BaseRequest
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
 import re
-from bson.objectid import ObjectId
+import uuid
+
+from database.item_cache import ItemCache
+from database import mongo_client
+from database.billing_dates import days_until, following_charge_date, roll_forward, start_of_day
+from database.delivery_schedule import BUCKET_MINUTES, TIMEZONES, bucket_of, local_today
+from database.leader_lease import LEASE_COLLECTION, LeaderLease
+from database.mongo_schema import REMINDER_DAYS_AHEAD, bootstrap_schema, log_query_plans
+from database.subscription_repository import AsyncSubscriptionRepository, SubscriptionRepository
+from database.user_registry import UserRegistry
+import metrics
+from bot_request import shared_requests, with_api_server
+from web_server import run_bots
 
 # --- הגדרות בסיסיות ---
 logging.basicConfig(
@@ -16,27 +27,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# --- קבועים ומשתני סביבה ---
-TOKEN = os.environ.get("BOT_TOKEN")
-MONGO_URI = os.environ.get("MONGO_URI")
-print("🔍 Mongo URI:", MONGO_URI)
-PORT = int(os.environ.get("PORT", 8080))
-
 # --- הגדרת מסד הנתונים ---
-client = pymongo.MongoClient(MONGO_URI)
-db = client.get_database("SubscriptionBotDB")
-subscriptions_collection = db.get_collection("subscriptions")
-users_collection = db.get_collection("users")
+# נוצרים ב-init_storage בתוך התהליך שמריץ את הבוט, לא בזמן import (הלקוח לא שורד fork).
+# כל גישה ל-Mongo מתוך handlers עוברת דרך repository, שמריץ את pymongo ב-thread pool
+repository: Optional[AsyncSubscriptionRepository] = None
+user_registry: Optional[UserRegistry] = None
+USER_REGISTRY_FLUSH_SECONDS = 30
+
+# כמה עותקים יכולים לרוץ במקביל; רק מחזיק החכירה מריץ את המשימות המתוזמנות
+leader_lease: Optional[LeaderLease] = None
+LEADER_LEASE_NAME = "subscription_scheduler"
+LEADER_LEASE_TTL_SECONDS = float(os.environ.get("LEADER_LEASE_TTL_SECONDS", 15))
+LEADER_HEARTBEAT_SECONDS = float(os.environ.get("LEADER_HEARTBEAT_SECONDS", 5))
+
+# הודעת "המנויים שלי" המוכנה לכל צ'אט, עם summary_version שממנה נבנתה. הגרסה נשמרת
+# ב-Mongo ועולה בכל הוספה ומחיקה, כך ששינוי דרך עותק אחר של הבוט מבטל גם את המטמון כאן
+SUMMARY_CACHE_SIZE = 2048
+summary_cache = ItemCache(SUMMARY_CACHE_SIZE)
+
+# --- הגדרות הבדיקה היומית ---
+# הבדיקה רצה כל רבע שעה על דליי המשלוח שהגיע זמנם; הנעילה מונעת ריצות חופפות באותו תהליך.
+# הדלי האחרון שנבדק נשמר ב-job_checkpoints, כך שאחרי אתחול ממשיכים ממנו
+REMINDER_CHECKPOINT = "reminder_check"
+DELIVERY_CLAIM_STALE_AFTER = timedelta(minutes=10)  # תפיסת משלוח של ריצה שקרסה
+_last_checked = {"day": None, "bucket": -1}
+_check_lock = asyncio.Lock()
+DAILY_CHECK_BATCH_SIZE = 1000      # גודל מנה בקריאה מה-cursor
+DAILY_CHECK_CONCURRENCY = 20       # מספר שליחות במקביל
+DAILY_CHECK_SEND_CHUNK = 1000      # מספר צ'אטים שמתוזמנים יחד (כדי לא ליצור 100k משימות בבת אחת)
 
 # --- הגדרת שלבים לשיחה (Conversation) ---
 NAME, DAY, COST, CURRENCY = range(4)
+CONVERSATION_STATE_NAMES = {NAME: "NAME", DAY: "DAY", COST: "COST", CURRENCY: "CURRENCY"}
 
-# --- שרת Keep-Alive ---
-def run_keep_alive_server():
-    handler = http.server.SimpleHTTPRequestHandler
-    with socketserver.TCPServer(("", PORT), handler) as httpd:
-        logger.info(f"Keep-alive server started on port {PORT}")
-        httpd.serve_forever()
+def init_storage() -> None:
+    """יצירת הלקוח וה-repository בתהליך הנוכחי, ופינג ראשון לחימום החיבור"""
+    global repository, user_registry, leader_lease
+    db = mongo_client.get_database()
+    repository = AsyncSubscriptionRepository(SubscriptionRepository(db))
+    user_registry = UserRegistry(db.get_collection("users"))
+    leader_lease = LeaderLease(db[LEASE_COLLECTION], LEADER_LEASE_NAME, ttl=LEADER_LEASE_TTL_SECONDS)
+    mongo_client.warm_up()
 
 # --- פונקציית עזר לשמירת משתמש ---
 async def ensure_user_in_db(update: Update):
@@ -50,12 +81,35 @@ async def ensure_user_in_db(update: Update):
         "first_name": user.first_name,
         "username": user.username,
     }
-    # $setOnInsert יקבע את התאריך רק כשהמשתמש נוצר לראשונה
-    users_collection.update_one(
-        {"chat_id": user.id},
-        {"$set": user_info, "$setOnInsert": {"first_seen": datetime.now()}},
-        upsert=True
-    )
+    # משתמש שלא השתנה לא עולה כלום; שינויים נכתבים במנות ע"י flush_user_registry
+    user_registry.touch(user_info)
+    if user_registry.should_flush():
+        await repository.run(user_registry.flush)
+
+async def flush_user_registry(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await repository.run(user_registry.flush)
+
+async def leader_heartbeat(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """חידוש החכירה. עותק שהפך למנהיג משלים מיד את מה שהמנהיג הקודם לא הספיק"""
+    was_leader = leader_lease.is_leader
+    if await repository.run(leader_lease.try_acquire) and not was_leader:
+        # מנהיג קודם אולי התקדם מאז - נקודת ההמשך תיטען מחדש מ-job_checkpoints
+        _last_checked.update(day=None, bucket=-1)
+        context.job_queue.run_once(daily_check, when=0)
+
+async def refresh_delivery_buckets(context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not leader_lease.is_leader:
+        return
+    updated = await repository.refresh_delivery_buckets()
+    if updated:
+        logger.info(f"Moved {updated} subscriptions to new delivery buckets")
+
+async def on_shutdown(application: Application) -> None:
+    """כתיבת עדכוני המשתמשים שעוד בבאפר ושחרור החכירה לפני יציאה"""
+    await repository.run(user_registry.flush)
+    await repository.run(leader_lease.release)
+    repository.close()
+    mongo_client.close_client()
 
 # --- פונקציות תפריטים ---
 def get_main_menu():
@@ -63,6 +117,7 @@ def get_main_menu():
         [InlineKeyboardButton("➕ הוספת מנוי חדש", callback_data="add_sub_start")],
         [InlineKeyboardButton("📋 הצגת המנויים שלי", callback_data="my_subs")],
         [InlineKeyboardButton("➖ מחיקת מנוי", callback_data="delete_sub_menu")],
+        [InlineKeyboardButton("⏰ שעת התזכורות", callback_data="reminder_settings")],
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -136,7 +191,7 @@ async def received_currency(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "cost": context.user_data['cost'],
         "currency": currency_symbol_map.get(currency_code, currency_code)
     }
-    subscriptions_collection.insert_one(subscription_data)
+    await repository.add_subscription(subscription_data)
     
     await query.edit_message_text(f"המנוי '{context.user_data['name']}' נוסף בהצלחה!")
     
@@ -153,36 +208,51 @@ async def cancel_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     context.user_data.clear()
     return ConversationHandler.END
 
+def build_summary_message(groups: list):
+    """הודעת "המנויים שלי" מתוצאת הסיכום, או None אם אין מנויים."""
+    if not groups:
+        return None
+
+    rows = sorted(
+        ((row, group['_id']) for group in groups for row in group['rows']),
+        key=lambda pair: pair[0]['_id'],
+    )
+    message = "אלו המנויים הרשומים שלך:\n\n"
+    for sub, currency in rows:
+        message += f"- **{sub['service_name']}** (חיוב ב-{sub['billing_day']} לחודש, עלות: {sub['cost']} {currency})\n"
+
+    message += "\n**סה\"כ עלות חודשית:**"
+    for group in groups:
+        message += f"\n- {group['total']} {group['_id']}"
+    return message
+
 async def my_subs_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await ensure_user_in_db(update) # בדיקת משתמש
     await query.answer()
-    user_subs = list(subscriptions_collection.find({"chat_id": update.effective_chat.id}))
-    
-    if not user_subs:
+    chat_id = update.effective_chat.id
+
+    # קריאה נקודתית של הגרסה במקום האגרגציה
+    version = await repository.get_summary_version(chat_id)
+    cached = summary_cache.get(chat_id)
+    if cached is None or cached["version"] != version:
+        generation = summary_cache.generation()
+        groups = await repository.subscription_summary(chat_id)
+        cached = {"version": version, "message": build_summary_message(groups)}
+        summary_cache.fill(chat_id, cached, generation)
+    message = cached["message"]
+
+    if message is None:
         await query.edit_message_text("לא רשומים לך מנויים.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 חזרה", callback_data="main_menu")]]))
         return
 
-    message = "אלו המנויים הרשומים שלך:\n\n"
-    total_costs = {}
-    for sub in user_subs:
-        currency = sub.get('currency', '')
-        cost = sub.get('cost', 0)
-        message += f"- **{sub['service_name']}** (חיוב ב-{sub['billing_day']} לחודש, עלות: {cost} {currency})\n"
-        if currency not in total_costs: total_costs[currency] = 0
-        total_costs[currency] += cost
-        
-    message += "\n**סה\"כ עלות חודשית:**"
-    for currency, total in total_costs.items():
-        message += f"\n- {total} {currency}"
-        
     await query.edit_message_text(message, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 חזרה", callback_data="main_menu")]]))
 
 async def delete_sub_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await ensure_user_in_db(update) # בדיקת משתמש
     await query.answer()
-    user_subs = list(subscriptions_collection.find({"chat_id": update.effective_chat.id}))
+    user_subs = await repository.list_subscriptions(update.effective_chat.id, {"service_name": 1})
     if not user_subs:
         await query.edit_message_text("אין לך מנויים למחוק.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 חזרה", callback_data="main_menu")]]))
         return
@@ -197,39 +267,219 @@ async def delete_sub_confirm_callback(update: Update, context: ContextTypes.DEFA
     await query.answer()
     sub_id_str = query.data.split('_')[1]
     
-    subscriptions_collection.delete_one({"_id": ObjectId(sub_id_str)})
+    await repository.delete_subscription(update.effective_chat.id, sub_id_str)
     
     await query.edit_message_text("המנוי נמחק.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 חזרה לתפריט הראשי", callback_data="main_menu")]]))
 
+async def reminder_settings_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await ensure_user_in_db(update) # בדיקת משתמש
+    await query.answer()
+    settings = await repository.get_delivery_settings(update.effective_chat.id)
+
+    keyboard = [[InlineKeyboardButton(label, callback_data=f"tz_{index}")] for index, (label, _) in enumerate(TIMEZONES)]
+    keyboard.append([InlineKeyboardButton("🔙 חזרה", callback_data="main_menu")])
+    await query.edit_message_text(
+        f"התזכורות נשלחות כרגע בשעה {settings['reminder_hour']:02d}:00 ({settings['timezone']}).\n\nבחר אזור זמן:",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+async def reminder_timezone_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    index = int(query.data.split('_')[1])
+    if not 0 <= index < len(TIMEZONES):
+        return
+    context.user_data['reminder_tz'] = TIMEZONES[index][1]
+
+    hours = [InlineKeyboardButton(f"{hour:02d}:00", callback_data=f"hour_{hour}") for hour in range(24)]
+    keyboard = [hours[row:row + 6] for row in range(0, 24, 6)]
+    keyboard.append([InlineKeyboardButton("🔙 חזרה", callback_data="reminder_settings")])
+    await query.edit_message_text("באיזו שעה לשלוח את התזכורות?", reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def reminder_hour_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    hour = int(query.data.split('_')[1])
+    tz_name = context.user_data.pop('reminder_tz', None)
+    if tz_name is None or not 0 <= hour < 24:
+        await query.edit_message_text("הבחירה פגה, נסה שוב.", reply_markup=get_main_menu())
+        return
+
+    await repository.set_delivery_settings(update.effective_chat.id, tz_name, hour)
+    await query.edit_message_text(
+        f"מעכשיו התזכורות יישלחו בשעה {hour:02d}:00 ({tz_name}).",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 חזרה לתפריט הראשי", callback_data="main_menu")]]),
+    )
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error("Exception while handling an update:", exc_info=context.error)
 
+async def collect_due_subscriptions(now: datetime, first_bucket: int, last_bucket: int) -> tuple:
+    """המנויים בדליים הנתונים שהחיוב הבא שלהם בתוך חלון התזכורת, מקובצים לפי chat_id.
+
+    החלון נמדד מהיום המקומי של כל משתמש. מחזיר גם עדכונים למנויים שהחיוב שלהם כבר עבר
+    (השבתה ארוכה), כדי לקדם אותם בלי לשלוח תזכורת על חיוב שכבר היה.
+    """
+    # יום נוסף מכסה משתמשים שהיום המקומי שלהם כבר מחר ביחס ל-UTC
+    until = start_of_day(now.replace(tzinfo=None)) + timedelta(days=REMINDER_DAYS_AHEAD + 1)
+    subs_by_chat = {}
+    skipped = []
+    async for batch in repository.iter_due_subscriptions(until, first_bucket, last_bucket, DAILY_CHECK_BATCH_SIZE):
+        for sub in batch:
+            today = local_today(sub.get('delivery_tz') or 'UTC', now)
+            charge = roll_forward(sub['billing_day'], sub['next_charge_date'], today)
+            if charge > today + timedelta(days=REMINDER_DAYS_AHEAD):
+                if charge != sub['next_charge_date']:
+                    skipped.append((sub['_id'], sub['next_charge_date'], None, charge))
+                continue
+            sub['charge_date'] = charge
+            sub['local_today'] = today
+            subs_by_chat.setdefault(sub['chat_id'], []).append(sub)
+    return subs_by_chat, skipped
+
+def _when_text(charge_date: datetime, today: datetime) -> str:
+    days = days_until(charge_date, today)
+    date_text = charge_date.strftime('%d/%m')
+    if days == 0:
+        return f"היום, {date_text}"
+    if days == 1:
+        return f"מחר, {date_text}"
+    return f"בעוד {days} ימים, בתאריך {date_text}"
+
+def build_reminder_message(subs: list, today: datetime) -> str:
+    """הודעת תזכורת אחת לצ'אט, גם כשיש לו כמה מנויים שמחויבים בקרוב."""
+    if len(subs) == 1:
+        sub = subs[0]
+        return f"🔔 **תזכורת תשלום** 🔔\n\n{_when_text(sub['charge_date'], today)}, יתבצע חיוב עבור המנוי שלך ל-**{sub['service_name']}** בסך **{sub.get('cost', '')} {sub.get('currency', '')}**."
+    
+    message = "🔔 **תזכורת תשלום** 🔔\n\nבימים הקרובים יתבצעו החיובים הבאים:\n"
+    for sub in sorted(subs, key=lambda sub: sub['charge_date']):
+        message += f"\n- {_when_text(sub['charge_date'], today)}: **{sub['service_name']}** בסך **{sub.get('cost', '')} {sub.get('currency', '')}**"
+    return message
+
 async def daily_check(context: ContextTypes.DEFAULT_TYPE) -> None:
-    logger.info("Running daily subscription check...")
-    reminder_date = datetime.now() + timedelta(days=4)
-    reminder_day = reminder_date.day
+    """שליחת התזכורות של דליי המשלוח שהגיע זמנם היום ועוד לא נבדקו (כולל דליים שהוחמצו)."""
+    if not leader_lease.is_leader:
+        return
+    async with _check_lock:
+        now = datetime.now(timezone.utc)
+        if _last_checked["day"] is None:
+            checkpoint = await repository.get_checkpoint(REMINDER_CHECKPOINT)
+            _last_checked.update(day=checkpoint.get("day"), bucket=checkpoint.get("bucket", -1))
+        today = now.date().isoformat()
+        bucket = bucket_of(now)
+        first_bucket = _last_checked["bucket"] + 1 if _last_checked["day"] == today else 0
+        if first_bucket > bucket:
+            return
+        duplicates = await check_buckets(context, now, first_bucket, bucket)
+        _last_checked.update(day=today, bucket=bucket)
+        await repository.save_checkpoint(
+            REMINDER_CHECKPOINT, {"day": today, "bucket": bucket}, {"duplicates_prevented": duplicates}
+        )
+
+async def check_buckets(context: ContextTypes.DEFAULT_TYPE, now: datetime, first_bucket: int, last_bucket: int) -> int:
+    """שליחת תזכורות לכל החיובים שבחלון. כל חיוב מקבל תזכורת אחת, גם אם הריצה הוחמצה או רצה פעמיים.
+
+    לפני כל מנה המשלוחים נתפסים ב-reminder_deliveries, ומה שכבר נשלח או נתפס ע"י ריצה אחרת
+    לא נשלח שוב. מחזיר את מספר התזכורות הכפולות שנמנעו.
+    """
+    logger.info(f"Running subscription check for buckets {first_bucket}-{last_bucket}...")
+    started = datetime.now()
+    run_id = uuid.uuid4().hex
     
-    subs_due = subscriptions_collection.find({"billing_day": reminder_day})
+    subs_by_chat, skipped = await collect_due_subscriptions(now, first_bucket, last_bucket)
+    await repository.advance_charge_dates(skipped)
     
-    for sub in subs_due:
-        currency = sub.get('currency', '')
-        cost = sub.get('cost', '')
-        message = f"🔔 **תזכורת תשלום** 🔔\n\nבעוד 4 ימים, בתאריך {reminder_date.strftime('%d/%m')}, יתבצע חיוב עבור המנוי שלך ל-**{sub['service_name']}** בסך **{cost} {currency}**."
-        try:
-            await context.bot.send_message(chat_id=sub['chat_id'], text=message, parse_mode='Markdown')
-        except Exception as e:
-            logger.error(f"Failed to send reminder to {sub['chat_id']}: {e}")
-
-def main() -> None:
-    if not TOKEN or not MONGO_URI:
-        logger.fatal("FATAL: BOT_TOKEN or MONGO_URI environment variables are missing!")
-        return
+    semaphore = asyncio.Semaphore(DAILY_CHECK_CONCURRENCY)
+    stats = {"sent": 0, "failed": 0, "duplicates": 0}
+    
+    def advance(sub: dict) -> tuple:
+        return (sub['_id'], sub['next_charge_date'], sub['charge_date'], following_charge_date(sub['billing_day'], sub['charge_date']))
+    
+    async def send(chat_id: int, subs: list) -> bool:
+        async with semaphore:
+            try:
+                await context.bot.send_message(chat_id=chat_id, text=build_reminder_message(subs, subs[0]['local_today']), parse_mode='Markdown')
+                stats["sent"] += 1
+                return True
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error(f"Failed to send reminder to {chat_id}: {e}")
+                return False
+    
+    chats = list(subs_by_chat.items())
+    for start in range(0, len(chats), DAILY_CHECK_SEND_CHUNK):
+        chunk = chats[start:start + DAILY_CHECK_SEND_CHUNK]
+        claimed, already_sent = await repository.claim_deliveries(
+            [(sub['_id'], sub['charge_date'], chat_id) for chat_id, subs in chunk for sub in subs],
+            run_id, DELIVERY_CLAIM_STALE_AFTER,
+        )
+        
+        updates = []
+        to_send = []
+        for chat_id, subs in chunk:
+            mine = []
+            for sub in subs:
+                key = (sub['_id'], sub['charge_date'])
+                if key in claimed:
+                    mine.append(sub)
+                    continue
+                stats["duplicates"] += 1
+                # נשלח בריצה קודמת שלא הספיקה לקדם את התאריך
+                if key in already_sent:
+                    updates.append(advance(sub))
+            if mine:
+                to_send.append((chat_id, mine))
+        
+        results = await asyncio.gather(*(send(chat_id, subs) for chat_id, subs in to_send))
+        sent_ids, failed_ids = [], []
+        for (chat_id, subs), ok in zip(to_send, results):
+            ids = [claimed[(sub['_id'], sub['charge_date'])] for sub in subs]
+            if ok:
+                sent_ids.extend(ids)
+                updates.extend(advance(sub) for sub in subs)
+            else:
+                failed_ids.extend(ids)
+        # רישום המנה ביומן ואז קידום התאריכים - קריסה בין השניים רק משאירה את המנה רשומה כנשלחה
+        await repository.finish_deliveries(sent_ids, failed_ids)
+        await repository.advance_charge_dates(updates)
+    
+    elapsed = (datetime.now() - started).total_seconds()
+    total_subs = sum(len(subs) for subs in subs_by_chat.values())
+    rate = stats["sent"] / elapsed if elapsed else 0
+    logger.info(
+        f"Subscription check done in {elapsed:.1f}s: {total_subs} subscriptions in {len(chats)} chats, "
+        f"{stats['sent']} messages sent, {stats['failed']} failed, {stats['duplicates']} duplicates prevented, "
+        f"{len(skipped)} past charges skipped ({rate:.1f} msg/s)"
+    )
+    return stats["duplicates"]
 
-    keep_alive_thread = threading.Thread(target=run_keep_alive_server)
-    keep_alive_thread.daemon = True
-    keep_alive_thread.start()
+def build_application(token: str, request: Optional[BaseRequest] = None,
+                      get_updates_request: Optional[BaseRequest] = None) -> Application:
+    """חיבור ל-Mongo, הכנת הסכמה ובניית ה-Application עם כל ה-handlers והמשימות.
 
-    application = Application.builder().token(TOKEN).build()
+    request/get_updates_request מאפשרים לכמה בוטים באותו תהליך לחלוק מאגר HTTP.
+    """
+    # המאזין חל רק על לקוחות שנוצרים אחריו
+    metrics.register_mongo_listener()
+    # אינדקסים וגרסת סכמה (אידמפוטנטי), ותוכניות השאילתות החמות ללוג
+    init_storage()
+    bootstrap_schema(mongo_client.get_database())
+    log_query_plans(mongo_client.get_database())
+
+    # מגביל קצב שמכיר את המגבלות של טלגרם ומנסה שוב אחרי RetryAfter
+    if request is None:
+        request, get_updates_request = shared_requests()
+    application = (
+        with_api_server(Application.builder())
+        .token(token)
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .post_shutdown(on_shutdown)
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .build()
+    )
     
     conv_handler = ConversationHandler(
         entry_points=[CallbackQueryHandler(add_sub_start, pattern="^add_sub_start$")],
@@ -250,11 +500,37 @@ def main() -> None:
     application.add_handler(CallbackQueryHandler(delete_sub_menu_callback, pattern="^delete_sub_menu$"))
     application.add_handler(CallbackQueryHandler(delete_sub_confirm_callback, pattern="^delete_"))
     application.add_handler(CallbackQueryHandler(main_menu_callback, pattern="^main_menu$"))
+    application.add_handler(CallbackQueryHandler(reminder_settings_callback, pattern="^reminder_settings$"))
+    application.add_handler(CallbackQueryHandler(reminder_timezone_callback, pattern=r"^tz_\d+$"))
+    application.add_handler(CallbackQueryHandler(reminder_hour_callback, pattern=r"^hour_\d+$"))
+    metrics.instrument_application(application, "subscriptions", state_names=CONVERSATION_STATE_NAMES)
 
-    application.job_queue.run_daily(daily_check, time=time(hour=9, minute=0))
+    # בדיקה קטנה בכל רבע שעה, צמודה לתחילת הדלי. הריצה הראשונה משלימה את הדליים של היום שהוחמצו
+    now = datetime.now(timezone.utc)
+    seconds_into_bucket = (now.minute % BUCKET_MINUTES) * 60 + now.second
+    application.job_queue.run_repeating(
+        daily_check, interval=BUCKET_MINUTES * 60, first=BUCKET_MINUTES * 60 - seconds_into_bucket + 5
+    )
+    # הריצה הראשונה (השלמת הדליים של היום) מופעלת כשהעותק הזה תופס את החכירה
+    application.job_queue.run_repeating(leader_heartbeat, interval=LEADER_HEARTBEAT_SECONDS, first=0)
+    # הדליים מחושבים לפי ההפרש הנוכחי מ-UTC ומתעדכנים אחרי מעבר שעון קיץ/חורף
+    application.job_queue.run_daily(refresh_delivery_buckets, time=time(hour=0, minute=5))
+    application.job_queue.run_repeating(flush_user_registry, interval=USER_REGISTRY_FLUSH_SECONDS)
     
-    logger.info("Bot starting with Polling...")
-    application.run_polling()
+    return application
+
+def main(token: Optional[str] = None, serve_http: bool = True) -> None:
+    token = token or os.environ.get("BOT_TOKEN")
+    if not token or not os.environ.get("MONGO_URI"):
+        logger.fatal("FATAL: BOT_TOKEN or MONGO_URI environment variables are missing!")
+        return
+
+    logger.info("Bot starting...")
+    run_bots(
+        {"subscriptions": build_application(token)},
+        health_checks={"mongo": mongo_client.health},
+        serve_http=serve_http,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+"""AsyncDatabase: שאילתה איטית לא מעכבת את ה-event loop ולא עדכונים אחרים."""
+import asyncio
+import time
+
+import pytest
+
+from database.async_database import AsyncDatabase
+from database.database_manager import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = AsyncDatabase(Database(db_path=str(tmp_path / "bot.db")))
+    yield database
+    database.close()
+
+
+def test_slow_query_does_not_delay_unrelated_updates(db):
+    item_id = db.db.save_item(1, "cat", "subject", "text", content="hello")
+    slow_search = db.db.search_items
+
+    def search_items(*args, **kwargs):
+        time.sleep(0.5)
+        return slow_search(*args, **kwargs)
+
+    db.db.search_items = search_items
+    finished = []
+
+    async def slow_update():
+        await db.search_items(2, "hello")
+        finished.append("slow")
+
+    async def unrelated_update():
+        # עדכון של משתמש אחר: קריאה מה-DB וטיפול על ה-loop
+        await asyncio.sleep(0.05)
+        item = await db.get_item(item_id)
+        assert item["subject"] == "subject"
+        finished.append("unrelated")
+
+    async def main():
+        started = time.perf_counter()
+        ticks = []
+
+        async def ticker():
+            # ה-loop ממשיך להסתובב בזמן שהשאילתה האיטית רצה
+            while "slow" not in finished:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(slow_update(), unrelated_update(), ticker())
+        return time.perf_counter() - started, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    assert finished == ["unrelated", "slow"]
+    assert elapsed >= 0.5
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.2
+
+
+def test_calls_return_the_same_results_as_database(db):
+    async def main():
+        item_id = await db.save_item(7, "cat", "subject", "text", content="body")
+        assert (await db.get_item(item_id))["content"] == "body"
+        assert await db.get_user_categories(7) == ["cat"]
+        assert await db.toggle_pin(item_id) is True
+        assert await db.delete_item(item_id) is True
+        assert await db.get_item(item_id) is None
+
+    asyncio.run(main())
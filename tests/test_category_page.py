@@ -0,0 +1,72 @@
+import pytest
+
+from database.database_manager import Database
+
+SAME_TIME = '2026-01-01 12:00:00'
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=str(tmp_path / "bot.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def items(db):
+    """7 פריטים באותו created_at, שניים מהם קבועים: הסדר נקבע לפי is_pinned ואז id"""
+    ids = [db.save_item(1, "ספרים", f"ספר {i}", "text", content="x") for i in range(7)]
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE saved_items SET created_at = ?", (SAME_TIME,))
+        conn.execute("UPDATE saved_items SET is_pinned = 1 WHERE id IN (?, ?)", (ids[1], ids[4]))
+    db.item_cache.clear()
+    # הסדר הצפוי בדפדוף: קבועים קודם, ובכל קבוצה id יורד
+    return [ids[4], ids[1], ids[6], ids[5], ids[3], ids[2], ids[0]]
+
+
+def _ids(page):
+    return [item['id'] for item in page['items']]
+
+
+def test_pages_forward_and_back_with_equal_timestamps(db, items):
+    first = db.get_category_page(1, "ספרים", limit=3)
+    assert _ids(first) == items[:3]
+    assert (first['has_prev'], first['has_next'], first['anchor_missing']) == (False, True, False)
+
+    second = db.get_category_page(1, "ספרים", after_id=_ids(first)[-1], limit=3)
+    assert _ids(second) == items[3:6]
+    assert (second['has_prev'], second['has_next']) == (True, True)
+
+    last = db.get_category_page(1, "ספרים", after_id=_ids(second)[-1], limit=3)
+    assert _ids(last) == items[6:]
+    assert (last['has_prev'], last['has_next']) == (True, False)
+
+    back = db.get_category_page(1, "ספרים", before_id=_ids(last)[0], limit=3)
+    assert _ids(back) == items[3:6]
+    assert (back['has_prev'], back['has_next']) == (True, True)
+
+    # מעבר לגבול בין הקבועים ללא קבועים, אחורה עד ההתחלה
+    back = db.get_category_page(1, "ספרים", before_id=_ids(back)[0], limit=3)
+    assert _ids(back) == items[:3]
+    assert (back['has_prev'], back['has_next']) == (False, True)
+
+
+def test_page_boundary_inside_pinned_rows(db, items):
+    page = db.get_category_page(1, "ספרים", after_id=items[0], limit=2)
+    assert _ids(page) == items[1:3]
+    assert _ids(db.get_category_page(1, "ספרים", before_id=items[2], limit=5)) == items[:2]
+
+
+@pytest.mark.parametrize("anchor", ["deleted", "foreign", "other_category"])
+def test_missing_anchor_is_reported(db, items, anchor):
+    if anchor == "deleted":
+        anchor_id = items[2]
+        db.delete_item(anchor_id)
+    elif anchor == "foreign":
+        anchor_id = db.save_item(2, "ספרים", "של משתמש אחר", "text", content="x")
+    else:
+        anchor_id = db.save_item(1, "סרטים", "קטגוריה אחרת", "text", content="x")
+
+    for page in (db.get_category_page(1, "ספרים", after_id=anchor_id, limit=3),
+                 db.get_category_page(1, "ספרים", before_id=anchor_id, limit=3)):
+        assert page == {'items': [], 'has_prev': False, 'has_next': False, 'anchor_missing': True}
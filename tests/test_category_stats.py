@@ -0,0 +1,50 @@
+import pytest
+
+from database.database_manager import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=str(tmp_path / "bot.db"))
+    yield database
+    database.close()
+
+
+def _stats(db):
+    with db.pool.reader() as conn:
+        stored = conn.execute(
+            "SELECT user_id, category, item_count, pinned_count FROM category_stats ORDER BY 1, 2"
+        ).fetchall()
+        actual = conn.execute('''
+            SELECT user_id, category, COUNT(*), SUM(CASE WHEN is_pinned THEN 1 ELSE 0 END)
+            FROM saved_items GROUP BY user_id, category ORDER BY 1, 2
+        ''').fetchall()
+    return [tuple(row) for row in stored], [tuple(row) for row in actual]
+
+
+def _move(db, item_id, category):
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE saved_items SET category = ? WHERE id = ?", (category, item_id))
+
+
+def test_category_stats_match_group_by_through_insert_move_delete(db):
+    books = [db.save_item(1, "ספרים", f"ספר {i}", "text", content="x") for i in range(3)]
+    movie = db.save_item(1, "סרטים", "סרט", "text", content="x")
+    db.save_item(2, "ספרים", "של משתמש אחר", "text", content="x")
+    db.toggle_pin(books[0])
+    stored, actual = _stats(db)
+    assert stored == actual == [(1, "ספרים", 3, 1), (1, "סרטים", 1, 0), (2, "ספרים", 1, 0)]
+
+    # פריט קבוע עובר לקטגוריה קיימת, ואחר לקטגוריה חדשה
+    _move(db, books[0], "סרטים")
+    _move(db, books[1], "מאמרים")
+    stored, actual = _stats(db)
+    assert stored == actual == [(1, "מאמרים", 1, 0), (1, "ספרים", 1, 0), (1, "סרטים", 2, 1), (2, "ספרים", 1, 0)]
+
+    # הקטגוריה האחרונה שהתרוקנה נמחקת מהמונים
+    db.delete_item(books[2])
+    db.toggle_pin(books[0])
+    db.delete_item(movie)
+    stored, actual = _stats(db)
+    assert stored == actual == [(1, "מאמרים", 1, 0), (1, "סרטים", 1, 0), (2, "ספרים", 1, 0)]
+    assert db.get_user_stats(1)['total_categories'] == 2
@@ -0,0 +1,48 @@
+"""ייצוא: שגיאת שליחה וקובץ גדול מדי מעדכנים את הודעת הסטטוס."""
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from telegram.error import TimedOut
+
+import save_me
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", str(tmp_path / "bot.db"))
+    instance = save_me.SaveMeBot()
+    instance.db.db.save_item(5, "cat", "subject", "text", content="body")
+    yield instance
+    instance.db.close()
+
+
+def export_update(data="exportfmt_json"):
+    query = SimpleNamespace(data=data, answer=mock.AsyncMock(), edit_message_text=mock.AsyncMock())
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=5),
+                             effective_chat=SimpleNamespace(id=5))
+    context = SimpleNamespace(bot=SimpleNamespace(send_document=mock.AsyncMock()))
+    return update, context
+
+
+def test_send_failure_replaces_the_progress_message(bot):
+    update, context = export_update()
+    context.bot.send_document.side_effect = TimedOut()
+    asyncio.run(bot.handle_export(update, context))
+    assert update.callback_query.edit_message_text.await_args.args[0].startswith("שגיאה בשליחת")
+
+
+def test_export_over_the_upload_limit_is_not_sent(bot):
+    update, context = export_update()
+    with mock.patch.object(save_me, "MAX_DOCUMENT_SIZE", 10):
+        asyncio.run(bot.handle_export(update, context))
+    context.bot.send_document.assert_not_awaited()
+    assert "גדול מדי" in update.callback_query.edit_message_text.await_args.args[0]
+
+
+def test_export_is_sent(bot):
+    update, context = export_update("exportfmt_csv_zip")
+    asyncio.run(bot.handle_export(update, context))
+    assert context.bot.send_document.await_args.kwargs["filename"].endswith(".csv.zip")
+    assert update.callback_query.edit_message_text.await_args.args[0] == "✅ הייצוא הושלם"
@@ -0,0 +1,52 @@
+"""מטמון הפריטים ב-Database: כתיבות לאותו פריט מגיעות למטמון בסדר ה-commit."""
+import threading
+import time
+
+from database.database_manager import Database
+
+
+def read_row(db: Database, item_id: int) -> dict:
+    with db.pool.reader() as conn:
+        return dict(conn.execute("SELECT * FROM saved_items WHERE id = ?", (item_id,)).fetchone())
+
+
+def test_cache_updates_follow_commit_order(tmp_path):
+    db = Database(db_path=str(tmp_path / "bot.db"))
+    try:
+        item_id = db.save_item(1, "cat", "subject", "text", content="body")
+        put = db.item_cache.put
+        first_committed = threading.Event()
+
+        def slow_put(key, row):
+            # הכותב הראשון מתעכב בין ה-commit לעדכון המטמון
+            if threading.current_thread().name == "first":
+                first_committed.set()
+                time.sleep(0.3)
+            put(key, row)
+
+        db.item_cache.put = slow_put
+        first = threading.Thread(target=db.update_note, args=(item_id, "first"), name="first")
+        first.start()
+        first_committed.wait(timeout=5)
+        db.update_note(item_id, "second")
+        first.join()
+
+        assert read_row(db, item_id)['note'] == "second"
+        assert db.get_item(item_id)['note'] == "second"
+    finally:
+        db.close()
+
+
+def test_write_refreshes_the_cached_row(tmp_path):
+    db = Database(db_path=str(tmp_path / "bot.db"))
+    try:
+        item_id = db.save_item(1, "cat", "subject", "text", content="body")
+        db.get_item(item_id)
+        db.update_note(item_id, "new note")
+        hits = db.cache_info()['hits']
+        assert db.get_item(item_id)['note'] == "new note"
+        assert db.cache_info()['hits'] == hits + 1
+        db.delete_item(item_id)
+        assert db.get_item(item_id) is None
+    finally:
+        db.close()
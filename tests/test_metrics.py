@@ -0,0 +1,42 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+from telegram.ext import ApplicationBuilder
+
+import metrics
+
+
+def _lag_labels(bot):
+    return {
+        sample.labels["job"]
+        for family in REGISTRY.collect() if family.name == "job_queue_lag_seconds"
+        for sample in family.samples if sample.labels.get("bot") == bot
+    }
+
+
+def test_one_shot_jobs_are_labelled_by_name():
+    async def scenario():
+        application = ApplicationBuilder().token("123:TEST").build()
+        ran, ticked = asyncio.Event(), asyncio.Event()
+
+        async def daily_check(context):
+            ran.set()
+
+        async def tick(context):
+            ticked.set()
+
+        await application.job_queue.start()
+        try:
+            # משימה שנוספה לפני המדידה ומשימות חד-פעמיות (id חדש לכל אחת)
+            application.job_queue.run_repeating(tick, interval=60, first=0.05)
+            metrics.instrument_application(application, "jobs_test")
+            jobs = [application.job_queue.run_once(daily_check, when=0.05) for _ in range(3)]
+            await asyncio.wait_for(asyncio.gather(ran.wait(), ticked.wait()), 5)
+        finally:
+            await application.job_queue.stop(wait=False)
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    labels = _lag_labels("jobs_test")
+    assert {"daily_check", "tick"} <= labels
+    assert not labels & {job.job.id for job in jobs}
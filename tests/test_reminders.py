@@ -0,0 +1,119 @@
+"""ReminderScheduler: שינויים בזמן טעינת חלון ושליחות שנכשלו לא הולכים לאיבוד."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import reminders
+from database.async_database import AsyncDatabase
+from database.database_manager import Database
+from reminders import ReminderScheduler
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = AsyncDatabase(Database(db_path=str(tmp_path / "bot.db")))
+    yield database
+    database.close()
+
+
+class Deliveries:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.sent = []
+
+    async def __call__(self, bot, user_id, items):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("send failed")
+        self.sent.append((user_id, [item['id'] for item in items]))
+
+
+def add_reminder(db: AsyncDatabase, user_id: int, when: datetime) -> int:
+    item_id = db.db.save_item(user_id, "cat", f"subject {user_id}", "text", content="body")
+    db.db.set_reminder(item_id, when)
+    return item_id
+
+
+def test_reminder_set_while_window_loads_is_kept(db):
+    scheduler = ReminderScheduler(db, Deliveries())
+    now = datetime.now()
+    scheduler._window_end = now + timedelta(minutes=1)
+    load_window = db.get_reminder_window
+    item_id = None
+
+    async def get_reminder_window(start, end):
+        # השאילתה רצה לפני שהתזכורת נכתבה ו-schedule נקרא בזמן שהיא בדרך
+        rows = await load_window(start, end)
+        nonlocal item_id
+        item_id = add_reminder(db, 1, now + timedelta(minutes=5))
+        scheduler.schedule(item_id, 1, now + timedelta(minutes=5))
+        return rows
+
+    db.get_reminder_window = get_reminder_window
+    asyncio.run(scheduler._load(scheduler._window_end, now + timedelta(minutes=30)))
+    assert scheduler._scheduled == {item_id: now + timedelta(minutes=5)}
+    assert [entry[1] for entry in scheduler._pop_due(now + timedelta(minutes=6))] == [item_id]
+
+
+def test_failed_delivery_is_retried_with_backoff(db, monkeypatch):
+    deliveries = Deliveries(failures=1)
+    scheduler = ReminderScheduler(db, deliveries)
+    due_at = datetime.now() - timedelta(seconds=5)
+    item_id = add_reminder(db, 1, due_at)
+
+    async def main():
+        await scheduler._load(None, datetime.now() + timedelta(minutes=30))
+        await scheduler._deliver_batch(None, scheduler._pop_due(datetime.now()))
+        # לא נשלח, נשאר ב-DB וממתין בערימה לניסיון הבא
+        assert deliveries.sent == []
+        assert db.db.get_item(item_id)['reminder_at'] == due_at.isoformat()
+        assert scheduler._pop_due(datetime.now()) == []
+        retry_at = scheduler._scheduled[item_id]
+        assert retry_at >= datetime.now() + reminders.RETRY_DELAY - timedelta(seconds=5)
+
+        await scheduler._deliver_batch(None, scheduler._pop_due(retry_at))
+        assert deliveries.sent == [(1, [item_id])]
+        assert db.db.get_item(item_id)['reminder_at'] is None
+
+    asyncio.run(main())
+
+
+def test_retries_stop_after_the_limit(db, monkeypatch):
+    monkeypatch.setattr(reminders, "RETRY_LIMIT", 2)
+    deliveries = Deliveries(failures=10)
+    scheduler = ReminderScheduler(db, deliveries)
+    item_id = add_reminder(db, 1, datetime.now() - timedelta(seconds=5))
+
+    async def main():
+        await scheduler._load(None, datetime.now() + timedelta(minutes=30))
+        for _ in range(3):
+            await scheduler._deliver_batch(None, scheduler._pop_due(datetime.now() + timedelta(days=1)))
+        assert item_id not in scheduler._scheduled
+        # עדיין ב-DB, ייטען שוב באתחול הבא
+        assert db.db.get_item(item_id)['reminder_at'] is not None
+
+    asyncio.run(main())
+
+
+def test_only_reminders_already_due_are_sent(db):
+    deliveries = Deliveries()
+    scheduler = ReminderScheduler(db, deliveries)
+    now = datetime.now()
+    overdue = [add_reminder(db, 1, now - timedelta(seconds=seconds)) for seconds in (1, 10)]
+    almost_due = add_reminder(db, 1, now + timedelta(seconds=3))
+    later = add_reminder(db, 1, now + timedelta(seconds=40))
+
+    class Context:
+        bot = None
+
+    async def main():
+        await scheduler._load(None, now + timedelta(minutes=30))
+        await scheduler._tick(Context())
+
+    asyncio.run(main())
+    # התזכורות שכבר הגיע זמנן נשלחות יחד; זו שבעוד 3 שניות מחכה לבדיקה הבאה
+    assert len(deliveries.sent) == 1
+    assert sorted(deliveries.sent[0][1]) == sorted(overdue)
+    assert scheduler._scheduled == {almost_due: now + timedelta(seconds=3), later: now + timedelta(seconds=40)}
+    assert db.db.get_item(almost_due)['reminder_at'] is not None
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from database.database_manager import Database
+from database.search import build_match_query, prefix_stems
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=str(tmp_path / "bot.db"))
+    assert database.fts_enabled
+    yield database
+    database.close()
+
+
+def _save(db, user_id, subject, content, category="כללי"):
+    return db.save_item(user_id, category, subject, "text", content=content)
+
+
+def _ids(results):
+    return [item['id'] for item in results]
+
+
+def test_prefix_letter_forms_match_base_word(db):
+    with_he = _save(db, 1, "דירה", "הבית ליד הים")
+    with_bet = _save(db, 1, "שיפוץ", "עבודות בבית")
+    with_vav_bet = _save(db, 1, "קניות", "ובבית צריך מנורה")
+    plain = _save(db, 1, "בית", "משהו אחר")
+    _save(db, 1, "אחר", "בתים רבים")
+
+    assert set(_ids(db.search_items(1, "בית"))) == {with_he, with_bet, with_vav_bet, plain}
+    # גם בכיוון ההפוך: אות שימוש בשאילתה
+    assert set(_ids(db.search_items(1, "הבית"))) == {with_he, with_bet, with_vav_bet, plain}
+    # מילה רגילה לא מוסרת ממנה אות
+    assert prefix_stems("הים", "בית") == ""
+
+
+def test_stems_follow_updates_and_deletes(db):
+    item_id = _save(db, 1, "נושא", "הספר על המדף")
+    assert _ids(db.search_items(1, "ספר")) == [item_id]
+
+    db.update_content(item_id, "text", "המחברת על המדף")
+    assert db.search_items(1, "ספר") == []
+    assert _ids(db.search_items(1, "מחברת")) == [item_id]
+
+    db.delete_item(item_id)
+    assert db.search_items(1, "מחברת") == []
+
+
+def test_results_are_scoped_to_owner(db):
+    mine = _save(db, 1, "מתכון", "עוגת שוקולד")
+    _save(db, 2, "מתכון", "עוגת שוקולד")
+
+    assert _ids(db.search_items(1, "שוקולד")) == [mine]
+    assert db.search_items(3, "שוקולד") == []
+
+
+def test_bm25_ranks_subject_matches_first(db):
+    in_content = _save(db, 1, "רשימה", "לקנות חלב ולחם")
+    in_subject = _save(db, 1, "חלב", "לזכור")
+    with_prefix = _save(db, 1, "רשימה אחרת", "החלב נגמר")
+
+    assert _ids(db.search_items(1, "חלב")) == [in_subject, in_content, with_prefix]
+
+
+@pytest.mark.parametrize("query", ['"', 'AND', 'NEAR(', 'OR "', 'עוגה AND', '*', ')(', 'owner : u2'])
+def test_malformed_queries_do_not_raise(db, query):
+    _save(db, 1, "עוגה", "AND near owner")
+    match = build_match_query(1, query)
+    results = db.search_items(1, query)
+    assert isinstance(results, list)
+    if match:
+        # הביטוי תמיד תקין ל-FTS5, גם כשהקלט מכיל תחביר שלו
+        with sqlite3.connect(":memory:") as conn:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(owner, category, subject, content, caption, note, stems)")
+            conn.execute("SELECT * FROM t WHERE t MATCH ?", (match,)).fetchall()
+
+
+def test_existing_index_without_stems_is_rebuilt(tmp_path):
+    path = str(tmp_path / "bot.db")
+    database = Database(db_path=path)
+    item_id = _save(database, 1, "דירה", "הבית ליד הים")
+    with database.pool.writer() as conn:
+        # מבנה האינדקס הקודם: בלי עמודת stems
+        for trigger in ('saved_items_fts_insert', 'saved_items_fts_delete', 'saved_items_fts_update'):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE saved_items_fts")
+        conn.execute("DROP VIEW saved_items_search_source")
+        conn.execute("CREATE VIRTUAL TABLE saved_items_fts USING fts5(owner, category, subject, content, caption, note)")
+    database.close()
+
+    reopened = Database(db_path=path)
+    assert _ids(reopened.search_items(1, "בית")) == [item_id]
+    reopened.close()
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+from telegram import Chat, Message, MessageEntity, Update, User
+from telegram.ext import ApplicationBuilder, CommandHandler, ConversationHandler, ExtBot, MessageHandler, filters
+
+from database.connection_pool import ConnectionPool
+from database.conversation_state import ConversationStateStore
+from state_persistence import USER_DATA, ConversationStatePersistence
+
+ASKING_NAME, ASKING_DAY = range(2)
+
+
+async def _run(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def _get_me(bot, *args, **kwargs):
+    # בלי רשת: initialize של הבוט רק צריך את פרטי הבוט
+    bot._bot_user = User(1, "bot", True, username="test_bot")
+    return bot._bot_user
+
+
+class ConversationBot:
+    """בוט עם שיחה שמורה בת שני שלבים; שומר מה ראה בכל שלב"""
+
+    def __init__(self, store, monkeypatch):
+        monkeypatch.setattr(ExtBot, "get_me", _get_me)
+        self.persistence = ConversationStatePersistence(store, _run, update_interval=3600)
+        self.application = ApplicationBuilder().token("123:TEST").persistence(self.persistence).build()
+        self.finished = {}
+        self.application.add_handler(ConversationHandler(
+            entry_points=[CommandHandler("start", self.start)],
+            states={
+                ASKING_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.name)],
+                ASKING_DAY: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.day)],
+            },
+            fallbacks=[],
+            name="conversation",
+            persistent=True,
+        ))
+        self._update_id = 0
+
+    async def start(self, update, context):
+        context.user_data["started"] = True
+        return ASKING_NAME
+
+    async def name(self, update, context):
+        context.user_data["name"] = update.message.text
+        return ASKING_DAY
+
+    async def day(self, update, context):
+        self.finished[update.effective_user.id] = dict(context.user_data, day=update.message.text)
+        context.user_data.clear()
+        return ConversationHandler.END
+
+    async def send(self, user_id, text):
+        self._update_id += 1
+        user = User(user_id, f"user{user_id}", False)
+        entities = [MessageEntity(MessageEntity.BOT_COMMAND, 0, len(text))] if text.startswith("/") else None
+        message = Message(self._update_id, datetime.now(), Chat(user_id, Chat.PRIVATE), from_user=user,
+                          text=text, entities=entities)
+        message.set_bot(self.application.bot)
+        await self.application.process_update(Update(self._update_id, message=message))
+
+
+def test_user_data_evicted_with_store_and_restored(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "state.db"))
+    # מקום לשתי רשומות user_data ומצבי השיחה שלהן בערך
+    store = ConversationStateStore(pool, max_bytes=1200)
+    users = range(100, 110)
+
+    async def first_run():
+        bot = ConversationBot(store, monkeypatch)
+        await bot.application.initialize()
+        for user_id in users:
+            await bot.send(user_id, "/start")
+            await bot.send(user_id, f"name {user_id}")
+        await bot.application.update_persistence()
+        assert len(bot.application.user_data) == len(users)
+
+        evicted = bot.persistence.evict_user_data(bot.application)
+        await bot.application.update_persistence()
+        assert store.info()["bytes"] <= store.max_bytes
+        assert evicted > 0
+        assert len(bot.application.user_data) == len(users) - evicted
+        assert len(bot.application.user_data) <= store.count(USER_DATA)
+
+        # משתמש ששוחרר מהזיכרון ממשיך את השיחה עם הנתונים שלו. PTB שומר את המשתמשים בסדר
+        # שרירותי, ולכן לא ידוע מראש מי מהם נפלט
+        first = next(user_id for user_id in users if user_id not in bot.application.user_data)
+        await bot.send(first, "15")
+        assert bot.finished[first] == {"started": True, "name": f"name {first}", "day": "15"}
+        await bot.application.update_persistence()
+        await bot.application.shutdown()
+        return first
+
+    first = asyncio.run(first_run())
+    store.flush()
+
+    async def after_restart():
+        restarted = ConversationStateStore(pool, max_bytes=1200)
+        bot = ConversationBot(restarted, monkeypatch)
+        await bot.application.initialize()
+        last = next(user_id for user_id in reversed(users) if user_id != first)
+        await bot.send(last, "20")
+        assert bot.finished[last] == {"started": True, "name": f"name {last}", "day": "20"}
+        # מי שסיים את השיחה לא חוזר אליה
+        await bot.send(first, "21")
+        assert first not in bot.finished
+        await bot.application.shutdown()
+
+    asyncio.run(after_restart())
+    pool.close()
+
+
+def test_user_returning_before_persistence_run_keeps_changes(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "state.db"))
+    # תקרה קטנה מכל רשומה: שום דבר לא נשאר בזיכרון של המאגר, הכל נקרא מהבאפר
+    store = ConversationStateStore(pool, max_bytes=100)
+
+    async def scenario():
+        bot = ConversationBot(store, monkeypatch)
+        await bot.application.initialize()
+        await bot.send(7, "/start")
+        await bot.application.update_persistence()
+        assert bot.persistence.evict_user_data(bot.application) == 1
+        # המשתמש חוזר לפני שהמחיקה הממתינה הגיעה ל-persistence
+        await bot.send(7, "dana")
+        await bot.application.update_persistence()
+        assert store.get(USER_DATA, 7) == {"started": True, "name": "dana"}
+        await bot.application.shutdown()
+
+    asyncio.run(scenario())
+    pool.close()
@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+mongomock = pytest.importorskip("mongomock")
+
+from database.delivery_schedule import delivery_bucket
+from database.leader_lease import LEASE_COLLECTION, LeaderLease
+from database.mongo_schema import _create_indexes
+from database.subscription_repository import SubscriptionRepository
+
+
+@pytest.fixture
+def db():
+    database = mongomock.MongoClient().get_database("subscriptions_test")
+    _create_indexes(database)
+    return database
+
+
+class _BulkResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+def _bulk_write(collection):
+    # mongomock לא מכיר את השדות ש-pymongo חדש מוסיף ל-UpdateOne; מריצים כל עדכון בנפרד
+    def bulk_write(requests, ordered=True):
+        modified = 0
+        for request in requests:
+            assert isinstance(request, UpdateOne)
+            modified += collection.update_one(request._filter, request._doc, upsert=bool(request._upsert)).modified_count
+        return _BulkResult(modified)
+    return bulk_write
+
+
+@pytest.fixture
+def repo(db):
+    repository = SubscriptionRepository(db)
+    repository.subscriptions.bulk_write = _bulk_write(repository.subscriptions)
+    return repository
+
+
+def _add(repo, chat_id, name, charge, reminded_for=None, billing_day=1):
+    return repo.add_subscription({
+        "chat_id": chat_id, "service_name": name, "cost": 10.0, "currency": "₪",
+        "billing_day": billing_day, "next_charge_date": charge, "last_reminded_for": reminded_for,
+    })
+
+
+def test_add_list_delete(repo):
+    charge = datetime(2026, 11, 1)
+    first = _add(repo, 1, "Netflix", charge)
+    second = _add(repo, 1, "Spotify", charge)
+    _add(repo, 2, "Other chat", charge)
+
+    listed = repo.list_subscriptions(1)
+    assert [sub["_id"] for sub in listed] == [first, second]
+    assert listed[0]["delivery_bucket"] == delivery_bucket(listed[0]["delivery_tz"], listed[0]["delivery_hour"])
+
+    # צ'אט אחר או מזהה לא תקין לא מוחקים כלום
+    assert not repo.delete_subscription(2, str(first))
+    assert not repo.delete_subscription(1, "not-an-id")
+    assert repo.delete_subscription(1, str(first))
+    assert [sub["_id"] for sub in repo.list_subscriptions(1)] == [second]
+
+
+def test_due_subscriptions_filters_bucket_date_and_reminded(repo):
+    until = datetime(2026, 11, 5)
+    due = _add(repo, 1, "due", datetime(2026, 11, 3))
+    reminded_before = _add(repo, 1, "reminded for previous charge", datetime(2026, 11, 4), datetime(2026, 10, 4))
+    _add(repo, 1, "already reminded", datetime(2026, 11, 4), datetime(2026, 11, 4))
+    _add(repo, 1, "too far", datetime(2026, 11, 20))
+    other_bucket = _add(repo, 2, "other bucket", datetime(2026, 11, 3))
+    repo.set_delivery_settings(2, "UTC", 20)
+
+    bucket = repo.list_subscriptions(1)[0]["delivery_bucket"]
+    found = {sub["_id"] for sub in repo.due_subscriptions_cursor(until, bucket, bucket)}
+    assert found == {due, reminded_before}
+
+    wide = {sub["_id"] for sub in repo.due_subscriptions_cursor(until, 0, 10_000)}
+    assert wide == {due, reminded_before, other_bucket}
+
+
+def test_advance_charge_dates_is_conditional(repo):
+    charge = datetime(2026, 11, 3)
+    following = datetime(2026, 12, 3)
+    sub_id = _add(repo, 1, "due", charge)
+
+    assert repo.advance_charge_dates([(sub_id, charge, charge, following)]) == 1
+    # ריצה שקראה את הערך הישן לא מקדמת שוב
+    assert repo.advance_charge_dates([(sub_id, charge, charge, datetime(2027, 1, 3))]) == 0
+
+    stored = repo.subscriptions.find_one({"_id": sub_id})
+    assert stored["next_charge_date"] == following
+    assert stored["last_reminded_for"] == charge
+
+
+def test_claim_log_unique_index(repo):
+    charge = datetime(2026, 11, 3)
+    sent_sub, pending_sub, stale_sub = ObjectId(), ObjectId(), ObjectId()
+    deliveries = [(sent_sub, charge, 1), (pending_sub, charge, 1), (stale_sub, charge, 1)]
+
+    claimed, already_sent = repo.claim_deliveries(deliveries, "run-1", timedelta(minutes=10))
+    assert set(claimed) == {(sub, charge) for sub, _, _ in deliveries}
+    assert already_sent == set()
+    repo.finish_deliveries([claimed[(sent_sub, charge)]], [])
+    repo.deliveries.update_one(
+        {"_id": claimed[(stale_sub, charge)]}, {"$set": {"claimed_at": datetime.now() - timedelta(hours=1)}}
+    )
+
+    # ריצה שנייה: מה שנשלח מדווח, תפיסה פעילה חסומה, ותפיסה ישנה נלקחת מחדש
+    claimed_again, already_sent = repo.claim_deliveries(deliveries, "run-2", timedelta(minutes=10))
+    assert already_sent == {(sent_sub, charge)}
+    assert claimed_again == {(stale_sub, charge): claimed[(stale_sub, charge)]}
+    assert repo.deliveries.count_documents({}) == 3
+
+    # משלוח שנכשל משתחרר לריצה הבאה
+    repo.finish_deliveries([], [claimed[(pending_sub, charge)]])
+    claimed_third, _ = repo.claim_deliveries([(pending_sub, charge, 1)], "run-3", timedelta(minutes=10))
+    assert set(claimed_third) == {(pending_sub, charge)}
+
+
+def test_checkpoint_roundtrip(repo):
+    assert repo.get_checkpoint("daily") == {}
+    repo.save_checkpoint("daily", {"last_bucket": 3}, {"sent": 2})
+    repo.save_checkpoint("daily", {"last_bucket": 5}, {"sent": 4})
+
+    checkpoint = repo.get_checkpoint("daily")
+    assert checkpoint["last_bucket"] == 5
+    assert checkpoint["sent"] == 6
+
+
+def test_lease_held_until_expiry(db):
+    collection = db[LEASE_COLLECTION]
+    first = LeaderLease(collection, "jobs", ttl=30, holder_id="first")
+    second = LeaderLease(collection, "jobs", ttl=30, holder_id="second")
+
+    assert first.try_acquire() and first.is_leader
+    assert not second.try_acquire() and not second.is_leader
+    # חידוש ע"י המחזיק מצליח
+    assert first.try_acquire()
+
+    # החכירה פגה (המחזיק מת): עותק אחר תופס אותה
+    collection.update_one({"_id": "jobs"}, {"$set": {"expires_at": datetime(2000, 1, 1)}})
+    assert second.try_acquire() and second.is_leader
+    assert collection.find_one({"_id": "jobs"})["holder"] == "second"
+
+    # המחזיק הקודם מגלה שאיבד את החכירה
+    assert not first.try_acquire() and not first.is_leader
+
+    second.release()
+    assert not second.is_leader
+    assert first.try_acquire()
+
+
+def test_claim_conflicts_read_only_the_conflicting_pairs(repo):
+    sub_id = ObjectId()
+    history = [datetime(2026, month, 3) for month in range(1, 11)]
+    claimed, _ = repo.claim_deliveries([(sub_id, charge, 1) for charge in history], "old", timedelta(minutes=10))
+    repo.finish_deliveries(list(claimed.values()), [])
+
+    read = []
+    find = repo.deliveries.find
+
+    def spy(*args, **kwargs):
+        records = list(find(*args, **kwargs))
+        read.extend(records)
+        return records
+
+    repo.deliveries.find = spy
+    claimed, already_sent = repo.claim_deliveries([(sub_id, history[-1], 1)], "new", timedelta(minutes=10))
+    assert claimed == {}
+    assert already_sent == {(sub_id, history[-1])}
+    # הרשומות של חיובים קודמים של אותו מנוי לא נקראות
+    assert [record["charge_date"] for record in read] == [history[-1]]
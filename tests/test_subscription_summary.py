@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import subscriber_tracking
+from database.item_cache import ItemCache
+from database.subscription_repository import AsyncSubscriptionRepository, SubscriptionRepository
+from database.user_registry import UserRegistry
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().get_database("summary_test")
+
+
+def _add(repo, chat_id, name, cost, currency, billing_day=5):
+    return repo.add_subscription({
+        "chat_id": chat_id, "service_name": name, "billing_day": billing_day, "cost": cost, "currency": currency,
+    })
+
+
+def test_summary_groups_by_currency_in_insertion_order(db):
+    repo = SubscriptionRepository(db)
+    netflix = _add(repo, 1, "Netflix", 40.0, "₪")
+    icloud = _add(repo, 1, "iCloud", 3.0, "$")
+    spotify = _add(repo, 1, "Spotify", 20.0, "₪")
+    _add(repo, 2, "Other chat", 99.0, "₪")
+
+    groups = repo.subscription_summary(1)
+    assert [(group["_id"], group["total"]) for group in groups] == [("₪", 60.0), ("$", 3.0)]
+    assert [row["_id"] for row in groups[0]["rows"]] == [netflix, spotify]
+    assert [row["_id"] for row in groups[1]["rows"]] == [icloud]
+
+    message = subscriber_tracking.build_summary_message(groups)
+    assert message.index("Netflix") < message.index("iCloud") < message.index("Spotify")
+    assert "- 60.0 ₪" in message and "- 3.0 $" in message
+    assert subscriber_tracking.build_summary_message(repo.subscription_summary(3)) is None
+
+
+def test_summary_cache_follows_changes_from_other_replicas(db, monkeypatch):
+    # שני עותקים של הבוט מול אותו מסד; המטמון של עותק א' לא מתבטל ישירות
+    here = SubscriptionRepository(db)
+    other_replica = SubscriptionRepository(db)
+    monkeypatch.setattr(subscriber_tracking, "repository", AsyncSubscriptionRepository(here))
+    monkeypatch.setattr(subscriber_tracking, "user_registry", UserRegistry(db.users))
+    monkeypatch.setattr(subscriber_tracking, "summary_cache", ItemCache(16))
+    aggregations = []
+    summary = here.subscription_summary
+    monkeypatch.setattr(here, "subscription_summary", lambda chat_id: aggregations.append(chat_id) or summary(chat_id))
+
+    def shown():
+        query = SimpleNamespace(answer=AsyncMock(), edit_message_text=AsyncMock())
+        update = SimpleNamespace(
+            callback_query=query,
+            effective_chat=SimpleNamespace(id=1),
+            effective_user=SimpleNamespace(id=1, first_name="Dana", username=None),
+        )
+        asyncio.run(subscriber_tracking.my_subs_callback(update, SimpleNamespace()))
+        return query.edit_message_text.call_args.args[0]
+
+    _add(other_replica, 1, "Netflix", 40.0, "₪")
+    assert "Netflix" in shown()
+    assert "Netflix" in shown()
+    assert len(aggregations) == 1
+
+    spotify = _add(other_replica, 1, "Spotify", 20.0, "₪")
+    assert "Spotify" in shown()
+    assert other_replica.delete_subscription(1, str(spotify))
+    assert "Spotify" not in shown()
+    assert len(aggregations) == 3
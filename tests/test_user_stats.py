@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.database_manager import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=str(tmp_path / "bot.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def items(db):
+    first = db.save_item(1, "ספרים", "ספר", "text", content="x")
+    second = db.save_item(1, "סרטים", "סרט", "text", content="x")
+    db.save_item(2, "ספרים", "ספר", "text", content="x")
+    db.toggle_pin(first)
+    db.update_note(second, "הערה")
+    db.set_reminder(first, datetime.now() + timedelta(days=1))
+    return first, second
+
+
+def test_triggers_keep_user_stats_consistent(db, items):
+    assert db.check_user_stats() == []
+    assert db.get_user_stats(1) == {'total_items': 2, 'pinned_items': 1, 'total_categories': 2,
+                                    'active_reminders': 1, 'items_with_notes': 1}
+
+
+def test_drift_is_reported_and_repaired(db, items):
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE user_stats SET total_items = 7, items_with_notes = 0 WHERE user_id = 1")
+        conn.execute("DELETE FROM user_stats WHERE user_id = 2")
+        conn.execute("INSERT INTO user_stats (user_id, total_items) VALUES (3, 4)")
+
+    drift = db.check_user_stats()
+    assert sorted((d['user_id'], d['field'], d['stored'], d['actual']) for d in drift) == [
+        (1, 'items_with_notes', 0, 1),
+        (1, 'total_items', 7, 2),
+        (2, 'total_categories', 0, 1),
+        (2, 'total_items', 0, 1),
+        (3, 'total_items', 4, 0),
+    ]
+    # בלי repair לא משתנה כלום
+    assert len(db.check_user_stats()) == len(drift)
+
+    assert len(db.check_user_stats(repair=True)) == len(drift)
+    assert db.check_user_stats() == []
+    assert db.get_user_stats(1)['total_items'] == 2
+    assert db.get_user_stats(2)['total_items'] == 1
+    assert db.get_user_stats(3)['total_items'] == 0
+
+    # הטריגרים ממשיכים מהמצב המתוקן
+    db.save_item(2, "חדשה", "פריט", "text", content="x")
+    assert db.check_user_stats() == []
@@ -0,0 +1,70 @@
+import warnings
+
+import pytest
+from telegram.ext import ApplicationBuilder
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from starlette.testclient import TestClient
+
+from web_server import SECRET_TOKEN_HEADER, BotServer, webhook_secret
+
+TOKEN = "123456:webhook-test-token"
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10, "date": 1700000000, "text": "hi",
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Dana"},
+    },
+}
+
+
+@pytest.fixture
+def application():
+    return ApplicationBuilder().token(TOKEN).build()
+
+
+@pytest.fixture
+def client(application):
+    # בלי with: ה-lifespan (הפעלת הבוטים מול טלגרם) לא רץ
+    return TestClient(BotServer({"save_me": application}, mode="webhook").asgi_app())
+
+
+def _post(client, body=None, bot="save_me", secret=webhook_secret(TOKEN), **kwargs):
+    return client.post(f"/webhook/{bot}", json=body, headers={SECRET_TOKEN_HEADER: secret}, **kwargs)
+
+
+def test_unknown_bot_is_404(client):
+    assert _post(client, UPDATE, bot="other").status_code == 404
+
+
+def test_polling_mode_has_no_webhook(application):
+    client = TestClient(BotServer({"save_me": application}, mode="polling").asgi_app())
+    assert _post(client, UPDATE).status_code == 404
+
+
+def test_wrong_secret_is_403(client, application):
+    assert _post(client, UPDATE, secret="wrong").status_code == 403
+    assert client.post("/webhook/save_me", json=UPDATE).status_code == 403
+    assert application.update_queue.empty()
+
+
+@pytest.mark.parametrize("body", [[UPDATE], "update", 5, None, {}, {"update_id": 1, "message": "bad"},
+                                  {"update_id": 1, "message": {"message_id": 1}}])
+def test_malformed_body_is_400(client, application, body):
+    assert _post(client, body).status_code == 400
+    assert application.update_queue.empty()
+
+
+def test_invalid_json_is_400(client):
+    response = client.post("/webhook/save_me", content=b"{not json", headers={SECRET_TOKEN_HEADER: webhook_secret(TOKEN)})
+    assert response.status_code == 400
+
+
+def test_valid_update_is_queued(client, application):
+    assert _post(client, UPDATE).status_code == 200
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 1
+    assert update.effective_message.text == "hi"
@@ -0,0 +1,179 @@
+"""שרת HTTP אסינכרוני אחד לכל הבוטים בתהליך.
+
+במצב webhook כל בוט מקבל עדכונים בנתיב /webhook/<name> משלו, עם secret token שטלגרם
+שולח בכותרת X-Telegram-Bot-Api-Secret-Token. במצב polling השרת מגיש רק את בדיקות ה-health.
+
+משתני סביבה:
+    BOT_MODE      - polling (ברירת מחדל) או webhook
+    WEBHOOK_URL   - הכתובת הציבורית של השרת (ב-Render נלקחת מ-RENDER_EXTERNAL_URL).
+                    במצב webhook בלי כתובת לא נרשם webhook, וזה מאפשר לשלוח עדכונים מוקלטים
+                    מקומית (benchmarks/replay_updates.py)
+    PORT          - פורט השרת
+"""
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import logging
+import os
+import signal
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+HealthCheck = Callable[[], Dict[str, Any]]
+
+
+def webhook_secret(token: str) -> str:
+    """secret token קבוע לכל בוט, נגזר מהטוקן שלו (טלגרם מתיר רק A-Z, a-z, 0-9, _ ו-)"""
+    return hmac.new(b"telegram-webhook", token.encode("utf-8"), hashlib.sha256).hexdigest()[:48]
+
+
+class BotServer:
+    """מחזור החיים של כמה Application של PTB על event loop אחד, מאחורי שרת ASGI אחד"""
+
+    def __init__(self, bots: Dict[str, Application], mode: str = "polling",
+                 webhook_url: Optional[str] = None, health_checks: Optional[Dict[str, HealthCheck]] = None):
+        if mode not in ("polling", "webhook"):
+            raise ValueError(f"Unknown bot mode: {mode}")
+        self.bots = bots
+        self.mode = mode
+        self.webhook_url = webhook_url.rstrip("/") if webhook_url else None
+        self.health_checks = health_checks or {}
+        self._secrets = {name: webhook_secret(application.bot.token) for name, application in bots.items()}
+
+    # --- מחזור חיים ---
+    async def _start_bot(self, name: str, application: Application) -> None:
+        await application.initialize()
+        # post_init/post_shutdown נקראים רק ע"י run_polling/run_webhook, ולכן כאן ידנית
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+
+        if self.mode == "polling":
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        elif self.webhook_url:
+            await application.bot.set_webhook(
+                url=f"{self.webhook_url}/webhook/{name}",
+                secret_token=self._secrets[name],
+                allowed_updates=Update.ALL_TYPES,
+            )
+        else:
+            logger.warning(f"WEBHOOK_URL is not set - '{name}' accepts updates at /webhook/{name} without registering it")
+        logger.info(f"Bot '{name}' started ({self.mode})")
+
+    async def _stop_bot(self, name: str, application: Application) -> None:
+        try:
+            if application.updater and application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+        except Exception as e:
+            logger.error(f"Error while stopping bot '{name}': {e}")
+        logger.info(f"Bot '{name}' stopped")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app: Any = None) -> AsyncIterator[None]:
+        started = []
+        try:
+            for name, application in self.bots.items():
+                await self._start_bot(name, application)
+                started.append((name, application))
+            yield
+        finally:
+            for name, application in reversed(started):
+                await self._stop_bot(name, application)
+
+    # --- נתיבים ---
+    async def webhook(self, request: Request) -> Response:
+        name = request.path_params["bot"]
+        application = self.bots.get(name)
+        if application is None or self.mode != "webhook":
+            return Response(status_code=404)
+        if not hmac.compare_digest(request.headers.get(SECRET_TOKEN_HEADER, ""), self._secrets[name]):
+            return Response(status_code=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return Response(status_code=400)
+        # גוף שאינו Update תקין נדחה ב-400; שגיאת 500 הייתה גורמת לטלגרם לשלוח אותו שוב ושוב
+        if not isinstance(data, dict):
+            return Response(status_code=400)
+        try:
+            update = Update.de_json(data, application.bot)
+        except (TypeError, KeyError, ValueError, AttributeError) as e:
+            logger.warning(f"Rejected malformed update for '{name}': {e}")
+            return Response(status_code=400)
+        # העיבוד עצמו נעשה ע"י ה-Application; טלגרם מקבל תשובה מיד
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    async def health(self, request: Request) -> Response:
+        # הבדיקות חוסמות (למשל ping ל-Mongo) ולכן רצות ב-thread
+        checks = {name: await asyncio.to_thread(check) for name, check in self.health_checks.items()}
+        bots = {name: application.running for name, application in self.bots.items()}
+        ok = all(bots.values()) and all(result.get("ok") for result in checks.values())
+        return JSONResponse({"ok": ok, "bots": bots, "checks": checks}, status_code=200 if ok else 503)
+
+    async def metrics_endpoint(self, request: Request) -> Response:
+        body, content_type = metrics.render()
+        return Response(body, media_type=content_type)
+
+    async def alive(self, request: Request) -> Response:
+        return PlainTextResponse("Bot is alive!")
+
+    def asgi_app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/", self.alive),
+                Route("/healthz", self.health),
+                Route("/metrics", self.metrics_endpoint),
+                Route("/webhook/{bot}", self.webhook, methods=["POST"]),
+            ],
+            lifespan=self.lifespan,
+        )
+
+    # --- הרצה ---
+    async def serve(self, port: int) -> None:
+        config = uvicorn.Config(self.asgi_app(), host="0.0.0.0", port=port, log_level="info", lifespan="on")
+        await uvicorn.Server(config).serve()
+
+    async def run_without_http(self) -> None:
+        """polling בלי שרת HTTP (למשל כשתהליך אחר כבר מחזיק את הפורט)"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with self.lifespan():
+            await stop.wait()
+
+
+def run_bots(bots: Dict[str, Application], health_checks: Optional[Dict[str, HealthCheck]] = None,
+             serve_http: bool = True, mode: Optional[str] = None) -> None:
+    """הרצת הבוטים עד לעצירה, לפי משתני הסביבה"""
+    mode = mode or os.environ.get("BOT_MODE", "polling")
+    if mode == "webhook" and not serve_http:
+        raise ValueError("webhook mode needs the HTTP server")
+    webhook_url = os.environ.get("WEBHOOK_URL") or os.environ.get("RENDER_EXTERNAL_URL")
+    server = BotServer(bots, mode=mode, webhook_url=webhook_url, health_checks=health_checks)
+    if serve_http:
+        asyncio.run(server.serve(int(os.environ.get("PORT", 8080))))
+    else:
+        asyncio.run(server.run_without_http())